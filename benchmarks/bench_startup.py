@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+KAI - Startup Benchmark
+Wall time of short-lived entry points and the import cost of each bots module,
+measured in fresh interpreters. Exits 1 if `kai positions` misses its budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOTS = os.path.join(ROOT, "bots")
+
+# Config
+RUNS = 7
+BUDGET_MS = 200         # `kai positions` median on a warm disk
+COMMANDS = {
+    "python -c pass": [sys.executable, "-c", "pass"],
+    "kai --help": [sys.executable, os.path.join(ROOT, "kai"), "--help"],
+    "kai positions": [sys.executable, os.path.join(ROOT, "kai"), "positions"],
+}
+MODULES = ["governor", "eventlog", "market_data", "india_daily", "risk", "montecarlo",
+           "india_analyzer_v3", "replay", "scheduler"]
+HEAVY = ["numpy", "pandas", "yfinance", "flask", "requests"]
+
+
+def wall_ms(cmd, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def import_profile(module):
+    """(total import ms, heavy modules pulled in) from -X importtime"""
+    code = f"import sys; sys.path.insert(0, {BOTS!r}); import {module}"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         capture_output=True, text=True).stderr
+    total = 0
+    loaded = set()
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        loaded.add(name)
+        if name == module:
+            total = int(cumulative) / 1000
+    return total, [h for h in HEAVY if h in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KAI startup / import-time benchmark")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="kai positions median, ms")
+    args = parser.parse_args()
+
+    print(f"{'command':20} {'median ms':>10}")
+    results = {}
+    for name, cmd in COMMANDS.items():
+        wall_ms(cmd, 1)     # warm the page cache
+        results[name] = wall_ms(cmd, args.runs)
+        print(f"{name:20} {results[name]:>10.1f}")
+
+    print(f"\n{'module':20} {'import ms':>10}  heavy deps")
+    for module in MODULES:
+        ms, heavy = import_profile(module)
+        print(f"{module:20} {ms:>10.1f}  {', '.join(heavy) or '-'}")
+
+    if results["kai positions"] > args.budget:
+        print(f"\n❌ kai positions {results['kai positions']:.0f} ms > {args.budget:.0f} ms budget")
+        sys.exit(1)
+    print(f"\n✓ kai positions within {args.budget:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
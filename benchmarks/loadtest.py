@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+KAI - Dashboard Load Test
+Serves dashboard/web_app.py (via `kai serve`) against a local fake quote
+server and drives concurrent keep-alive clients at / and /api. Reports
+p50/p95/p99 latency, throughput and error rate per path; exits 1 when a
+budget is missed.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "bots"))
+
+from fake_upstream import FakeUpstream
+
+# Config
+CLIENTS = 32
+DURATION = 10.0         # seconds measured
+WARMUP = 2.0            # seconds of load before measuring (imports, first quotes)
+PATHS = ["/", "/api"]
+POSITIONS = 5
+UPSTREAM_LATENCY = 0.05 # seconds per fake quote
+BUDGET_RPS = 150        # total requests/s
+BUDGET_P95_MS = 250
+BUDGET_ERROR_RATE = 0.001
+START_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_wallet(path, positions):
+    wallet = {"capital": 100000, "balance": 100000 - 10000 * positions, "trades": [], "positions": [
+        {"id": i + 1, "symbol": f"LOAD{i}", "entry_price": 100.0, "qty": 100, "cost": 10000.0,
+         "entry_time": "2026-01-01T09:15:00", "stop_loss": 97.0, "target": 110.0, "status": "OPEN"}
+        for i in range(positions)]}
+    with open(path, "w") as f:
+        json.dump(wallet, f)
+
+
+def start_server(port, env, server, workers, threads, log):
+    cmd = [sys.executable, os.path.join(ROOT, "kai"), "serve", "--host", "127.0.0.1", "--port", str(port),
+           "--server", server]
+    if workers:
+        cmd += ["--workers", str(workers)]
+    if threads:
+        cmd += ["--threads", str(threads)]
+    proc = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)   # a pipe would fill and block it
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            with open(log.name) as f:
+                raise SystemExit(f"server exited:\n{f.read()[-2000:]}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/api")
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit(f"server not ready after {START_TIMEOUT}s")
+
+
+def client(port, paths, offset, stop, samples):
+    """Loop until stop is set, appending (path, ms, ok) to samples"""
+    conn = None
+    i = offset
+    while not stop.is_set():
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn = conn or http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status == 200
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn = None
+        samples.append((path, (time.perf_counter() - start) * 1000, ok))
+
+
+def run_load(port, clients, duration, warmup, paths):
+    """(samples, measured seconds): warm-up samples are thrown away"""
+    stop = threading.Event()
+    buckets = [[] for _ in range(clients)]
+    threads = [threading.Thread(target=client, args=(port, paths, n, stop, buckets[n]), daemon=True)
+               for n in range(clients)]
+    for t in threads:
+        t.start()
+    time.sleep(warmup)
+    marks = [len(b) for b in buckets]
+    started = time.perf_counter()
+    time.sleep(duration)
+    marks = [(m, len(b)) for m, b in zip(marks, buckets)]
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for t in threads:
+        t.join()
+    return [s for b, (lo, hi) in zip(buckets, marks) for s in b[lo:hi]], elapsed
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(q / 100 * len(sorted_values)))]
+
+
+def summarize(samples, elapsed, paths):
+    rows = {}
+    for path in paths + ["total"]:
+        picked = [s for s in samples if path == "total" or s[0] == path]
+        ms = sorted(m for _, m, _ in picked)
+        errors = sum(1 for _, _, ok in picked if not ok)
+        rows[path] = {
+            "requests": len(picked), "rps": len(picked) / elapsed,
+            "error_rate": errors / len(picked) if picked else 1.0,
+            "p50_ms": percentile(ms, 50), "p95_ms": percentile(ms, 95), "p99_ms": percentile(ms, 99),
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the KAI web dashboard")
+    parser.add_argument("--clients", type=int, default=CLIENTS)
+    parser.add_argument("--duration", type=float, default=DURATION)
+    parser.add_argument("--warmup", type=float, default=WARMUP)
+    parser.add_argument("--paths", nargs="+", default=PATHS)
+    parser.add_argument("--positions", type=int, default=POSITIONS, help="open positions in the test wallet")
+    parser.add_argument("--latency", type=float, default=UPSTREAM_LATENCY, help="fake quote latency, s")
+    parser.add_argument("--server", default="auto", choices=["auto", "gunicorn", "waitress", "flask"])
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--min-rps", type=float, default=BUDGET_RPS)
+    parser.add_argument("--max-p95", type=float, default=BUDGET_P95_MS, help="ms, every path")
+    parser.add_argument("--max-errors", type=float, default=BUDGET_ERROR_RATE, help="error rate, every path")
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeUpstream(latency=args.latency) as upstream:
+        wallet = os.path.join(tmp, "wallet.json")
+        write_wallet(wallet, args.positions)
+        env = dict(os.environ, KAI_QUOTE_URL=upstream.url, KAI_WALLET_FILE=wallet)
+        port = free_port()
+        log = open(os.path.join(tmp, "server.log"), "w")
+        server = start_server(port, env, args.server, args.workers, args.threads, log)
+        try:
+            samples, elapsed = run_load(port, args.clients, args.duration, args.warmup, args.paths)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+            log.close()
+        hits = upstream.hits
+
+    rows = summarize(samples, elapsed, args.paths)
+    print(f"{args.clients} clients, {elapsed:.1f}s, server={args.server}, {hits} upstream quote fetches")
+    print(f"{'path':10} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for path, r in rows.items():
+        print(f"{path:10} {r['requests']:>9} {r['rps']:>8.1f} {r['error_rate']:>6.1%} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"clients": args.clients, "server": args.server, "paths": rows}, f, indent=2)
+
+    failures = []
+    if rows["total"]["rps"] < args.min_rps:
+        failures.append(f"throughput {rows['total']['rps']:.0f} req/s < {args.min_rps:.0f}")
+    for path in args.paths:
+        if rows[path]["p95_ms"] > args.max_p95:
+            failures.append(f"{path} p95 {rows[path]['p95_ms']:.0f} ms > {args.max_p95:.0f} ms")
+        if rows[path]["error_rate"] > args.max_errors:
+            failures.append(f"{path} errors {rows[path]['error_rate']:.2%} > {args.max_errors:.2%}")
+    for f in failures:
+        print(f"❌ {f}")
+    if failures:
+        sys.exit(1)
+    print("✓ within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+KAI - Alert Engine
+Rules evaluated as vectorized masks over a FeatureSnapshot (one column per
+symbol), with hysteresis, per-rule cooldowns, one alert per symbol per cycle
+and pluggable sinks that see each cycle as a single capped batch
+"""
+
+import argparse
+import json
+import os
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import india_daily
+
+# Config
+STATE_FILE = "/home/anand/.openclaw/workspace/trading/alerts/state.json"
+ALERT_FILE = "/home/anand/.openclaw/workspace/trading/alerts/alerts.jsonl"
+WEBHOOK_URL = os.environ.get("KAI_ALERT_WEBHOOK")
+MAX_PER_CYCLE = 25      # alerts handed to the sinks per cycle; the rest are counted, not sent
+PROXIMITY = 1.0         # % from a stop/target that counts as "near"
+BREAK = 0.5             # % beyond a support/resistance level that counts as a break
+
+
+class Rule:
+    """Fires for a symbol when x crosses threshold in `direction` while armed;
+    re-arms only once x is back beyond threshold by `band` (hysteresis), and
+    not again within `cooldown` of the last alert for that symbol.
+
+    x(ctx) returns (previous, current) arrays with one value per symbol. A
+    symbol seen for the first time is armed unless x was already past the
+    threshold on the previous bar (cross=True: only fresh crossings fire) or
+    always (cross=False: a state such as "near the stop" fires at once).
+    """
+
+    __slots__ = ("name", "x", "threshold", "direction", "band", "cooldown", "message", "priority", "cross")
+
+    def __init__(self, name, x, threshold, direction, band, cooldown_hours, message, priority=1, cross=True):
+        self.name = name
+        self.x = x
+        self.threshold = threshold
+        self.direction = direction
+        self.band = band
+        self.cooldown = timedelta(hours=cooldown_hours)
+        self.message = message
+        self.priority = priority
+        self.cross = cross
+
+    def triggered(self, x):
+        with np.errstate(invalid="ignore"):
+            return x < self.threshold if self.direction == "below" else x > self.threshold
+
+    def clear(self, x):
+        with np.errstate(invalid="ignore"):
+            if self.direction == "below":
+                return x > self.threshold + self.band
+            return x < self.threshold - self.band
+
+
+class Alert:
+    __slots__ = ("symbol", "price", "rules", "messages", "priority", "ts")
+
+    def __init__(self, symbol, price, ts):
+        self.symbol = symbol
+        self.price = price
+        self.rules = []
+        self.messages = []
+        self.priority = 0
+        self.ts = ts
+
+    def to_dict(self):
+        return {"ts": self.ts.isoformat(timespec="seconds"), "symbol": self.symbol, "price": self.price,
+                "rules": self.rules, "messages": self.messages}
+
+    def line(self):
+        return f"🔔 {self.symbol} ₹{self.price:.2f} | " + " | ".join(self.messages)
+
+
+# ---- rule inputs ----
+
+class Context:
+    """What the rules read for one snapshot; every series is computed once"""
+
+    def __init__(self, snap, positions=()):
+        self.snap = snap
+        self.positions = list(positions)
+        self._cache = {}
+
+    def last2(self, name, *args):
+        """(previous, current) rows of snap.feature(name, *args)"""
+        key = (name, *args)
+        if key not in self._cache:
+            values = self.snap.feature(name, *args)
+            self._cache[key] = (values[-2], values[-1]) if len(values) > 1 else (values[-1], values[-1])
+        return self._cache[key]
+
+    def close(self):
+        close = self.snap["Close"]
+        return close[-2] if len(close) > 1 else close[-1], close[-1]
+
+    def levels(self):
+        """Nearest (support, resistance) around the previous close, from bars before the last one"""
+        if "levels" not in self._cache:
+            snap = self.snap
+            index = snap.level_index(skip_last=True)
+            prev, _ = self.close()
+            sup = [index.support(s, p) for s, p in zip(snap.symbols, prev)]
+            res = [index.resistance(s, p) for s, p in zip(snap.symbols, prev)]
+            self._cache["levels"] = (np.array([np.nan if v is None else v for v in sup]),
+                                     np.array([np.nan if v is None else v for v in res]))
+        return self._cache["levels"]
+
+    def held(self, field):
+        """Per-symbol array of the wallet positions' stop_loss or target (NaN where not held)"""
+        out = np.full(len(self.snap.symbols), np.nan)
+        for pos in self.positions:
+            col = self.snap.col.get(pos['symbol'] + ".NS")
+            if col is not None and pos.get(field) is not None:
+                out[col] = pos[field]
+        return out
+
+
+def _pct(ctx, level):
+    prev, now = ctx.close()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (prev / level - 1) * 100, (now / level - 1) * 100
+
+
+def _rsi(ctx):
+    return ctx.last2("rsi", "Close", 14)
+
+
+def _ema_spread(ctx):
+    (f0, f1), (s0, s1) = ctx.last2("ema", "Close", 9), ctx.last2("ema", "Close", 21)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (f0 / s0 - 1) * 100, (f1 / s1 - 1) * 100
+
+
+RULES = [
+    Rule("rsi_oversold", _rsi, 30, "below", 5, 72, "RSI crossed below 30"),
+    Rule("rsi_overbought", _rsi, 70, "above", 5, 72, "RSI crossed above 70"),
+    Rule("ema_cross_up", _ema_spread, 0, "above", 0.25, 72, "EMA 9 crossed above 21"),
+    Rule("ema_cross_down", _ema_spread, 0, "below", 0.25, 72, "EMA 9 crossed below 21"),
+    Rule("support_break", lambda ctx: _pct(ctx, ctx.levels()[0]), -BREAK, "below", 2 * BREAK, 24,
+         "closed below support", priority=2),
+    Rule("resistance_break", lambda ctx: _pct(ctx, ctx.levels()[1]), BREAK, "above", 2 * BREAK, 24,
+         "closed above resistance", priority=2),
+    Rule("near_stop", lambda ctx: _pct(ctx, ctx.held("stop_loss")), PROXIMITY, "below", PROXIMITY, 24,
+         f"within {PROXIMITY:g}% of stop", priority=3, cross=False),
+    Rule("near_target", lambda ctx: _pct(ctx, ctx.held("target")), -PROXIMITY, "above", PROXIMITY, 24,
+         f"within {PROXIMITY:g}% of target", priority=3, cross=False),
+]
+
+
+# ---- sinks ----
+
+class LogSink:
+    def send(self, alerts, dropped):
+        for a in alerts:
+            india_daily.log(a.line())
+        if dropped:
+            india_daily.log(f"🔔 {dropped} more alerts this cycle (not sent)")
+
+
+class EventLogSink:
+    def send(self, alerts, dropped):
+        for a in alerts:
+            india_daily.record("alert", symbol=a.symbol, price=a.price, rules=a.rules)
+
+
+class FileSink:
+    """One JSON batch per line: a local stand-in for a webhook receiver"""
+
+    def __init__(self, path=ALERT_FILE):
+        self.path = path
+
+    def send(self, alerts, dropped):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"alerts": [a.to_dict() for a in alerts], "dropped": dropped}) + "\n")
+
+
+class WebhookSink:
+    """POST each cycle's batch as JSON; a failed delivery is logged, never raised"""
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts, dropped):
+        body = json.dumps({"alerts": [a.to_dict() for a in alerts], "dropped": dropped}).encode()
+        req = urllib.request.Request(self.url, body, {"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(req, timeout=self.timeout).close()
+        except OSError as e:
+            india_daily.log(f"alerts: webhook delivery failed: {e}")
+            india_daily.record("error", source="alerts", reason=f"webhook: {e}")
+
+
+def default_sinks():
+    sinks = [LogSink(), EventLogSink(), FileSink()]
+    if WEBHOOK_URL:
+        sinks.append(WebhookSink(WEBHOOK_URL))
+    return sinks
+
+
+# ---- engine ----
+
+class AlertEngine:
+    """Rule state per rule and symbol, as arrays aligned with the snapshot's
+    columns: armed (-1 never seen, 0 waiting to re-arm, 1 armed) and the
+    last time the rule fired (epoch seconds). Kept on disk between cycles."""
+
+    def __init__(self, rules=None, sinks=None, state_file=STATE_FILE, max_per_cycle=MAX_PER_CYCLE):
+        self.rules = rules if rules is not None else RULES
+        self.sinks = sinks if sinks is not None else default_sinks()
+        self.state_file = state_file
+        self.max_per_cycle = max_per_cycle
+        self.symbols, self.armed, self.last = [], {}, {}
+        self._load()
+        self.last_ms = 0.0
+
+    def _load(self):
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, TypeError, ValueError):
+            return
+        self.symbols = state["symbols"]
+        self.armed = {k: np.array(v, dtype=np.int8) for k, v in state["armed"].items()}
+        self.last = {k: np.array(v, dtype=float) for k, v in state["last"].items()}
+
+    def save(self):
+        if not self.state_file:
+            return
+        state = {"symbols": self.symbols, "armed": {k: v.tolist() for k, v in self.armed.items()},
+                 "last": {k: v.tolist() for k, v in self.last.items()}}
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with open(self.state_file + ".tmp", "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(self.state_file + ".tmp", self.state_file)
+
+    def _align(self, symbols):
+        """Re-index the state arrays when the universe changes"""
+        if list(symbols) == self.symbols and all(r.name in self.armed for r in self.rules):
+            return
+        old = {s: i for i, s in enumerate(self.symbols)}
+        idx = np.array([old.get(s, -1) for s in symbols], dtype=int)
+        have = idx >= 0
+        for rule in self.rules:
+            armed = np.full(len(symbols), -1, dtype=np.int8)
+            last = np.zeros(len(symbols))
+            if rule.name in self.armed and len(self.symbols):
+                armed[have] = self.armed[rule.name][idx[have]]
+                last[have] = self.last[rule.name][idx[have]]
+            self.armed[rule.name], self.last[rule.name] = armed, last
+        self.symbols = list(symbols)
+
+    def evaluate(self, snap, positions=(), now=None):
+        """Alerts for this snapshot, one per symbol, highest priority first; updates the state"""
+        started = time.perf_counter()
+        now = now or india_daily.clock()
+        stamp = now.timestamp()
+        ctx = Context(snap, positions)
+        self._align(snap.symbols)
+        hits = {}
+        for rule in self.rules:
+            prev, x = rule.x(ctx)
+            state = self.armed[rule.name]
+            seen = state >= 0
+            armed = np.where(seen, state == 1, ~rule.triggered(prev) if rule.cross else True)
+            cooled = self.last[rule.name] <= stamp - rule.cooldown.total_seconds()
+            fire = rule.triggered(x) & armed & cooled
+            armed = np.where(fire, False, armed | rule.clear(x))
+            state[:] = np.where(seen | np.isfinite(x), armed, -1)
+            self.last[rule.name][fire] = stamp
+            for col in np.flatnonzero(fire):
+                hits.setdefault(col, []).append(rule)
+
+        price = snap["Close"][-1]
+        alerts = []
+        for col, rules in hits.items():
+            a = Alert(snap.symbols[col].replace(".NS", ""), round(float(price[col]), 2), now)
+            for rule in rules:
+                a.rules.append(rule.name)
+                a.messages.append(rule.message)
+                a.priority = max(a.priority, rule.priority)
+            alerts.append(a)
+        alerts.sort(key=lambda a: (-a.priority, a.symbol))
+        self.last_ms = (time.perf_counter() - started) * 1000
+        return alerts
+
+    def deliver(self, alerts):
+        """Each sink gets one capped batch; what is over the cap is only counted"""
+        sent, dropped = alerts[:self.max_per_cycle], max(0, len(alerts) - self.max_per_cycle)
+        if sent or dropped:
+            for sink in self.sinks:
+                sink.send(sent, dropped)
+        return sent, dropped
+
+    def run(self, snap, positions=(), now=None, persist=True):
+        alerts = self.evaluate(snap, positions, now)
+        self.deliver(alerts)
+        if persist:
+            self.save()
+        return alerts
+
+
+def run_cycle(snap=None, persist=True):
+    """Evaluate every rule on a snapshot of the universe against the paper wallet's positions"""
+    import strategies
+
+    snap = snap or strategies.FeatureSnapshot.build()
+    engine = AlertEngine()
+    return engine.run(snap, india_daily.load_wallet()['positions'], persist=persist)
+
+
+# ---- benchmark ----
+
+def bench(symbols=2000, bars=300, cycles=5):
+    """Rule evaluation time on a synthetic universe (features are computed once up front, as in a cycle)"""
+    import strategies
+
+    rng = np.random.default_rng(3)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (bars, symbols)), axis=0))
+    fields = {"Close": close, "High": close * 1.01, "Low": close * 0.99, "Open": close, "Volume": np.ones_like(close)}
+    names = [f"SYN{i}.NS" for i in range(symbols)]
+    dates = np.arange(bars).astype("datetime64[D]")
+    snap = strategies.FeatureSnapshot(dates, names, fields, {})
+    positions = [{"symbol": f"SYN{i}", "stop_loss": close[-1, i] * 0.995, "target": close[-1, i] * 1.2}
+                 for i in range(0, symbols, 10)]
+    engine = AlertEngine(sinks=[], state_file=None)
+    first = engine.evaluate(snap, positions, datetime(2026, 1, 1))      # also warms the feature cache
+    sent, dropped = engine.deliver(first)
+    times = []
+    for day in range(cycles):
+        repeat = engine.evaluate(snap, positions, datetime(2026, 1, 2 + day))
+        times.append(engine.last_ms)
+    print(f"{len(engine.rules)} rules x {symbols} symbols = {len(engine.rules) * symbols} checks: "
+          f"median {np.median(times):.1f} ms per cycle")
+    print(f"first cycle: {len(first)} alerts, {len(sent)} sent, {dropped} over the cap; "
+          f"unchanged data again: {len(repeat)} alerts")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the alert rules on a fresh snapshot")
+    parser.add_argument("--dry-run", action="store_true", help="print alerts without sinks or saved state")
+    parser.add_argument("--bench", type=int, metavar="SYMBOLS", help="time rule evaluation on synthetic data")
+    parser.add_argument("--rules", action="store_true", help="list the rules")
+    args = parser.parse_args(argv)
+
+    if args.rules:
+        for r in RULES:
+            print(f"{r.name:18} {r.message:28} cooldown {r.cooldown}")
+        return
+    if args.bench:
+        bench(args.bench)
+        return
+    if args.dry_run:
+        import strategies
+
+        engine = AlertEngine(sinks=[], state_file=None)
+        alerts = engine.evaluate(strategies.FeatureSnapshot.build(), india_daily.load_wallet()['positions'])
+        for a in alerts:
+            print(a.line())
+        print(f"{len(alerts)} alerts in {engine.last_ms:.1f} ms")
+        return
+    alerts = run_cycle()
+    print(f"{len(alerts)} alerts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+KAI - Structured Event Log
+JSONL events (scan, signal, order, exit, error, alert, log) written by a buffered
+background thread into per-process, size-rotated segments, with a shared
+append-only per-day offset index so history queries only read the lines they
+need, and closed segments dropped after RETENTION_DAYS
+"""
+
+import argparse
+import atexit
+import fcntl
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+# Config
+EVENT_DIR = "/home/anand/.openclaw/workspace/trading/events"
+MAX_SEGMENT_BYTES = 8 * 1024 * 1024
+BATCH = 256             # events per write
+FLUSH_INTERVAL = 1.0    # seconds before a partial batch is written
+INDEX_INTERVAL = 10.0   # seconds between index snapshots
+INDEX_VERSION = 3       # per-day index shards; older indexes are rebuilt from the segments
+RETENTION_DAYS = 90     # closed segments whose last event is older than this are deleted
+TYPES = ["log", "scan", "signal", "order", "exit", "error", "alert"]
+
+_FLUSH = object()
+_STOP = object()
+
+
+class EventLog:
+    """emit() only enqueues; the writer thread owns this process's segment.
+
+    Each process appends to segments of its own (named by start time and pid)
+    and never reopens them, so the scheduler, `kai scan` and the dashboard
+    never interleave lines. The shared index lives in index/: state.json maps
+    segment ids to files, how far each is indexed and whether its writer is
+    still alive, and one append-only shard per day holds [seg, offset, type,
+    symbol] per event, with log lines kept as [seg, start, end] ranges instead.
+    Catching up happens under an flock, only looks at open segments and only
+    appends to shards, so a stale or missing state just costs a re-read.
+    """
+
+    def __init__(self, directory=EVENT_DIR, text_path=None, max_bytes=MAX_SEGMENT_BYTES):
+        self.dir = directory
+        self.text_path = text_path
+        self.max_bytes = max_bytes
+        self.index_dir = os.path.join(directory, "index")
+        self.state_path = os.path.join(self.index_dir, "state.json")
+        self.lock_path = os.path.join(directory, "index.lock")
+        self.lock = threading.Lock()
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.stamp = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.parts = 0
+        self.finished = set()   # this process's segments it will never write again
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="eventlog", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # ---- writer side ----
+
+    def emit(self, type, ts=None, symbol=None, **fields):
+        ts = ts or datetime.now()
+        event = {"ts": ts.isoformat(timespec="seconds") if isinstance(ts, datetime) else ts, "type": type}
+        if symbol:
+            event["symbol"] = symbol.replace(".NS", "")
+        event.update(fields)
+        self.queue.put(event)
+
+    def flush(self, timeout=5.0):
+        done = threading.Event()
+        self.queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join(5.0)
+
+    def _new_segment(self):
+        """This process's next segment, created on first write"""
+        self.parts += 1
+        return open(os.path.join(self.dir, f"events-{self.stamp}-{self.parts:03d}.jsonl"), "ab",
+                    buffering=1024 * 1024)
+
+    def _run(self):
+        f = None
+        pos = 0
+        text = None
+        pending = []
+        last_index = time.monotonic()
+        dirty = False
+        stopping = False
+        while not stopping:
+            waiters = []
+            try:
+                item = self.queue.get(timeout=FLUSH_INTERVAL)
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                    elif isinstance(item, tuple) and item[0] is _FLUSH:
+                        waiters.append(item[1])
+                    else:
+                        pending.append(item)
+                    if len(pending) >= BATCH or stopping:
+                        break
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                if pending:
+                    if f is None or pos >= self.max_bytes:
+                        if f is not None:
+                            f.close()
+                            self.finished.add(os.path.basename(f.name))
+                        f, pos = self._new_segment(), 0
+                    data = b"".join((json.dumps(e, ensure_ascii=False, default=str) + "\n").encode()
+                                    for e in pending)
+                    f.write(data)
+                    f.flush()
+                    pos += len(data)
+                    dirty = True
+                    if self.text_path:
+                        text = text or open(self.text_path, "a", buffering=64 * 1024)
+                        for event in pending:
+                            if event["type"] == "log":
+                                text.write(f"[{event['ts'][:16].replace('T', ' ')}] {event.get('msg', '')}\n")
+                        text.flush()
+                if stopping and f is not None:
+                    f.close()
+                    self.finished.add(os.path.basename(f.name))
+                    f = None
+                now = time.monotonic()
+                if dirty and (stopping or now - last_index >= INDEX_INTERVAL):
+                    self.sync()
+                    dirty = False
+                    last_index = now
+            except Exception as e:      # never let the writer die: emit() would drop events silently
+                print(f"eventlog: {len(pending)} events not written: {type(e).__name__}: {e}", file=sys.stderr)
+            finally:
+                pending = []
+                for w in waiters:
+                    w.set()
+        for handle in (f, text):
+            if handle is not None:
+                handle.close()
+
+    # ---- index ----
+
+    def sync(self):
+        """Catch the shared index up on every process's open segments and save it. Returns the state."""
+        with self.lock, open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)        # released when the file closes
+            state = self._load_state()
+            changed = self._catch_up(state)
+            changed |= self._prune(state)
+            if changed:
+                self._save_state(state)
+        return state
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+        if not state or state.get("version") != INDEX_VERSION:
+            for name in os.listdir(self.index_dir):     # shards of a lost state would be indexed twice
+                if name.endswith(".jsonl"):
+                    os.remove(os.path.join(self.index_dir, name))
+            state = {"version": INDEX_VERSION, "next": 0, "segments": {}, "pruned": ""}
+        return state
+
+    def _catch_up(self, state):
+        """Index complete lines past each open segment's indexed end; a torn tail
+        (a writer mid-line or killed) waits for the next catch-up. A segment is
+        closed once its writer has rotated past it or exited, and never read
+        here again. Returns whether anything changed."""
+        known = {seg["name"] for seg in state["segments"].values()}
+        changed = False
+        for name in sorted(os.listdir(self.dir)):
+            if name.startswith("events-") and name.endswith(".jsonl") and name not in known:
+                state["segments"][str(state["next"])] = {"name": name, "end": 0, "open": True, "last": None}
+                state["next"] += 1
+                changed = True
+
+        shards = {}
+        for sid, seg in state["segments"].items():
+            if not seg["open"]:
+                continue
+            done = self._writer_done(seg["name"])       # before reading, so nothing written after is missed
+            path = os.path.join(self.dir, seg["name"])
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size, done = seg["end"], True
+            if size > seg["end"]:
+                changed |= _index_segment(path, int(sid), seg, shards)
+            if done:
+                seg["open"] = False
+                self.finished.discard(seg["name"])
+                changed = True
+        for day, entries in shards.items():
+            with open(os.path.join(self.index_dir, day + ".jsonl"), "a") as f:
+                f.write("".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries))
+        return changed
+
+    def _writer_done(self, name):
+        parts = name.split("-")
+        if len(parts) != 5:         # events-NNNNNN.jsonl from the single-writer log: nobody appends to it
+            return True
+        pid = int(parts[3])
+        if pid == os.getpid():
+            return name in self.finished
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def _prune(self, state):
+        """Once a day, delete closed segments and index shards older than RETENTION_DAYS"""
+        cutoff = (date.today() - timedelta(days=RETENTION_DAYS)).isoformat()
+        if state.get("pruned", "") >= cutoff:
+            return False
+        for sid, seg in list(state["segments"].items()):
+            if not seg["open"] and (seg["last"] or "") < cutoff:
+                try:
+                    os.remove(os.path.join(self.dir, seg["name"]))
+                except FileNotFoundError:
+                    pass
+                del state["segments"][sid]
+        for name in os.listdir(self.index_dir):
+            if name.endswith(".jsonl") and name[:10] < cutoff:
+                os.remove(os.path.join(self.index_dir, name))
+        state["pruned"] = cutoff
+        return True
+
+    def _save_state(self, state):
+        tmp = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp, self.state_path)
+
+    # ---- reader side ----
+
+    def query(self, symbol=None, type=None, start=None, end=None):
+        """Events for one symbol and/or type between two dates (inclusive), oldest first.
+        Only the day shards in range and the matching lines are read."""
+        self.flush()
+        state = self.sync()
+        names = {int(sid): seg["name"] for sid, seg in state["segments"].items()}
+        want = TYPES.index(type) if type in TYPES else type
+        logs = symbol is None and type in (None, "log")
+        symbol = symbol.replace(".NS", "") if symbol else None
+        start = _as_date(start).isoformat() if start else ""
+        end = (_as_date(end) or date.today()).isoformat()
+
+        points, ranges = set(), []
+        for name in sorted(os.listdir(self.index_dir)):
+            day = name[:-len(".jsonl")]
+            if not name.endswith(".jsonl") or not start <= day <= end:
+                continue
+            with open(os.path.join(self.index_dir, name)) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if len(entry) == 3:
+                        if logs:
+                            ranges.append(entry)
+                    elif (symbol is None or entry[3] == symbol) and (type is None or entry[2] == want):
+                        points.add((entry[0], entry[1]))
+
+        events = []
+        handles = {}
+        try:
+            for seg, off in sorted(points):
+                f = _handle(handles, self.dir, names.get(seg))
+                if f is not None:
+                    f.seek(off)
+                    events.append(json.loads(f.readline()))
+            seen = set()
+            for seg, lo, hi in sorted(ranges):
+                f = _handle(handles, self.dir, names.get(seg))
+                if f is None:
+                    continue
+                f.seek(lo)
+                while lo < hi:
+                    line = f.readline()
+                    event = json.loads(line)
+                    if event["type"] == "log" and start <= event["ts"][:10] <= end and (seg, lo) not in seen:
+                        seen.add((seg, lo))
+                        events.append(event)
+                    lo += len(line)
+        finally:
+            for f in handles.values():
+                if f is not None:
+                    f.close()
+        events.sort(key=lambda e: e["ts"])     # several processes' segments interleave in time
+        yield from events
+
+
+def _index_segment(path, sid, seg, shards):
+    """Add a segment's new complete lines to shards (day -> entries). Returns whether any were read."""
+    pos = seg["end"]
+    logs = {}
+    with open(path, "rb") as f:
+        f.seek(pos)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                event = json.loads(line)
+                day = event["ts"][:10]
+                if event["type"] == "log":      # the bulk of the log and never queried by symbol
+                    logs.setdefault(day, [pos, pos])[1] = pos + len(line)
+                else:
+                    t = TYPES.index(event["type"]) if event["type"] in TYPES else event["type"]
+                    shards.setdefault(day, []).append([sid, pos, t, event.get("symbol", "")])
+                seg["last"] = max(seg["last"] or day, day)
+            except (ValueError, KeyError, TypeError):
+                pass
+            pos += len(line)
+    for day, (lo, hi) in logs.items():
+        shards.setdefault(day, []).append([sid, lo, hi])
+    read = pos != seg["end"]
+    seg["end"] = pos
+    return read
+
+
+def _handle(handles, directory, name):
+    """Open segment file by name, cached; None when it has been pruned"""
+    if name not in handles:
+        try:
+            handles[name] = open(os.path.join(directory, name), "rb") if name else None
+        except FileNotFoundError:
+            handles[name] = None
+    return handles[name]
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default(text_path=None):
+    """Process-wide event log, created on first use"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = EventLog(EVENT_DIR, text_path=text_path)
+        return _default
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the KAI event log")
+    parser.add_argument("--symbol")
+    parser.add_argument("--type", choices=TYPES)
+    parser.add_argument("--start", help="YYYY-MM-DD (default: first day logged)")
+    parser.add_argument("--end", help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--dir", default=EVENT_DIR)
+    args = parser.parse_args()
+
+    events = EventLog(args.dir)
+    for event in events.query(args.symbol, args.type, args.start, args.end):
+        print(json.dumps(event, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+KAI - Local Fake Quote Server
+Serves deterministic quotes on localhost and injects throttling, errors,
+timeouts and bad symbols so the governor can be exercised offline
+"""
+
+import json
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from governor import NoData
+from market_data import fetch_quote
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128    # the default 5 drops SYNs when every governor worker connects at once
+
+
+class FakeUpstream:
+    """GET /quote/<SYMBOL> -> {"symbol", "regularMarketPrice"}"""
+
+    def __init__(self, throttle_rate=0.0, error_rate=0.0, timeout_rate=0.0, bad_symbols=(),
+                 latency=0.0, max_rps=None, seed=42, port=0):
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.bad_symbols = set(bad_symbols)
+        self.latency = latency
+        self.max_rps = max_rps
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.hits = 0
+        self.server = _Server(("127.0.0.1", port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @staticmethod
+    def price(symbol):
+        return round(100 + zlib.crc32(symbol.encode()) % 500000 / 100, 2)
+
+    def _decide(self, symbol):
+        with self.lock:
+            self.hits += 1
+            now = time.monotonic()
+            self.recent.append(now)
+            while self.recent and now - self.recent[0] > 1.0:
+                self.recent.popleft()
+            if self.max_rps and len(self.recent) > self.max_rps:
+                return 429
+            if symbol in self.bad_symbols:
+                return 404
+            r = self.rng.random()
+        if r < self.throttle_rate:
+            return 429
+        if r < self.throttle_rate + self.error_rate:
+            return 503
+        if r < self.throttle_rate + self.error_rate + self.timeout_rate:
+            return "timeout"
+        return 200
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if len(parts) != 2 or parts[0] != "quote":
+                    return self._send(404, {"error": "unknown path"})
+                symbol = parts[1]
+                if upstream.latency:
+                    time.sleep(upstream.latency)
+                outcome = upstream._decide(symbol)
+                if outcome == "timeout":
+                    time.sleep(5)
+                    return self._send(504, {"error": "gateway timeout"})
+                if outcome != 200:
+                    return self._send(outcome, {"error": f"injected {outcome}"})
+                self._send(200, {"symbol": symbol, "regularMarketPrice": upstream.price(symbol)})
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def check_load():
+    """Fetch 200 quotes through injected throttling/errors/timeouts: every good
+    symbol must arrive and only the bad ones may fail. Returns failures."""
+    from governor import Governor
+
+    symbols = [f"SYM{i}" for i in range(200)] + ["DELISTED1", "DELISTED2"]
+    with FakeUpstream(throttle_rate=0.01, error_rate=0.05, timeout_rate=0.01,
+                      bad_symbols={"DELISTED1", "DELISTED2"}, max_rps=80, latency=0.01) as up:
+        gov = Governor("fake", rate=40, burst=20, max_rate=200, max_workers=16, retries=3,
+                       backoff_base=0.05, breaker_cooldown=2)
+        start = time.perf_counter()
+        quotes = gov.map(lambda s: gov.fetch(s, fetch_quote, up.url, s, 1.0), symbols)
+        elapsed = time.perf_counter() - start
+        got = sum(1 for q in quotes if q)
+        print(f"{got}/{len(symbols)} quotes in {elapsed:.2f}s ({got / elapsed:.0f}/s), "
+              f"{up.hits} upstream hits")
+        for line in gov.summary():
+            print(line)
+    failures = 0
+    missing = [s for s, q in zip(symbols, quotes) if not q and not s.startswith("DELISTED")]
+    if missing:
+        print(f"FAIL {len(missing)} good symbols missing: {missing[:5]}")
+        failures += 1
+    failed = gov.report()["failures"]
+    if {k: f["kind"] for k, f in failed.items()} != {"DELISTED1": "permanent", "DELISTED2": "permanent"}:
+        print(f"FAIL unexpected failures: {failed}")
+        failures += 1
+    return failures
+
+
+def check_breaker():
+    """Breaker and negative cache edge cases, without a server. Returns failures."""
+    from governor import Governor
+
+    def down():
+        raise ConnectionError("connection refused")
+
+    def empty():
+        raise NoData("no 1d bars")
+
+    def broken():
+        raise ValueError("unparseable")
+
+    failures = 0
+    for probe in (empty, broken):
+        gov = Governor("probe", rate=1000, burst=1000, retries=0, breaker_threshold=2, breaker_cooldown=0.05)
+        for _ in range(2):
+            gov.fetch("X", down)
+        time.sleep(0.06)
+        gov.fetch("X", probe)
+        if gov.fetch("Y", lambda: 1) != 1:
+            print(f"FAIL half-open probe answered by {probe.__name__} left the breaker {gov.breaker.state}")
+            failures += 1
+
+    gov = Governor("outage", rate=1000, burst=1000, retries=0, breaker_threshold=5, breaker_cooldown=60)
+    for i in range(20):             # DNS down: yfinance hands back an empty frame for every symbol
+        gov.fetch(f"SYM{i}", empty)
+    if gov.breaker.state != "open" or not gov.stats["short_circuited"]:
+        print(f"FAIL an all-empty outage left the breaker {gov.breaker.state}")
+        failures += 1
+
+    gov = Governor("nodata", rate=1000, burst=1000, retries=0, negative_after=3)
+    calls = []
+
+    def counted():
+        calls.append(1)
+        empty()
+
+    for _ in range(5):
+        gov.fetch("Z", counted)
+    if len(calls) != 3 or gov.stats["negative_hits"] != 2:
+        print(f"FAIL negative cache: {len(calls)} upstream calls, {gov.stats['negative_hits']} negative hits")
+        failures += 1
+    gov.fetch("W", empty)
+    if gov.fetch("W", lambda: 1) != 1:
+        print("FAIL a single empty answer was negatively cached")
+        failures += 1
+    return failures
+
+
+def main():
+    failures = check_breaker() + check_load()
+    print("governor check: " + ("ok" if not failures else f"{failures} failures"))
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+KAI - Upstream Request Governor
+Rate limiting, retry/backoff, negative caching and circuit breaking for market data calls
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Config
+RATE = 4.0              # steady-state requests/sec
+BURST = 8               # token bucket depth
+MIN_RATE = 0.5          # floor after repeated throttling
+MAX_RATE = 20.0         # ceiling for additive increase
+RATE_STEP = 0.1         # requests/sec regained per success
+RATE_CUT = 0.7          # multiplicative decrease on throttling
+CUT_INTERVAL = 1.0      # at most one decrease per interval (in-flight 429s arrive together)
+MAX_WORKERS = 8         # concurrent in-flight calls
+RETRIES = 4
+BACKOFF_BASE = 0.5      # seconds
+BACKOFF_CAP = 30.0
+NEGATIVE_TTL = 6 * 3600 # bad symbols are not retried for this long
+NEGATIVE_AFTER = 3      # ... once they answered "no data" this many calls in a row (an outage looks the same once)
+BREAKER_THRESHOLD = 8   # consecutive failures before the circuit opens
+BREAKER_COOLDOWN = 60.0
+
+
+class UpstreamError(Exception):
+    """A failed upstream call. kind is throttle, transient, permanent or error."""
+
+    def __init__(self, reason, kind="transient", key=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.kind = kind
+        self.key = key
+
+
+class NoData(UpstreamError):
+    """Upstream answered but had nothing for this symbol (delisted, bad ticker)"""
+
+    def __init__(self, reason, key=None):
+        super().__init__(reason, "permanent", key)
+
+
+class CircuitOpen(UpstreamError):
+    def __init__(self, reason, key=None):
+        super().__init__(reason, "circuit", key)
+
+
+def classify(exc):
+    """Map an exception raised by yfinance/requests/urllib to a failure kind"""
+    if isinstance(exc, UpstreamError):
+        return exc.kind
+    name = type(exc).__name__.lower()
+    text = str(exc).lower()
+    if "ratelimit" in name or "429" in text or "too many requests" in text or "rate limit" in text:
+        return "throttle"
+    if "404" in text or "delisted" in text or "no data found" in text or "not found" in text:
+        return "permanent"
+    if isinstance(exc, (TimeoutError, ConnectionError, OSError)) or "timeout" in name or "connection" in name:
+        return "transient"
+    if "timed out" in text or "503" in text or "502" in text or "500" in text:
+        return "transient"
+    return "error"
+
+
+def backoff(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts AIMD-style to throttling"""
+
+    def __init__(self, rate=RATE, burst=BURST, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.last_cut = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_cut < CUT_INTERVAL:
+                return
+            self.last_cut = now
+            self.rate = max(self.min_rate, self.rate * RATE_CUT)
+            self.tokens = min(self.tokens, 0.0)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + RATE_STEP)
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open probe after cooldown"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+
+    def release(self):
+        """End a half-open probe that proved nothing either way; the next call probes again"""
+        with self.lock:
+            self.probing = False
+
+    def record_empty(self):
+        """A "no data" answer: a delisted symbol and a network outage (yfinance
+        returns empty frames for both) look the same, so it neither closes the
+        breaker nor reopens it from half-open, but a run of them with no real
+        result in between still trips it"""
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == "closed" and self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class Governor:
+    """Shared gate for every call to one upstream"""
+
+    def __init__(self, name, rate=RATE, burst=BURST, max_rate=MAX_RATE, max_workers=MAX_WORKERS, retries=RETRIES,
+                 negative_ttl=NEGATIVE_TTL, negative_after=NEGATIVE_AFTER, breaker_threshold=BREAKER_THRESHOLD,
+                 breaker_cooldown=BREAKER_COOLDOWN, backoff_base=BACKOFF_BASE):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst, max_rate=max_rate)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.max_workers = max_workers
+        self.retries = retries
+        self.negative_ttl = negative_ttl
+        self.negative_after = negative_after
+        self.backoff_base = backoff_base
+        self.negative = {}
+        self.nodata = Counter()     # key -> consecutive "no data" answers
+        self.failures = {}
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def _fail(self, key, kind, reason):
+        with self.lock:
+            self.failures[key] = (kind, reason)
+            self.stats["failed_" + kind] += 1
+        return UpstreamError(reason, kind, key)
+
+    def call(self, key, fn, *args, **kwargs):
+        """Run fn(*args) under the rate limit, retrying transient failures.
+        Raises UpstreamError (with .kind and .reason) once it gives up."""
+        neg = self.negative.get(key)
+        if neg and neg[0] > time.monotonic():
+            self.stats["negative_hits"] += 1
+            raise self._fail(key, "permanent", neg[1])
+
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.stats["short_circuited"] += 1
+                raise self._fail(key, "circuit", f"{self.name} circuit open")
+
+            self.bucket.acquire()
+            with self.slots:
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    kind = classify(e)
+                    reason = e.reason if isinstance(e, UpstreamError) else f"{type(e).__name__}: {e}"
+                except BaseException:
+                    self.breaker.release()      # KeyboardInterrupt etc. mid-probe
+                    raise
+                else:
+                    self.bucket.succeeded()
+                    self.breaker.record_success()
+                    self.stats["ok"] += 1
+                    with self.lock:
+                        self.failures.pop(key, None)
+                        self.nodata.pop(key, None)
+                    return result
+
+            if kind == "permanent":
+                self.breaker.record_empty()
+                with self.lock:
+                    self.nodata[key] += 1
+                    if self.nodata[key] >= self.negative_after:
+                        self.negative[key] = (time.monotonic() + self.negative_ttl, reason)
+                raise self._fail(key, kind, reason)
+            if kind == "error":
+                self.breaker.release()
+                raise self._fail(key, kind, reason)
+
+            if kind == "throttle":
+                self.stats["throttled"] += 1
+                self.bucket.throttled()
+            self.breaker.record_failure()
+            if attempt == self.retries:
+                raise self._fail(key, kind, f"{reason} (after {attempt + 1} attempts)")
+            self.stats["retries"] += 1
+            time.sleep(backoff(attempt, self.backoff_base))
+
+    def fetch(self, key, fn, *args, default=None, **kwargs):
+        """Like call() but returns default on failure; the failure stays in report()"""
+        try:
+            return self.call(key, fn, *args, **kwargs)
+        except UpstreamError:
+            return default
+
+    def map(self, fn, items):
+        """Apply fn to items concurrently, bounded by max_workers, preserving order"""
+        items = list(items)
+        if len(items) <= 1:
+            return [fn(i) for i in items]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            return list(ex.map(fn, items))
+
+    def report(self):
+        with self.lock:
+            return {
+                "upstream": self.name,
+                "ok": self.stats["ok"],
+                "retries": self.stats["retries"],
+                "throttled": self.stats["throttled"],
+                "negative_hits": self.stats["negative_hits"],
+                "short_circuited": self.stats["short_circuited"],
+                "rate": round(self.bucket.rate, 2),
+                "breaker": self.breaker.state,
+                "failures": {k: {"kind": kind, "reason": reason} for k, (kind, reason) in self.failures.items()},
+            }
+
+    def summary(self):
+        """One-line summary plus one line per failed key, for the logs"""
+        r = self.report()
+        lines = [f"{r['upstream']}: {r['ok']} ok | {len(r['failures'])} failed | {r['retries']} retries | "
+                 f"{r['throttled']} throttled | rate {r['rate']}/s | breaker {r['breaker']}"]
+        for key, f in sorted(r["failures"].items()):
+            lines.append(f"   {key}: {f['kind']} - {f['reason']}")
+        return lines
+
+    def reset_report(self):
+        with self.lock:
+            self.failures.clear()
+            self.stats.clear()
+
+
+# Shared governor for Yahoo Finance
+yahoo = Governor("yahoo")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+KAI - Incremental Scanning
+Change detection for analyze(): each feature is cached under a fingerprint of
+its inputs (the bar bytes, the info fields it reads) plus its own version, so
+a re-run recomputes only symbols whose data moved and bumping one rule's
+version invalidates only the features built on it
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+# Config
+CACHE_FILE = "/home/anand/.openclaw/workspace/trading/cache/results.pkl"
+MAX_ENTRIES = 20_000
+BAR_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+_lock = threading.Lock()
+_cache = None           # OrderedDict (feature, version, key) -> value, loaded on first use
+_current = {}           # feature -> version seen this process (older versions are pruned on save)
+_dirty = False
+stats = {}              # feature -> [reused, computed]
+
+
+def fingerprint_bars(df):
+    """Hash of a bar frame's timestamps and OHLCV values"""
+    if df is None:
+        return "none"
+    import numpy as np
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(df.index.values).tobytes())
+    cols = [c for c in BAR_FIELDS if c in df]
+    h.update(np.ascontiguousarray(df[cols].to_numpy(dtype=float)).tobytes())
+    return h.hexdigest()
+
+
+def fingerprint_info(info, keys):
+    """Hash of only the info fields a feature reads, so unrelated fields don't dirty it"""
+    values = [info.get(k) for k in keys] if info else []
+    raw = json.dumps(values, default=str).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _load():
+    global _cache
+    if _cache is None:
+        try:
+            with open(CACHE_FILE, "rb") as f:
+                _cache = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            _cache = OrderedDict()
+    return _cache
+
+
+def memo(feature, version, key, fn, *args):
+    """fn(*args), reused while (feature, version, key) is unchanged"""
+    global _dirty
+    full = (feature, version, key)
+    with _lock:
+        cache = _load()
+        _current[feature] = version
+        count = stats.setdefault(feature, [0, 0])
+        if full in cache:
+            cache.move_to_end(full)
+            count[0] += 1
+            return cache[full]
+    value = fn(*args)
+    with _lock:
+        cache[full] = value
+        while len(cache) > MAX_ENTRIES:
+            cache.popitem(last=False)
+        count[1] += 1
+        _dirty = True
+    return value
+
+
+def save(path=None):
+    """Persist the cache (dropping entries from superseded feature versions)"""
+    global _dirty
+    path = path or CACHE_FILE
+    with _lock:
+        if _cache is None or not _dirty:
+            return
+        for full in [k for k in _cache if k[0] in _current and k[1] != _current[k[0]]]:
+            del _cache[full]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        _dirty = False
+
+
+def clear():
+    """Forget everything (in memory; the next save() overwrites the file)"""
+    global _cache, _dirty
+    with _lock:
+        _cache = OrderedDict()
+        _dirty = True
+        stats.clear()
+
+
+def reset_stats():
+    with _lock:
+        stats.clear()
+
+
+def summary():
+    """e.g. "daily.technicals 50/52 reused" per feature"""
+    with _lock:
+        return [f"{name} {hit}/{hit + miss} reused" for name, (hit, miss) in sorted(stats.items())]
@@ -4,10 +4,19 @@ KAI - Advanced Indian Market Analyzer V3
 Technical + Fundamental + Multi-timeframe
 """
 
-import yfinance as yf
 import numpy as np
 from datetime import datetime
 
+import incremental
+import levels
+import market_data
+import risk
+import rotation
+import scan_store
+import snapshot
+from governor import yahoo
+from india_daily import load_wallet
+
 STOCKS = {
     "NIFTY_50": [
         "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS",
@@ -30,15 +39,18 @@ STOCKS = {
     "MIDCAP": ["POLYCAB.NS", "HAVELLS.NS", "MARICO.NS", "DABUR.NS", "PIDILITIND.NS", "COROMANDEL.NS"]
 }
 
+# Bump a version when its rule changes: only that feature (and the score built
+# on it) is recomputed, everything else comes from the result cache
+FEATURE_VERSIONS = {"technicals": 2, "weekly": 1, "fundamentals": 1, "score": 1}
+FUNDAMENTAL_KEYS = ("trailingPE", "priceToBook", "marketCap", "returnOnEquity", "totalDebt", "revenueGrowth")
+
 def get_data(symbol):
-    try:
-        t = yf.Ticker(symbol)
-        df_d = t.history(period="1y", interval="1d")
-        df_w = t.history(period="2y", interval="1wk")
-        info = t.info
-        return df_d, df_w, info
-    except:
+    """Daily + weekly bars and info from the shared cache"""
+    df_d = market_data.get_bars(symbol, "1y", "1d")
+    if df_d is None:
         return None, None, None
+    df_w = market_data.get_bars(symbol, "2y", "1wk")
+    return df_d, df_w, market_data.get_info(symbol)
 
 def calc_ema(closes, period):
     if len(closes) < period:
@@ -107,41 +119,42 @@ def calc_vwap(high, low, close, volume):
     typical_price = (high + low + close) / 3
     return (typical_price * volume).sum() / volume.sum()
 
-def analyze(symbol, category):
-    df_d, df_w, info = get_data(symbol)
-    if df_d is None or len(df_d) < 50:
-        return None
-    
+def technicals(df_d):
+    """Daily-bar features (cached per bar fingerprint)"""
     close = df_d['Close'].values
     high = df_d['High'].values
     low = df_d['Low'].values
-    volume = df_d['Volume'].values
     
-    current = close[-1]
-    
-    # Technicals
-    rsi = calc_rsi(close)
-    ema9 = calc_ema(close, 9)
-    ema21 = calc_ema(close, 21)
-    ema50 = calc_ema(close, 50)
-    ema200 = calc_ema(close, 200)
     macd, signal, hist = calc_macd(close)
     bb_upper, bb_mid, bb_lower = calc_bollinger(close)
-    atr = calc_atr(high, low, close)
-    
-    # Weekly trend
-    if len(df_w) > 20:
+    support, resistance = levels.nearest(high, low, close[-1])
+    return {
+        "price": close[-1],
+        "rsi": calc_rsi(close),
+        "ema9": calc_ema(close, 9),
+        "ema21": calc_ema(close, 21),
+        "ema50": calc_ema(close, 50),
+        "ema200": calc_ema(close, 200),
+        "macd": macd, "macd_signal": signal, "macd_hist": hist,
+        "bb_upper": bb_upper, "bb_lower": bb_lower,
+        "atr": calc_atr(high, low, close),
+        # Support/Resistance: nearest pivot levels around the price
+        "support": support,
+        "resistance": resistance,
+        # Returns
+        "ret_1w": ((close[-1] / close[-5]) - 1) * 100 if len(close) >= 5 else 0,
+        "ret_1m": ((close[-1] / close[-20]) - 1) * 100 if len(close) >= 20 else 0,
+        "ret_3m": ((close[-1] / close[-60]) - 1) * 100 if len(close) >= 60 else 0,
+    }
+
+def weekly(df_w):
+    if df_w is not None and len(df_w) > 20:
         w_close = df_w['Close'].values
         w_ema21 = calc_ema(w_close, 21)
-        weekly_trend = "BULLISH" if w_ema21 and w_close[-1] > w_ema21 else "BEARISH"
-    else:
-        weekly_trend = "NEUTRAL"
-    
-    # Support/Resistance
-    sup = low[-20:].min()
-    res = high[-20:].max()
-    
-    # Fundamentals
+        return "BULLISH" if w_ema21 and w_close[-1] > w_ema21 else "BEARISH"
+    return "NEUTRAL"
+
+def fundamentals(info):
     try:
         pe = info.get('trailingPE', 0) or 0
         pb = info.get('priceToBook', 0) or 0
@@ -151,11 +164,15 @@ def analyze(symbol, category):
         rev = info.get('revenueGrowth', 0) or 0
     except:
         pe = pb = mcap = roe = debt = rev = 0
-    
-    # Returns
-    ret_1w = ((close[-1] / close[-5]) - 1) * 100 if len(close) >= 5 else 0
-    ret_1m = ((close[-1] / close[-20]) - 1) * 100 if len(close) >= 20 else 0
-    ret_3m = ((close[-1] / close[-60]) - 1) * 100 if len(close) >= 60 else 0
+    return {"pe": pe, "pb": pb, "mcap": mcap, "roe": roe, "debt": debt, "rev": rev}
+
+def score(t, weekly_trend, f):
+    """(score, signals) from the daily, weekly and fundamental features"""
+    current, rsi = t['price'], t['rsi']
+    ema9, ema21, ema50, ema200 = t['ema9'], t['ema21'], t['ema50'], t['ema200']
+    macd, signal, hist = t['macd'], t['macd_signal'], t['macd_hist']
+    sup, res = t['support'], t['resistance']
+    pe, roe = f['pe'], f['roe']
     
     # Scoring
     score = 0
@@ -231,37 +248,90 @@ def analyze(symbol, category):
         score += 1
         signals.append(f"Weekly {weekly_trend}")
     
+    return score, signals
+
+def analyze(symbol, category):
+    df_d, df_w, info = get_data(symbol)
+    if df_d is None or len(df_d) < 50:
+        return None
+    
+    # Each feature is reused until its inputs or its version change; the score
+    # is versioned by every feature it is built on
+    bars = incremental.fingerprint_bars(df_d)
+    w_bars = incremental.fingerprint_bars(df_w)
+    facts = incremental.fingerprint_info(info, FUNDAMENTAL_KEYS)
+    t = incremental.memo("v3.technicals", FEATURE_VERSIONS['technicals'], bars, technicals, df_d)
+    weekly_trend = incremental.memo("v3.weekly", FEATURE_VERSIONS['weekly'], w_bars, weekly, df_w)
+    f = incremental.memo("v3.fundamentals", FEATURE_VERSIONS['fundamentals'], facts, fundamentals, info)
+    s, signals = incremental.memo("v3.score", tuple(FEATURE_VERSIONS.values()), (bars, w_bars, facts),
+                                  score, t, weekly_trend, f)
+    
     name = symbol.replace('.NS', '')
     
     return {
         "name": name,
         "symbol": symbol,
         "category": category,
-        "price": current,
-        "rsi": rsi,
-        "ema9": ema9,
-        "ema21": ema21,
-        "ema50": ema50,
-        "ema200": ema200,
-        "macd": macd,
-        "macd_hist": hist,
-        "bb_upper": bb_upper,
-        "bb_lower": bb_lower,
-        "atr": atr,
-        "support": sup,
-        "resistance": res,
+        "price": t['price'],
+        "rsi": t['rsi'],
+        "ema9": t['ema9'],
+        "ema21": t['ema21'],
+        "ema50": t['ema50'],
+        "ema200": t['ema200'],
+        "macd": t['macd'],
+        "macd_hist": t['macd_hist'],
+        "bb_upper": t['bb_upper'],
+        "bb_lower": t['bb_lower'],
+        "atr": t['atr'],
+        "support": t['support'],
+        "resistance": t['resistance'],
         "weekly_trend": weekly_trend,
-        "pe": pe,
-        "pb": pb,
-        "mcap": mcap,
-        "roe": roe,
-        "ret_1w": ret_1w,
-        "ret_1m": ret_1m,
-        "ret_3m": ret_3m,
-        "score": score,
-        "signals": signals
+        "pe": f['pe'],
+        "pb": f['pb'],
+        "mcap": f['mcap'],
+        "roe": f['roe'],
+        "ret_1w": t['ret_1w'],
+        "ret_1m": t['ret_1m'],
+        "ret_3m": t['ret_3m'],
+        "score": s,
+        "signals": list(signals)
     }
 
+def risk_rank(results, wallet):
+    """ATR sizing and risk-adjusted score for every result, ranked in one matrix pass
+    against the current wallet. Returns (unique results best-first, wallet risk report)."""
+    unique = list({r['symbol']: r for r in results}.values())
+    held = {p['symbol'] + ".NS": p for p in wallet['positions']}
+    _, syms, close = market_data.price_matrix([r['symbol'] for r in unique] + list(held))
+    if not syms:
+        return [], None
+    
+    col = {s: i for i, s in enumerate(syms)}
+    capital = wallet['capital']
+    price = close[-1]
+    scores = np.zeros(len(syms))
+    atr = np.zeros(len(syms))
+    weights = np.zeros(len(syms))
+    for r in unique:
+        scores[col[r['symbol']]] = r['score']
+        atr[col[r['symbol']]] = r['atr'] or 0
+    for sym, pos in held.items():
+        if sym in col:
+            weights[col[sym]] += pos['qty'] * price[col[sym]] / capital
+    
+    returns = risk.log_returns(close)
+    qty, stop, target = risk.atr_position_size(capital, price, atr)
+    ranks = risk.rank_universe(scores, returns, weights, qty * price / capital)
+    
+    for r in unique:
+        i = col[r['symbol']]
+        r.update(qty=int(qty[i]), stop=stop[i], target=target[i], vol=ranks['vol'][i],
+                 added_var=ranks['added_var'][i], risk_adj=ranks['risk_adjusted'][i])
+    unique = [r for r in unique if np.isfinite(r['risk_adj'])]     # zero-vol bars: stale or suspended
+    unique.sort(key=lambda r: r['risk_adj'], reverse=True)
+    report = risk.portfolio_report(syms, returns, weights) if weights.any() else None
+    return unique, report
+
 def run():
     print("\n" + "="*75)
     print("KAI V3 - ADVANCED INDIAN MARKET ANALYSIS")
@@ -269,19 +339,27 @@ def run():
     print("="*75)
     
     results = []
+    yahoo.reset_report()
+    incremental.reset_stats()
     
     for category, symbols in STOCKS.items():
         print(f"Analyzing {category}...", end=" ", flush=True)
-        count = 0
-        for sym in symbols:
-            r = analyze(sym, category)
-            if r:
-                results.append(r)
-                count += 1
-            print(".", end="", flush=True)
-        print(f" {count} stocks")
+        found = [r for r in market_data.map(lambda sym: analyze(sym, category), symbols) if r]
+        results.extend(found)
+        print(f" {len(found)} stocks")
+    
+    if yahoo.report()['failures']:
+        print("\n⚠️ Upstream failures:")
+        for line in yahoo.summary():
+            print(line)
     
     results.sort(key=lambda x: x['score'], reverse=True)
+    scan_store.record_scan(results, "v3")
+    incremental.save()
+    snapshot.publish("v3", results, FUNDAMENTAL_KEYS)
+    reused = incremental.stats.get("v3.technicals", [0, 0])[0]
+    if reused:
+        print(f"♻️ {reused}/{len(results)} results served from the result cache")
     
     # BUY SIGNALS
     print("\n" + "="*75)
@@ -323,21 +401,39 @@ def run():
             s = "🟢" if avg > 1 else "🔴" if avg < -1 else "🟡"
             print(f"{cat:12} {s} Score: {avg:+.1f} | Buy: {buy} | Sell: {sell}")
     
+    # SECTOR ROTATION (same cached bars; the saved state only advances by the new days)
+    rot = rotation.refresh(sectors=STOCKS)
+    if rot is not None:
+        print()
+        for line in rotation.format_view(rot, top=5):
+            print(line)
+    
+    # PORTFOLIO RISK
+    ranked, report = risk_rank(results, load_wallet())
+    if report:
+        print("\n" + "="*75)
+        print("🛡️ PORTFOLIO RISK")
+        print("="*75)
+        print(f"Volatility: {report['vol_annual']*100:.1f}% annual | "
+              f"VaR95 (1d): hist {report['var_hist']*100:.2f}% / param {report['var_param']*100:.2f}% of capital")
+        for sym, (marginal, component) in report['contributions'].items():
+            print(f"   {sym.replace('.NS', ''):12} contributes {component*100:.2f}% (marginal {marginal*100:.2f}%)")
+    
     # TOP PICKS WITH ENTRY/EXIT
     print("\n" + "="*75)
-    print("⭐ TOP TRADING SETUPS")
+    print("⭐ TOP TRADING SETUPS (risk-adjusted)")
     print("="*75)
     
-    for i, r in enumerate(results[:3], 1):
-        target = r['price'] * 1.10
-        stop = r['price'] * 0.97
-        risk = r['price'] - stop
-        reward = target - r['price']
-        rr = reward / risk if risk > 0 else 0
+    for i, r in enumerate(ranked[:3], 1):
+        risk_amt = r['price'] - r['stop']
+        reward = r['target'] - r['price']
+        rr = reward / risk_amt if risk_amt > 0 else 0
         
-        print(f"\n#{i} {r['name']} - ₹{r['price']:.2f}")
-        print(f"   🎯 Target: ₹{target:.2f} (+10%)")
-        print(f"   🛡️  Stop: ₹{stop:.2f} (-3%)")
+        print(f"\n#{i} {r['name']} - ₹{r['price']:.2f} | Score: {r['score']} | Risk-adj: {r['risk_adj']:.1f}")
+        print(f"   🎯 Target: ₹{r['target']:.2f} ({(r['target'] / r['price'] - 1) * 100:+.1f}%)")
+        print(f"   🛡️  Stop: ₹{r['stop']:.2f} ({(r['stop'] / r['price'] - 1) * 100:+.1f}%)")
+        print(f"   📦 Size: {r['qty']} shares (₹{r['qty'] * r['price']:,.0f}) | Vol: {r['vol']*100:.0f}% | "
+              f"+VaR95: {r['added_var']*100:.2f}%")
         print(f"   ⚖️  Risk/Reward: 1:{rr:.1f}")
         print(f"   📊 RSI: {r['rsi']:.0f} | Weekly: {r['weekly_trend']}")
 
@@ -4,17 +4,35 @@ KAI - Daily Indian Market Scanner + Paper Trading
 Automated daily analysis with alerts
 """
 
-import yfinance as yf
-import numpy as np
 import json
 import os
 from datetime import datetime
 from pathlib import Path
 
+import eventlog
+import incremental
+import market_data
+import scan_store
+from governor import yahoo
+
+# numpy, risk, levels, snapshot and montecarlo load on first use so `kai positions` stays fast
+
 # Config
 WALLET_FILE = "/home/anand/.openclaw/workspace/trading/india_wallet.json"
 LOG_FILE = "/home/anand/.openclaw/workspace/trading/india_log.txt"
 PAPER_CAPITAL = 100000  # ₹1 lakh
+MC_PATHS = 50_000       # Monte Carlo paths in the daily report (0 = skip)
+
+# Bump a version when its rule changes: only that feature (and what is built
+# on it) is recomputed, everything else comes from the result cache
+FEATURE_VERSIONS = {"technicals": 2, "fundamentals": 1, "score": 1}
+FUNDAMENTAL_KEYS = ("trailingPE",)
+
+# Hooks so replay.py can drive the loop over history: simulated clock,
+# in-memory wallet and a log sink instead of stdout + LOG_FILE
+clock = datetime.now
+persist = True
+log_sink = None
 
 STOCKS = {
     "NIFTY_50": ["RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS",
@@ -31,11 +49,19 @@ STOCKS = {
 }
 
 def log(msg):
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M")
-    line = f"[{ts}] {msg}"
+    now = clock()
+    line = f"[{now.strftime('%Y-%m-%d %H:%M')}] {msg}"
+    if log_sink is not None:
+        log_sink(line)
+        return
     print(line)
-    with open(LOG_FILE, "a") as f:
-        f.write(line + "\n")
+    # LOG_FILE is mirrored by the event log's writer thread, not opened per line
+    eventlog.default(LOG_FILE).emit("log", ts=now, msg=msg)
+
+def record(type, symbol=None, **fields):
+    """Structured event (scan/signal/order/exit/error/alert) for the queryable event log"""
+    if log_sink is None:
+        eventlog.default(LOG_FILE).emit(type, ts=clock(), symbol=symbol, **fields)
 
 def load_wallet():
     if os.path.exists(WALLET_FILE):
@@ -44,21 +70,24 @@ def load_wallet():
     return {"capital": PAPER_CAPITAL, "balance": PAPER_CAPITAL, "positions": [], "trades": []}
 
 def save_wallet(w):
+    if not persist:
+        return
     with open(WALLET_FILE, "w") as f:
         json.dump(w, f, indent=2)
 
 def get_data(symbol):
-    try:
-        t = yf.Ticker(symbol)
-        df = t.history(period="1y", interval="1d")
-        info = t.info
-        return df, info
-    except:
+    """Daily bars + info from the shared cache; (None, None) if the bars failed"""
+    df = market_data.get_bars(symbol)
+    if df is None:
         return None, None
+    return df, market_data.get_info(symbol)
 
 def calc_ema(closes, period):
     if len(closes) < period:
         return None
+    import numpy as np
+
+    closes = np.asarray(closes, dtype=float).tolist()  # plain floats: ~10x faster loop
     ema = sum(closes[:period]) / period
     mult = 2 / (period + 1)
     for c in closes[period:]:
@@ -73,32 +102,33 @@ def calc_rsi(closes, period=14):
     rs = gains / losses if losses > 0 else 100
     return 100 - (100 / (1 + rs))
 
-def analyze(symbol, category):
-    df, info = get_data(symbol)
-    if df is None or len(df) < 50:
-        return None
-    
+def technicals(df):
+    """Bar-derived features (cached per bar fingerprint)"""
+    import levels
+    import risk
+
     close = df['Close'].values
     high = df['High'].values
     low = df['Low'].values
-    
-    current = close[-1]
-    rsi = calc_rsi(close)
-    ema9 = calc_ema(close, 9)
-    ema21 = calc_ema(close, 21)
-    ema50 = calc_ema(close, 50)
-    ema200 = calc_ema(close, 200)
-    
-    sup = low[-20:].min()
-    res = high[-20:].max()
-    
+    support, resistance = levels.nearest(high, low, close[-1])
+    return {
+        "price": close[-1], "rsi": calc_rsi(close),
+        "ema9": calc_ema(close, 9), "ema21": calc_ema(close, 21), "ema200": calc_ema(close, 200),
+        "support": support, "resistance": resistance,
+        "atr": risk.atr(high, low, close),
+        "ret_1m": ((close[-1] / close[-20]) - 1) * 100 if len(close) >= 20 else 0,
+    }
+
+def fundamentals(info):
     try:
         pe = info.get('trailingPE', 0) or 0
     except:
         pe = 0
-    
-    ret_1m = ((close[-1] / close[-20]) - 1) * 100 if len(close) >= 20 else 0
-    
+    return {"pe": pe}
+
+def score(t, f):
+    """(score, signals) from the technical and fundamental features"""
+    rsi, ema9, ema21, ema200 = t['rsi'], t['ema9'], t['ema21'], t['ema200']
     score = 0
     signals = []
     
@@ -112,43 +142,82 @@ def analyze(symbol, category):
         score += 2
         signals.append("Golden Cross")
     
-    if ema200 and current > ema200:
+    if ema200 and t['price'] > ema200:
         score += 2
     
-    if 0 < pe < 25:
+    if 0 < f['pe'] < 25:
         score += 1
     
-    if ret_1m > 5:
+    if t['ret_1m'] > 5:
         score += 1
     
+    return score, signals
+
+def analyze(symbol, category):
+    df, info = get_data(symbol)
+    if df is None or len(df) < 50:
+        return None
+    
+    # Each feature is reused until its inputs or its version change; the score
+    # is versioned by every feature it is built on
+    bars = incremental.fingerprint_bars(df)
+    facts = incremental.fingerprint_info(info, FUNDAMENTAL_KEYS)
+    t = incremental.memo("daily.technicals", FEATURE_VERSIONS['technicals'], bars, technicals, df)
+    f = incremental.memo("daily.fundamentals", FEATURE_VERSIONS['fundamentals'], facts, fundamentals, info)
+    s, signals = incremental.memo("daily.score", tuple(FEATURE_VERSIONS.values()), (bars, facts), score, t, f)
+    
     name = symbol.replace('.NS', '')
     
     return {
         "name": name, "symbol": symbol, "category": category,
-        "price": current, "rsi": rsi, "pe": pe,
-        "ema9": ema9, "ema21": ema21, "ema200": ema200,
-        "support": sup, "resistance": res,
-        "ret_1m": ret_1m, "score": score, "signals": signals
+        "price": t['price'], "rsi": t['rsi'], "pe": f['pe'],
+        "ema9": t['ema9'], "ema21": t['ema21'], "ema200": t['ema200'],
+        "support": t['support'], "resistance": t['resistance'], "atr": t['atr'],
+        "ret_1m": t['ret_1m'], "score": s, "signals": list(signals)
     }
 
 def scan_market():
     log("Scanning Indian market...")
-    results = []
+    yahoo.reset_report()
+    incremental.reset_stats()
     
-    for category, symbols in STOCKS.items():
-        for sym in symbols:
-            r = analyze(sym, category)
-            if r:
-                results.append(r)
+    jobs = [(sym, category) for category, symbols in STOCKS.items() for sym in symbols]
+    results = [r for r in market_data.map(lambda job: analyze(*job), jobs) if r]
+    
+    failed = yahoo.report()['failures']
+    if failed:
+        log(f"⚠️ {len(failed)} upstream failures during scan")
+        for line in yahoo.summary():
+            log(line)
+        for key, f in failed.items():
+            record("error", symbol=key.split(":")[0], source="upstream", kind=f['kind'], reason=f['reason'])
+    reused = incremental.stats.get("daily.technicals", [0, 0])[0]
+    if reused:
+        log(f"♻️ {reused}/{len(results)} results served from the result cache")
+    record("scan", symbols=len(jobs), results=len(results), failed=len(failed), reused=reused)
+    if persist:
+        scan_store.record_scan(results, "daily", clock())
+        incremental.save()
+        import snapshot
+
+        snapshot.publish("daily", results, FUNDAMENTAL_KEYS)
     
     results.sort(key=lambda x: x['score'], reverse=True)
     return results
 
-def open_position(symbol, entry_price, qty, wallet):
+def size_position(entry_price, atr, wallet):
+    """ATR-based (qty, stop_loss, target) risking risk.RISK_PER_TRADE of capital"""
+    import risk
+
+    qty, stop, target = risk.atr_position_size(wallet['capital'], entry_price, atr)
+    return int(qty), round(float(stop), 2), round(float(target), 2)
+
+def open_position(symbol, entry_price, qty, wallet, stop_loss=None, target=None):
     cost = entry_price * qty
     
     if cost > wallet['balance']:
         log(f"❌ Insufficient balance for {symbol}")
+        record("error", symbol=symbol, source="order", reason="insufficient balance", cost=cost)
         return wallet
     
     position = {
@@ -157,9 +226,9 @@ def open_position(symbol, entry_price, qty, wallet):
         "entry_price": entry_price,
         "qty": qty,
         "cost": cost,
-        "entry_time": datetime.now().isoformat(),
-        "stop_loss": round(entry_price * 0.97, 2),
-        "target": round(entry_price * 1.10, 2),
+        "entry_time": clock().isoformat(),
+        "stop_loss": stop_loss if stop_loss is not None else round(entry_price * 0.97, 2),
+        "target": target if target is not None else round(entry_price * 1.10, 2),
         "status": "OPEN"
     }
     
@@ -168,11 +237,14 @@ def open_position(symbol, entry_price, qty, wallet):
     save_wallet(wallet)
     
     log(f"✅ BUY {symbol} | Qty: {qty} | Entry: ₹{entry_price} | Target: ₹{position['target']} | SL: ₹{position['stop_loss']}")
+    record("order", symbol=symbol, side="BUY", qty=qty, price=entry_price,
+           stop_loss=position['stop_loss'], target=position['target'])
     return wallet
 
 def check_positions(wallet):
     if not wallet['positions']:
         return wallet
+    import levels
     
     for pos in list(wallet['positions']):
         try:
@@ -186,35 +258,47 @@ def check_positions(wallet):
                 pnl = (pos['stop_loss'] - pos['entry_price']) * pos['qty']
                 wallet['balance'] += pos['cost'] + pnl
                 pos['exit_price'] = current
-                pos['exit_time'] = datetime.now().isoformat()
+                pos['exit_time'] = clock().isoformat()
                 pos['pnl'] = pnl
                 pos['status'] = 'SL'
                 wallet['trades'].append(pos)
                 wallet['positions'].remove(pos)
                 log(f"🛑 SL EXIT: {pos['symbol']} | P&L: ₹{pnl:.0f}")
+                record("exit", symbol=pos['symbol'], status="SL", exit_price=current, pnl=pnl)
                 
             elif current >= pos['target']:
                 pnl = (pos['target'] - pos['entry_price']) * pos['qty']
                 wallet['balance'] += pos['cost'] + pnl
                 pos['exit_price'] = current
-                pos['exit_time'] = datetime.now().isoformat()
+                pos['exit_time'] = clock().isoformat()
                 pos['pnl'] = pnl
                 pos['status'] = 'TARGET'
                 wallet['trades'].append(pos)
                 wallet['positions'].remove(pos)
                 log(f"🎯 TARGET HIT: {pos['symbol']} | P&L: ₹{pnl:.0f}")
+                record("exit", symbol=pos['symbol'], status="TARGET", exit_price=current, pnl=pnl)
+
+            else:
+                # Still open: warn when the close breaks the nearest support under the previous close
+                level = levels.broken_support(df['High'].values, df['Low'].values, df['Close'].values)
+                if level is not None:
+                    log(f"⚠️ SUPPORT BROKEN: {pos['symbol']} closed ₹{current:.2f} below ₹{level:.2f} | "
+                        f"SL: ₹{pos['stop_loss']}")
+                    record("signal", symbol=pos['symbol'], rule="support_break", level=level, price=current)
         except Exception as e:
             log(f"Error checking {pos['symbol']}: {e}")
+            record("error", symbol=pos['symbol'], source="check_positions", reason=str(e))
     
     save_wallet(wallet)
     return wallet
 
-def daily_report():
+def daily_report(wallet=None):
     log("="*50)
     log("KAI DAILY REPORT")
     log("="*50)
     
-    wallet = load_wallet()
+    if wallet is None:
+        wallet = load_wallet()
     wallet = check_positions(wallet)
     
     results = scan_market()
@@ -225,7 +309,7 @@ def daily_report():
     for pos in wallet['positions']:
         try:
             df, _ = get_data(pos['symbol'] + ".NS")
-            if df:
+            if df is not None:
                 current = df['Close'].values[-1]
                 open_pnl += (current - pos['entry_price']) * pos['qty']
         except:
@@ -237,11 +321,27 @@ def daily_report():
     log(f"💰 Portfolio: ₹{total_value:,.0f} | P&L: ₹{total_pnl:,.0f}")
     log(f"   Cash: ₹{wallet['balance']:,.0f} | Invested: ₹{invested:,.0f} | Open P&L: ₹{open_pnl:,.0f}")
     
+    # Outcome distribution of the open book under its stops/targets
+    if wallet['positions'] and MC_PATHS:
+        import montecarlo
+
+        returns, price, qty, stop, target, cash = montecarlo.wallet_inputs(wallet)
+        if len(price) and len(returns):
+            rep = montecarlo.simulate_wallet(returns, price, qty, stop, target, cash, wallet['capital'],
+                                             paths=MC_PATHS)
+            for line in montecarlo.format_report(rep):
+                log(line)
+    
     # Top setups
     buys = [r for r in results if r['score'] >= 5]
+    for r in buys:
+        record("signal", symbol=r['symbol'], category=r['category'], score=r['score'], price=r['price'],
+               rsi=r['rsi'], signals=r['signals'])
     log(f"\n🎯 Top {len(buys)} BUY Signals:")
     for r in buys[:5]:
-        log(f"   {r['name']} | ₹{r['price']:.0f} | RSI: {r['rsi']:.0f} | Score: {r['score']}")
+        qty, sl, tgt = size_position(r['price'], r['atr'], wallet)
+        log(f"   {r['name']} | ₹{r['price']:.0f} | RSI: {r['rsi']:.0f} | Score: {r['score']} | "
+            f"Size: {qty} | SL: ₹{sl:.0f} | Target: ₹{tgt:.0f}")
     
     save_wallet(wallet)
     return results
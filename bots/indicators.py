@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+KAI - Vectorized Indicators
+TradingView `ta.*` semantics over T x N arrays (one column per symbol), so a
+feature is computed once for the whole universe; leading NaNs (short
+histories) are handled per column
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import levels
+
+
+def _2d(x):
+    x = np.asarray(x, dtype=float)
+    return x[:, None] if x.ndim == 1 else x
+
+
+def _like(x, out):
+    return out[:, 0] if np.ndim(x) == 1 else out
+
+
+def _first_valid(x):
+    valid = np.isfinite(x)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), len(x))
+
+
+def _smooth(src, alpha, length, sma_seed):
+    """Exponential smoothing per column. sma_seed: first value is the SMA of the
+    first `length` bars (ta.rma); otherwise the first bar itself (ta.ema)."""
+    x = _2d(src)
+    out = np.full(x.shape, np.nan)
+    seed_at = _first_valid(x) + (length - 1 if sma_seed else 0)
+    prev = np.full(x.shape[1], np.nan)
+    for t in range(len(x)):
+        cur = alpha * x[t] + (1 - alpha) * prev
+        seed = seed_at == t
+        if seed.any():
+            cur[seed] = x[t - length + 1:t + 1, seed].mean(axis=0) if sma_seed else x[t, seed]
+        prev = np.where(np.isnan(x[t]), prev, cur)
+        out[t] = prev
+    return _like(src, out)
+
+
+def ema(src, length):
+    return _smooth(src, 2 / (length + 1), length, sma_seed=False)
+
+
+def rma(src, length):
+    return _smooth(src, 1 / length, length, sma_seed=True)
+
+
+def sma(src, length):
+    x = _2d(src)
+    out = np.full(x.shape, np.nan)
+    if len(x) >= length:
+        out[length - 1:] = sliding_window_view(x, length, axis=0).mean(axis=-1)
+    return _like(src, out)
+
+
+def stdev(src, length):
+    x = _2d(src)
+    out = np.full(x.shape, np.nan)
+    if len(x) >= length:
+        out[length - 1:] = sliding_window_view(x, length, axis=0).std(axis=-1)
+    return _like(src, out)
+
+
+def highest(src, length):
+    return levels.rolling_max(src, length)
+
+
+def lowest(src, length):
+    return levels.rolling_min(src, length)
+
+
+def shift(src, n=1):
+    """src[n] in Pine terms: the value n bars ago"""
+    x = _2d(src)
+    out = np.full(x.shape, np.nan)
+    if n < len(x):
+        out[n:] = x[:len(x) - n]
+    return _like(src, out)
+
+
+def change(src, n=1):
+    return np.asarray(src, dtype=float) - shift(src, n)
+
+
+def rsi(src, length=14):
+    d = change(src)
+    up = rma(np.where(np.isnan(d), np.nan, np.maximum(d, 0)), length)
+    down = rma(np.where(np.isnan(d), np.nan, -np.minimum(d, 0)), length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + up / down)
+    out = np.where(down == 0, 100.0, np.where(up == 0, 0.0, out))
+    return np.where(np.isnan(up) | np.isnan(down), np.nan, out)
+
+
+def true_range(high, low, close):
+    prev = shift(close)
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+    return np.where(np.isnan(prev), high - low, tr)
+
+
+def atr(high, low, close, length=14):
+    return rma(true_range(high, low, close), length)
+
+
+def macd(src, fast=12, slow=26, signal=9):
+    line = ema(src, fast) - ema(src, slow)
+    sig = ema(line, signal)
+    return line, sig, line - sig
+
+
+def vwap(high, low, close, volume, anchor=None):
+    """Session-anchored VWAP of hlc3; anchor is a T bool mask of bars that start
+    a new session (default: every bar, i.e. daily bars on a daily anchor)"""
+    src = (np.asarray(high) + np.asarray(low) + np.asarray(close)) / 3
+    if anchor is None:
+        return src
+    pv, vol = _2d(src * volume), _2d(np.asarray(volume, dtype=float))
+    session = np.cumsum(anchor) - 1
+    out = np.empty(pv.shape)
+    for s in np.unique(session):
+        rows = session == s
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[rows] = np.cumsum(pv[rows], axis=0) / np.cumsum(vol[rows], axis=0)
+    return _like(src, out)
+
+
+def _prev(x):
+    return x if np.ndim(x) == 0 else shift(x)
+
+
+def crossover(a, b):
+    return (np.asarray(a) > b) & (_prev(a) <= _prev(b))
+
+
+def crossunder(a, b):
+    return (np.asarray(a) < b) & (_prev(a) >= _prev(b))
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+KAI - Support / Resistance Levels
+O(n) rolling extremes, swing pivots clustered into price levels, and a
+per-symbol sorted level index where "nearest support below / resistance
+above" is a bisect
+"""
+
+import argparse
+import bisect
+import time
+from collections import deque
+
+import numpy as np
+
+# Config
+PIVOT_LEFT = 5          # bars a swing high/low must beat on its left
+PIVOT_RIGHT = 5         # ... and on its right (so it is confirmed this many bars later)
+LOOKBACK = 250          # bars of history that can contribute levels
+TOLERANCE = 0.01        # pivots within 1% of each other are one level
+FALLBACK = 20           # window extreme used when no level lies beyond the price
+
+
+# ---- rolling extremes ----
+
+class RollingExtreme:
+    """Streaming max (or min) of the last `window` values with a monotonic deque:
+    O(1) amortised per push however long the window. NaN pushes are skipped,
+    matching the batch functions below only on NaN-free input."""
+
+    __slots__ = ("window", "sign", "items", "n")
+
+    def __init__(self, window, mode="max"):
+        self.window = window
+        self.sign = 1.0 if mode == "max" else -1.0
+        self.items = deque()    # (position, signed value), signed values strictly decreasing
+        self.n = 0
+
+    def push(self, value):
+        """Add the next value; returns the extreme of the window ending here"""
+        if value == value:
+            v = self.sign * value
+            while self.items and self.items[-1][1] <= v:
+                self.items.pop()
+            self.items.append((self.n, v))
+        self.n += 1
+        while self.items and self.items[0][0] <= self.n - 1 - self.window:
+            self.items.popleft()
+        return self.value
+
+    @property
+    def value(self):
+        return self.sign * self.items[0][1] if self.items else np.nan
+
+
+def _2d(x):
+    x = np.asarray(x, dtype=float)
+    return x[:, None] if x.ndim == 1 else x
+
+
+def _like(x, out):
+    return out[:, 0] if np.ndim(x) == 1 else out
+
+
+def _rolling(src, window, op):
+    """van Herk / Gil-Werman: per-block prefix and suffix extremes, so each output
+    is op(suffix[t-w+1], prefix[t]) - three passes whatever the window, and a
+    NaN only affects the windows that contain it (as in ta.highest)"""
+    x = _2d(src)
+    T = len(x)
+    out = np.full(x.shape, np.nan)
+    if window < 1 or T < window:
+        return _like(src, out)
+    pad = -T % window
+    xp = np.concatenate([x, np.repeat(x[-1:], pad, axis=0)]) if pad else x
+    blocks = xp.reshape(-1, window, x.shape[1])
+    prefix = op.accumulate(blocks, axis=1).reshape(xp.shape)
+    suffix = op.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(xp.shape)
+    out[window - 1:] = op(suffix[:T - window + 1], prefix[window - 1:T])
+    return _like(src, out)
+
+
+def rolling_max(src, window):
+    """Max of the last `window` bars per column (T or T x N), NaN until the window fills"""
+    return _rolling(src, window, np.maximum)
+
+
+def rolling_min(src, window):
+    return _rolling(src, window, np.minimum)
+
+
+# ---- pivots and levels ----
+
+def pivots(src, left=PIVOT_LEFT, right=PIVOT_RIGHT, mode="high"):
+    """Bool mask of swing pivots: bar t is the extreme of [t-left, t+right] and
+    strictly beyond everything on its left (ties go to the first bar). The
+    last `right` bars are never pivots - they aren't confirmed yet."""
+    x = _2d(src)
+    T = len(x)
+    high = mode == "high"
+    roll = rolling_max if high else rolling_min
+    span = np.full(x.shape, np.nan)
+    if T > right:
+        span[:T - right] = roll(x, left + right + 1)[right:]
+    prior = np.full(x.shape, np.nan)
+    prior[1:] = roll(x, left)[:-1]
+    with np.errstate(invalid="ignore"):
+        mask = (x == span) & ((x > prior) if high else (x < prior))
+    return _like(src, mask)
+
+
+def cluster(prices, tolerance=TOLERANCE):
+    """Merge pivot prices lying within `tolerance` of their cluster's lowest price.
+    Returns (levels, touches), levels ascending, each the mean of its members."""
+    levels, touches = [], []
+    start = total = count = None
+    for p in sorted(prices):
+        if count and p <= start * (1 + tolerance):
+            total += p
+            count += 1
+            continue
+        if count:
+            levels.append(total / count)
+            touches.append(count)
+        start, total, count = p, p, 1
+    if count:
+        levels.append(total / count)
+        touches.append(count)
+    return levels, touches
+
+
+class LevelIndex:
+    """symbol -> ascending level prices, so nearest-level queries are O(log n)"""
+
+    __slots__ = ("levels", "touches")
+
+    def __init__(self):
+        self.levels = {}
+        self.touches = {}
+
+    def add(self, symbol, levels, touches=None):
+        order = np.argsort(levels, kind="stable")
+        self.levels[symbol] = [float(levels[i]) for i in order]
+        self.touches[symbol] = [int(touches[i]) if touches is not None else 1 for i in order]
+
+    @classmethod
+    def build(cls, symbols, high, low, lookback=LOOKBACK, left=PIVOT_LEFT, right=PIVOT_RIGHT,
+              tolerance=TOLERANCE):
+        """Index from T x N high/low matrices (or 1-D for one symbol). Pivots are
+        found for the whole universe in one vectorized pass; only the last
+        `lookback` bars contribute."""
+        index = cls()
+        high, low = _2d(high)[-lookback:], _2d(low)[-lookback:]
+        highs = pivots(high, left, right, "high")
+        lows = pivots(low, left, right, "low")
+        for j, sym in enumerate(symbols):
+            prices = np.concatenate([high[highs[:, j], j], low[lows[:, j], j]])
+            index.add(sym, *cluster(prices.tolist(), tolerance))
+        return index
+
+    def __contains__(self, symbol):
+        return symbol in self.levels
+
+    def support(self, symbol, price):
+        """Nearest level strictly below price, or None"""
+        levels = self.levels.get(symbol, ())
+        i = bisect.bisect_left(levels, price)
+        return levels[i - 1] if i else None
+
+    def resistance(self, symbol, price):
+        """Nearest level strictly above price, or None"""
+        levels = self.levels.get(symbol, ())
+        i = bisect.bisect_right(levels, price)
+        return levels[i] if i < len(levels) else None
+
+    def strength(self, symbol, level):
+        """Number of pivots merged into `level` (0 if it isn't one)"""
+        levels = self.levels.get(symbol, ())
+        i = bisect.bisect_left(levels, level)
+        return self.touches[symbol][i] if i < len(levels) and levels[i] == level else 0
+
+
+def nearest(high, low, price, lookback=LOOKBACK):
+    """(support, resistance) around price for one symbol's bars: the nearest
+    pivot levels, falling back to the FALLBACK-bar low/high when none lies
+    beyond the price (fresh highs/lows, short histories)"""
+    high, low = np.asarray(high, dtype=float), np.asarray(low, dtype=float)
+    index = LevelIndex.build([None], high, low, lookback)
+    sup, res = index.support(None, price), index.resistance(None, price)
+    return (sup if sup is not None else float(np.nanmin(low[-FALLBACK:])),
+            res if res is not None else float(np.nanmax(high[-FALLBACK:])))
+
+
+def broken_support(high, low, close, lookback=LOOKBACK):
+    """The level the last bar closed below after the previous bar closed above
+    it, or None. Levels are built without the last bar so it can't confirm its own break."""
+    if len(close) < 2:
+        return None
+    index = LevelIndex.build([None], high[:-1], low[:-1], lookback)
+    level = index.support(None, close[-2])
+    return level if level is not None and close[-1] < level else None
+
+
+# ---- self-check ----
+
+def _window(x, w, fn):
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    out = np.full(x.shape, np.nan)
+    out[w - 1:] = fn(sliding_window_view(x, w, axis=0), axis=-1)
+    return out
+
+
+def check(T=750, N=60, seed=7):
+    """Compare against sliding-window and brute-force references and time them. Returns failures."""
+    rng = np.random.default_rng(seed)
+    x = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (T, N)), axis=0))
+    x[:rng.integers(0, 200, N).max(), ::7] = np.nan          # short histories
+    x[rng.random((T, N)) < 0.002] = np.nan                   # holes
+    failures = 0
+    for w in (1, 2, 5, 20, 50, 200, T):
+        for fn, ref in ((rolling_max, np.max), (rolling_min, np.min)):
+            if not np.array_equal(fn(x, w), _window(x, w, ref), equal_nan=True):
+                print(f"FAIL {fn.__name__} window {w}")
+                failures += 1
+
+    clean = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, T)))
+    stream = RollingExtreme(20)
+    if not np.array_equal([stream.push(v) for v in clean][19:], rolling_max(clean, 20)[19:]):
+        print("FAIL streaming deque")
+        failures += 1
+
+    for mode, cmp in (("high", max), ("low", min)):
+        mask = pivots(x, mode=mode)
+        for t in range(PIVOT_LEFT, T - PIVOT_RIGHT):
+            for j in range(0, N, 5):
+                win = x[t - PIVOT_LEFT:t + PIVOT_RIGHT + 1, j]
+                left = x[t - PIVOT_LEFT:t, j]
+                want = (not np.isnan(win).any() and x[t, j] == cmp(win)
+                        and all(x[t, j] != v for v in left))
+                if bool(mask[t, j]) != want:
+                    print(f"FAIL pivot {mode} t={t} col={j}")
+                    failures += 1
+
+    index = LevelIndex.build(range(N), x, x)
+    for j in range(N):
+        levels = index.levels[j]
+        for price in rng.uniform(50, 200, 50):
+            below = [v for v in levels if v < price]
+            above = [v for v in levels if v > price]
+            if index.support(j, price) != (max(below) if below else None) or \
+               index.resistance(j, price) != (min(above) if above else None):
+                print(f"FAIL nearest level col={j} price={price:.2f}")
+                failures += 1
+
+    for w in (20, 200):
+        started = time.perf_counter()
+        rolling_max(x, w)
+        fast = time.perf_counter() - started
+        started = time.perf_counter()
+        _window(x, w, np.max)
+        slow = time.perf_counter() - started
+        print(f"rolling_max {T}x{N} window {w}: {fast * 1000:.2f}ms (sliding window {slow * 1000:.2f}ms)")
+    print("levels check: " + ("ok" if not failures else f"{failures} failures"))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Support/resistance levels from swing pivots")
+    parser.add_argument("symbols", nargs="*", help="e.g. RELIANCE.NS")
+    parser.add_argument("--check", action="store_true", help="verify against reference implementations")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(1 if check() else 0)
+    import market_data
+
+    for sym in args.symbols:
+        df = market_data.get_bars(sym, "1y")
+        if df is None:
+            print(f"{sym}: no data")
+            continue
+        index = LevelIndex.build([sym], df['High'].values, df['Low'].values)
+        price = float(df['Close'].values[-1])
+        print(f"{sym} @ ₹{price:.2f}  support ₹{index.support(sym, price) or 0:.2f}  "
+              f"resistance ₹{index.resistance(sym, price) or 0:.2f}")
+        for level, touches in zip(index.levels[sym], index.touches[sym]):
+            print(f"  ₹{level:10.2f}  {'*' * touches}")
+
+
+if __name__ == "__main__":
+    main()
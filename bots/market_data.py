@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+KAI - Market Data Cache
+Bars and info fetched once per process through the governor and shared by
+the scanners, the risk engine and the dashboard
+"""
+
+import os
+import pickle
+import threading
+import time
+
+# numpy, pandas and yfinance are imported where they are used: `kai positions`
+# and the dashboard import this module but never touch a DataFrame
+
+from governor import NoData, UpstreamError, yahoo
+
+CACHE_DIR = "/home/anand/.openclaw/workspace/trading/cache"
+CACHE_MAX_AGE = 12 * 3600
+QUOTE_URL = os.environ.get("KAI_QUOTE_URL")     # quote server instead of Yahoo (benchmarks/loadtest.py)
+
+_bars = {}
+_fetched = {}
+_info = {}
+_lock = threading.Lock()
+
+# When set (see replay.py), bars and info come from here instead of the cache/network
+provider = None
+
+
+def fetch_history(symbol, period="1y", interval="1d"):
+    import yfinance as yf
+
+    df = yf.Ticker(symbol).history(period=period, interval=interval)
+    if df is None or df.empty:  # also how yfinance reports DNS/network failures, see governor.NEGATIVE_AFTER
+        raise NoData(f"no {interval} bars for {symbol}")
+    return df
+
+
+def fetch_info(symbol):
+    import yfinance as yf
+
+    return yf.Ticker(symbol).info or {}
+
+
+def fetch_price(symbol):
+    """Latest regularMarketPrice, from QUOTE_URL when set, else Yahoo"""
+    if QUOTE_URL:
+        price = fetch_quote(QUOTE_URL, symbol).get('regularMarketPrice')
+    else:
+        price = fetch_info(symbol).get('regularMarketPrice')
+    if not price:
+        raise NoData(f"no regularMarketPrice for {symbol}")
+    return price
+
+
+def fetch_quote(base_url, symbol, timeout=2.0):
+    """GET <base_url>/quote/<symbol> as JSON, raising governor-classified errors"""
+    import json
+    import urllib.error
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(f"{base_url}/quote/{symbol}", timeout=timeout) as resp:
+            return json.load(resp)
+    except urllib.error.HTTPError as e:
+        if e.code == 429:
+            raise UpstreamError("HTTP 429 Too Many Requests", "throttle", symbol)
+        if e.code == 404:
+            raise NoData(f"HTTP 404 unknown symbol {symbol}", symbol)
+        raise UpstreamError(f"HTTP {e.code}", "transient", symbol)
+    except (urllib.error.URLError, TimeoutError) as e:
+        raise UpstreamError(f"timeout/connection: {e}", "transient", symbol)
+
+
+def get_bars(symbol, period="1y", interval="1d"):
+    """OHLCV DataFrame or None; failures are recorded on the governor"""
+    if provider is not None:
+        return provider.bars(symbol, period, interval)
+    key = (symbol, period, interval)
+    with _lock:
+        if key in _bars:
+            return _bars[key]
+    suffix = "" if interval == "1d" else ":" + interval
+    df = yahoo.fetch(symbol + suffix, fetch_history, symbol, period, interval)
+    if df is not None:
+        with _lock:
+            _bars[key] = df
+            _fetched[key] = time.time()
+    return df
+
+
+def get_info(symbol):
+    if provider is not None:
+        return provider.info(symbol)
+    with _lock:
+        if symbol in _info:
+            return _info[symbol]
+    info = yahoo.fetch(symbol + ":info", fetch_info, symbol, default=None)
+    if info is None:
+        return {}
+    with _lock:
+        _info[symbol] = info
+    return info
+
+
+def map(fn, items):
+    """Fan fn out over symbols: concurrently through the governor when it may hit
+    the network, inline when a provider is serving local data"""
+    if provider is not None:
+        return [fn(i) for i in items]
+    return yahoo.map(fn, items)
+
+
+def clear():
+    with _lock:
+        _bars.clear()
+        _fetched.clear()
+        _info.clear()
+
+
+def invalidate(symbols=None, older_than=0):
+    """Drop cached bars (all periods/intervals) for symbols, or for everything,
+    fetched more than older_than seconds ago. Info stays cached."""
+    cutoff = time.time() - older_than
+    wanted = set(symbols) if symbols is not None else None
+    with _lock:
+        stale = [k for k in _bars if (wanted is None or k[0] in wanted) and _fetched.get(k, 0) <= cutoff]
+        for k in stale:
+            _bars.pop(k, None)
+            _fetched.pop(k, None)
+    return len(stale)
+
+
+def preload(symbols, period="1y", interval="1d", cache_dir=CACHE_DIR, max_age=CACHE_MAX_AGE):
+    """Warm the cache for many symbols with one pickle read, fetch whatever is
+    missing or stale concurrently, then write the pickle back once.
+    Returns {symbol: DataFrame} for the symbols that have bars."""
+    path = os.path.join(cache_dir, f"bars_{period}_{interval}.pkl")
+    stored = {}
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age:
+        with open(path, "rb") as f:
+            stored = pickle.load(f)
+    mtime = os.path.getmtime(path) if stored else 0
+    with _lock:
+        for sym, df in stored.items():
+            if (sym, period, interval) not in _bars:
+                _bars[(sym, period, interval)] = df
+                _fetched[(sym, period, interval)] = mtime
+        missing = [s for s in dict.fromkeys(symbols) if (s, period, interval) not in _bars]
+
+    if missing:
+        yahoo.map(lambda s: get_bars(s, period, interval), missing)
+        with _lock:
+            stored = {s: df for (s, p, i), df in _bars.items() if (p, i) == (period, interval)}
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(stored, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    with _lock:
+        return {s: _bars[(s, period, interval)] for s in symbols if (s, period, interval) in _bars}
+
+
+def _local_dates(index):
+    """Exchange wall-clock timestamps (yfinance indexes are tz-aware)"""
+    return (index.tz_localize(None) if getattr(index, "tz", None) is not None else index).values
+
+
+def price_matrix(symbols, field="Close", period="1y", interval="1d"):
+    """Align one field across symbols on a common date index.
+    Returns (local dates, symbols_found, T x N float array); gaps are forward-filled."""
+    import numpy as np
+    import pandas as pd
+
+    frames = {}
+    for sym in dict.fromkeys(symbols):
+        df = get_bars(sym, period, interval)
+        if df is not None and field in df:
+            frames[sym] = df[field]
+    if not frames:
+        return np.array([]), [], np.empty((0, 0))
+    table = pd.concat(frames, axis=1).sort_index().ffill()
+    return _local_dates(table.index), list(table.columns), table.to_numpy(dtype=float)
+
+
+def matrices(symbols, fields=("Open", "High", "Low", "Close", "Volume"), period="1y", interval="1d"):
+    """Several fields aligned on one date index in a single concat.
+    Returns (local dates, symbols_found, {field: T x N float array}); gaps are forward-filled."""
+    import numpy as np
+    import pandas as pd
+
+    frames = {}
+    for sym in dict.fromkeys(symbols):
+        df = get_bars(sym, period, interval)
+        if df is not None and all(f in df for f in fields):
+            frames[sym] = df[list(fields)]
+    if not frames:
+        return np.array([]), [], {f: np.empty((0, 0)) for f in fields}
+    table = pd.concat(frames, axis=1).sort_index().ffill()
+    cols = list(frames)
+    return _local_dates(table.index), cols, {f: table.xs(f, axis=1, level=1)[cols].to_numpy(dtype=float)
+                                             for f in fields}
+
+
+def ohlc_matrices(symbols, period="1y", interval="1d"):
+    """High, low and close matrices sharing one date index"""
+    dates, cols, m = matrices(symbols, ("High", "Low", "Close"), period, interval)
+    return dates, cols, m["High"], m["Low"], m["Close"]
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+KAI - Monte Carlo Paper-Trading Simulator
+Bootstraps historical returns (or trade outcomes) into P&L, drawdown and
+ruin distributions for the current wallet under the 3% stop / 10% target rule
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Config
+PATHS = 200_000
+HORIZON = 60            # trading days (returns mode)
+TRADES = 50             # trades per path (trades mode)
+BATCH = 20_000          # paths per vectorised batch / process task
+BLOCK = 5               # bootstrap block length, keeps short-range autocorrelation
+STOP_PCT = 0.03
+TARGET_PCT = 0.10
+TRADE_FRACTION = 0.10   # equity committed per trade (Pine default_qty_value=10)
+RUIN_LEVEL = 0.5        # ruined once equity falls below this fraction of capital
+MIN_TRADES = 20         # fewer closed trades than this -> derive outcomes from bars
+SEED = 7
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def _batches(paths, batch, seed):
+    """Fixed batch split + spawned seeds, so results don't depend on worker count"""
+    sizes = [batch] * (paths // batch) + ([paths % batch] if paths % batch else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(sizes, seeds))
+
+
+def _block_indices(rng, n, horizon, length, block):
+    block = min(block, length)      # short histories: blocks can't be longer than the series
+    starts = rng.integers(0, length - block + 1, size=(n, -(-horizon // block)))
+    return (starts[:, :, None] + np.arange(block)).reshape(n, -1)[:, :horizon]
+
+
+def _drawdown(equity):
+    peak = np.maximum.accumulate(equity, axis=1)
+    return (1 - equity / peak).max(axis=1)
+
+
+def _wallet_batch(job):
+    """Simulate n paths of held positions with stop/target exits. Returns (pnl, max_dd, min_equity, exits)."""
+    (n, seed), returns, price0, qty, stop, target, cash, horizon, block = job
+    rng = np.random.default_rng(seed)
+    idx = _block_indices(rng, n, horizon, len(returns), block)
+    price = price0 * np.exp(np.cumsum(returns[idx], axis=1))           # n x H x N
+    hit_stop = price <= stop
+    hit = hit_stop | (price >= target)
+    any_hit = hit.any(axis=1)
+    first = np.where(any_hit, hit.argmax(axis=1), horizon)              # n x N
+    stopped = np.take_along_axis(hit_stop, np.minimum(first, horizon - 1)[:, None, :], axis=1)[:, 0, :]
+    exit_level = np.where(stopped, stop, target)
+    alive = np.arange(horizon)[None, :, None] < first[:, None, :]
+    value = np.where(alive, price, exit_level[:, None, :]) * qty
+    equity = cash + value.sum(axis=2)
+    start = cash + (price0 * qty).sum()
+    exits = np.array([(any_hit & stopped).sum(), (any_hit & ~stopped).sum(), (~any_hit).sum()])
+    return equity[:, -1] - start, _drawdown(np.hstack([np.full((n, 1), start), equity])), equity.min(axis=1), exits
+
+
+def _trades_batch(job):
+    """Simulate n sequences of bootstrapped trade returns with fixed-fraction sizing"""
+    (n, seed), outcomes, trades, fraction, capital = job
+    rng = np.random.default_rng(seed)
+    r = outcomes[rng.integers(0, len(outcomes), size=(n, trades))]
+    equity = capital * np.cumprod(1 + fraction * r, axis=1)
+    dd = _drawdown(np.hstack([np.full((n, 1), capital), equity]))
+    wins = (r > 0).sum()
+    return equity[:, -1] - capital, dd, equity.min(axis=1), np.array([r.size - wins, wins, 0])
+
+
+def _run(worker, jobs, workers):
+    if workers <= 1 or len(jobs) == 1:
+        parts = [worker(j) for j in jobs]
+    else:
+        # forkserver, not fork: the scheduler calls this with the event log and governor
+        # threads running, and a forked child can inherit a lock one of them held
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver")) as ex:
+            parts = list(ex.map(worker, jobs))
+    return [np.concatenate([p[k] for p in parts]) for k in range(3)] + [sum(p[3] for p in parts)]
+
+
+def _report(mode, pnl, dd, min_equity, exits, capital, ruin_level, elapsed):
+    return {
+        "mode": mode,
+        "paths": len(pnl),
+        "seconds": round(elapsed, 2),
+        "mean_pnl": float(pnl.mean()),
+        "prob_loss": float((pnl < 0).mean()),
+        "prob_ruin": float((min_equity <= capital * ruin_level).mean()),
+        "pnl_pct": {p: float(v) for p, v in zip(PERCENTILES, np.percentile(pnl, PERCENTILES))},
+        "max_dd_pct": {p: float(v) for p, v in zip(PERCENTILES, np.percentile(dd, PERCENTILES))},
+        "exits": {"stop": int(exits[0]), "target": int(exits[1]), "open": int(exits[2])},
+    }
+
+
+def simulate_wallet(returns, price, qty, stop, target, cash, capital, paths=PATHS, horizon=HORIZON,
+                    block=BLOCK, seed=SEED, workers=None, ruin_level=RUIN_LEVEL, batch=BATCH):
+    """Block-bootstrap rows of the T x N log-return matrix over the held names.
+    Rows are resampled whole, so cross-sectional correlation is kept."""
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    arrays = [np.asarray(a, dtype=float) for a in (price, qty, stop, target)]
+    jobs = [(b, returns, *arrays, cash, horizon, block) for b in _batches(paths, batch, seed)]
+    pnl, dd, low, exits = _run(_wallet_batch, jobs, workers)
+    return _report("returns", pnl, dd, low, exits, capital, ruin_level, time.perf_counter() - start)
+
+
+def simulate_trades(outcomes, capital, paths=PATHS, trades=TRADES, fraction=TRADE_FRACTION, seed=SEED,
+                    workers=None, ruin_level=RUIN_LEVEL, batch=BATCH):
+    """Bootstrap per-trade returns into equity curves of `trades` trades each"""
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    outcomes = np.asarray(outcomes, dtype=float)
+    jobs = [(b, outcomes, trades, fraction, capital) for b in _batches(paths, batch, seed)]
+    pnl, dd, low, exits = _run(_trades_batch, jobs, workers)
+    return _report("trades", pnl, dd, low, exits, capital, ruin_level, time.perf_counter() - start)
+
+
+def rule_outcomes(close, stop_pct=STOP_PCT, target_pct=TARGET_PCT, horizon=HORIZON):
+    """Every (day, symbol) entry in a T x N close matrix played through the stop/target rule.
+    Returns the per-trade return of each entry that resolved within horizon."""
+    fwd = sliding_window_view(close[1:], horizon, axis=0)               # K x N x H
+    entry = close[:len(fwd), :, None]
+    hit_stop = fwd <= entry * (1 - stop_pct)
+    hit_tgt = fwd >= entry * (1 + target_pct)
+    first_stop = np.where(hit_stop.any(2), hit_stop.argmax(2), horizon)
+    first_tgt = np.where(hit_tgt.any(2), hit_tgt.argmax(2), horizon)
+    resolved = (first_stop < horizon) | (first_tgt < horizon)
+    r = np.where(first_stop <= first_tgt, -stop_pct, target_pct)
+    return r[resolved & np.isfinite(close[:len(fwd)])]
+
+
+def wallet_inputs(wallet, stop_pct=STOP_PCT, target_pct=TARGET_PCT):
+    """Price matrix and position arrays for the wallet's open positions"""
+    import market_data
+    import risk
+
+    held = {p['symbol'] + ".NS": p for p in wallet['positions']}
+    _, syms, close = market_data.price_matrix(list(held))
+    if not syms:    # no bars for any holding (bad tickers, upstream down)
+        empty = np.array([])
+        return np.empty((0, 0)), empty, empty, empty, empty, wallet['balance'] + sum(p['cost'] for p in held.values())
+    pos = [held[s] for s in syms]
+    price = close[-1]
+    qty = np.array([p['qty'] for p in pos])
+    stop = np.array([p.get('stop_loss', p['entry_price'] * (1 - stop_pct)) for p in pos])
+    target = np.array([p.get('target', p['entry_price'] * (1 + target_pct)) for p in pos])
+    cash = wallet['balance'] + sum(p['cost'] for p in wallet['positions'] if p['symbol'] + ".NS" not in syms)
+    return risk.log_returns(close), price, qty, stop, target, cash
+
+
+def trade_outcomes(wallet, symbols=None):
+    """Closed-trade returns from the wallet, or the stop/target rule over historical bars"""
+    closed = [t['pnl'] / t['cost'] for t in wallet.get('trades', []) if t.get('cost')]
+    if len(closed) >= MIN_TRADES:
+        return np.array(closed), "wallet trades"
+    import market_data
+    from india_daily import STOCKS
+
+    symbols = symbols or [s for syms in STOCKS.values() for s in syms]
+    _, _, close = market_data.price_matrix(symbols)
+    return rule_outcomes(close), "stop/target rule on 1y bars"
+
+
+def format_report(rep):
+    pnl = rep['pnl_pct']
+    dd = rep['max_dd_pct']
+    return [
+        f"🎲 Monte Carlo ({rep['mode']}): {rep['paths']:,} paths in {rep['seconds']}s",
+        f"   P&L  p5 ₹{pnl[5]:+,.0f} | p25 ₹{pnl[25]:+,.0f} | p50 ₹{pnl[50]:+,.0f} | "
+        f"p75 ₹{pnl[75]:+,.0f} | p95 ₹{pnl[95]:+,.0f} | mean ₹{rep['mean_pnl']:+,.0f}",
+        f"   Max DD p50 {dd[50]*100:.1f}% | p95 {dd[95]*100:.1f}% | p99 {dd[99]*100:.1f}%",
+        f"   P(loss) {rep['prob_loss']*100:.1f}% | P(ruin) {rep['prob_ruin']*100:.2f}% | "
+        f"exits: {rep['exits']['stop']:,} stop / {rep['exits']['target']:,} target / {rep['exits']['open']:,} open",
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo outcomes for the paper-trading wallet")
+    parser.add_argument("--mode", choices=["returns", "trades"], default="returns")
+    parser.add_argument("--paths", type=int, default=PATHS)
+    parser.add_argument("--horizon", type=int, default=HORIZON)
+    parser.add_argument("--trades", type=int, default=TRADES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    from india_daily import load_wallet
+
+    wallet = load_wallet()
+    if args.mode == "returns":
+        if not wallet['positions']:
+            print("No open positions - use --mode trades")
+            return
+        returns, price, qty, stop, target, cash = wallet_inputs(wallet)
+        if not len(price):
+            print("No bars for any open position - use --mode trades")
+            return
+        rep = simulate_wallet(returns, price, qty, stop, target, cash, wallet['capital'], paths=args.paths,
+                              horizon=args.horizon, seed=args.seed, workers=args.workers)
+    else:
+        outcomes, source = trade_outcomes(wallet)
+        print(f"Bootstrapping {len(outcomes):,} trade outcomes from {source}")
+        rep = simulate_trades(outcomes, wallet['capital'], paths=args.paths, trades=args.trades,
+                              seed=args.seed, workers=args.workers)
+    for line in format_report(rep):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
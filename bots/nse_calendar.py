@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+KAI - NSE Trading Calendar
+Trading days, holidays and session times for the National Stock Exchange
+"""
+
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+IST = ZoneInfo("Asia/Kolkata")
+PRE_OPEN = time(9, 0)
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+
+# Extra or corrected holidays, one "YYYY-MM-DD" per entry in a JSON list.
+# NSE publishes next year's list each December; add it here until the table below is updated.
+HOLIDAY_FILE = "/home/anand/.openclaw/workspace/trading/nse_holidays.json"
+
+# Equity segment trading holidays falling on weekdays (NSE circulars)
+HOLIDAYS = {
+    # 2025
+    date(2025, 2, 26),   # Mahashivratri
+    date(2025, 3, 14),   # Holi
+    date(2025, 3, 31),   # Id-Ul-Fitr
+    date(2025, 4, 10),   # Shri Mahavir Jayanti
+    date(2025, 4, 14),   # Dr. Baba Saheb Ambedkar Jayanti
+    date(2025, 4, 18),   # Good Friday
+    date(2025, 5, 1),    # Maharashtra Day
+    date(2025, 8, 15),   # Independence Day
+    date(2025, 8, 27),   # Ganesh Chaturthi
+    date(2025, 10, 2),   # Mahatma Gandhi Jayanti / Dussehra
+    date(2025, 10, 21),  # Diwali Laxmi Pujan (muhurat session only)
+    date(2025, 10, 22),  # Balipratipada
+    date(2025, 11, 5),   # Prakash Gurpurb Sri Guru Nanak Dev
+    date(2025, 12, 25),  # Christmas
+    # 2026
+    date(2026, 1, 26),   # Republic Day
+    date(2026, 3, 3),    # Holi
+    date(2026, 3, 26),   # Shri Ram Navami
+    date(2026, 3, 31),   # Shri Mahavir Jayanti
+    date(2026, 4, 3),    # Good Friday
+    date(2026, 4, 14),   # Dr. Baba Saheb Ambedkar Jayanti
+    date(2026, 5, 1),    # Maharashtra Day
+    date(2026, 5, 28),   # Bakri Id
+    date(2026, 6, 26),   # Muharram
+    date(2026, 9, 14),   # Ganesh Chaturthi
+    date(2026, 10, 2),   # Mahatma Gandhi Jayanti
+    date(2026, 10, 20),  # Dussehra
+    date(2026, 11, 10),  # Diwali Balipratipada
+    date(2026, 11, 24),  # Prakash Gurpurb Sri Guru Nanak Dev
+    date(2026, 12, 25),  # Christmas
+}
+
+
+def load_holidays(path=HOLIDAY_FILE):
+    holidays = set(HOLIDAYS)
+    if os.path.exists(path):
+        with open(path) as f:
+            holidays.update(date.fromisoformat(d) for d in json.load(f))
+    return holidays
+
+
+_holidays = load_holidays()
+
+
+def now():
+    return datetime.now(IST)
+
+
+def is_trading_day(day):
+    if isinstance(day, datetime):
+        day = day.astimezone(IST).date() if day.tzinfo else day.date()
+    return day.weekday() < 5 and day not in _holidays
+
+
+def next_trading_day(day, include_today=False):
+    if isinstance(day, datetime):
+        day = day.date()
+    if not include_today:
+        day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return day
+
+
+def previous_trading_day(day):
+    if isinstance(day, datetime):
+        day = day.date()
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def at(day, t):
+    """Timezone-aware IST datetime for a session time on a given day"""
+    return datetime.combine(day, t, tzinfo=IST)
+
+
+def is_open(moment=None):
+    moment = (moment or now()).astimezone(IST)
+    return is_trading_day(moment) and MARKET_OPEN <= moment.time() < MARKET_CLOSE
+
+
+def trading_days(start, end):
+    day = start if is_trading_day(start) else next_trading_day(start)
+    while day <= end:
+        yield day
+        day = next_trading_day(day)
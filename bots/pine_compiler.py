@@ -0,0 +1,1389 @@
+#!/usr/bin/env python3
+"""
+KAI - Pine Script Compiler
+Compiles the Pine v5 subset used by scripts/*.pine (ta.*, input.*, `var`
+state, if/switch, strategy.entry/exit) into a NumPy program over T x N bar
+matrices: pure series expressions run once for the whole universe, while
+`var` state and orders advance bar by bar with one vector per symbol
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+import indicators as ta
+
+# Config
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+DEFAULT_CAPITAL = 100000        # per symbol when strategy() sets no initial_capital (= PAPER_CAPITAL)
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+TYPES = {"int", "float", "bool", "string", "color", "table", "label", "line", "box", "array", "matrix", "map"}
+COMPARE = {"==", "!=", "<", ">", "<=", ">="}
+ORDERS = {"strategy.entry", "strategy.exit", "strategy.close", "strategy.close_all"}
+BUILTINS = {"open": "O", "high": "H", "low": "L", "close": "C", "volume": "V", "time": "_time",
+            "bar_index": "_bar_index", "hl2": "_hl2", "hlc3": "_hlc3", "ohlc4": "_ohlc4"}
+CALENDAR = {"year", "month", "dayofmonth", "dayofweek", "hour", "minute"}
+CONSTANTS = {"strategy.long": "1", "strategy.short": "-1"}
+BROKER = {"strategy.position_size": "S.position_size", "strategy.position_avg_price": "S.position_avg_price",
+          "strategy.equity": "S.equity", "barstate.islast": "(t == T - 1)", "barstate.isfirst": "(t == 0)"}
+MATH = {"math.max": "np.maximum", "math.min": "np.minimum", "math.abs": "np.abs", "math.round": "np.round",
+        "math.floor": "np.floor", "math.ceil": "np.ceil", "math.sqrt": "np.sqrt", "math.log": "np.log",
+        "math.exp": "np.exp", "math.pow": "np.power", "math.sign": "np.sign"}
+# Pine signature (parameter names, defaults) -> indicators call
+TA = {
+    "ta.ema": (("source", "length"), {}, "ta.ema({source}, {length})"),
+    "ta.sma": (("source", "length"), {}, "ta.sma({source}, {length})"),
+    "ta.rma": (("source", "length"), {}, "ta.rma({source}, {length})"),
+    "ta.rsi": (("source", "length"), {}, "ta.rsi({source}, {length})"),
+    "ta.stdev": (("source", "length"), {}, "ta.stdev({source}, {length})"),
+    "ta.change": (("source", "length"), {"length": "1"}, "ta.change({source}, {length})"),
+    "ta.atr": (("length",), {}, "ta.atr(H, L, C, {length})"),
+    "ta.macd": (("source", "fastlen", "slowlen", "siglen"), {}, "ta.macd({source}, {fastlen}, {slowlen}, {siglen})"),
+    "ta.vwap": (("source",), {"source": "_hlc3"}, "_vwap({source}, V, _new_day)"),
+    "ta.crossover": (("source1", "source2"), {}, "ta.crossover({source1}, {source2})"),
+    "ta.crossunder": (("source1", "source2"), {}, "ta.crossunder({source1}, {source2})"),
+}
+
+
+class PineError(ValueError):
+    pass
+
+
+# ---- lexer ----
+
+TOKEN = re.compile(r"""
+    (?P<ws>[ \t]+)
+  | (?P<comment>//.*)
+  | (?P<num>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?)
+  | (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<color>\#[0-9A-Fa-f]{6,8})
+  | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<op>:=|==|!=|<=|>=|=>|\+=|-=|\*=|/=|[-+*/%<>=?:()\[\],.])
+""", re.X)
+
+CONTINUES = {"=", ":=", ",", "?", ":", "+", "-", "*", "/", "%", "<", ">", "<=", ">=", "==", "!=", "and", "or", "not"}
+
+
+def _tokens(text, lineno):
+    out, pos = [], 0
+    while pos < len(text):
+        m = TOKEN.match(text, pos)
+        if not m:
+            raise PineError(f"line {lineno}: unexpected {text[pos]!r}")
+        kind, pos = m.lastgroup, m.end()
+        if kind == "comment":
+            break
+        if kind == "num":
+            out.append(("num", float(m.group()) if re.search(r"[.eE]", m.group()) else int(m.group())))
+        elif kind in ("str", "color"):
+            out.append(("str", m.group()[1:-1] if kind == "str" else m.group()))
+        elif kind != "ws":
+            out.append((kind, m.group()))
+    return out
+
+
+def logical_lines(source):
+    """[lineno, indent, tokens] per statement line; wrapped lines (open brackets, a
+    trailing operator or an indent that is not a multiple of 4) are joined"""
+    lines, depth = [], 0
+    for no, raw in enumerate(source.expandtabs(4).splitlines(), 1):
+        toks = _tokens(raw, no)
+        if not toks:
+            continue
+        indent = len(raw) - len(raw.lstrip(" "))
+        prev = lines[-1] if lines else None
+        if prev and (depth > 0 or indent % 4 or (prev[2][-1][0] != "str" and prev[2][-1][1] in CONTINUES)):
+            prev[2].extend(toks)
+        else:
+            lines.append([no, indent, toks])
+        depth += sum((t[1] in "([") - (t[1] in ")]") for t in toks if t[0] == "op")
+    return lines
+
+
+# ---- parser ----
+# Expressions are tuples: ("num", v) ("str", s) ("bool", b) ("na",) ("name", n)
+# ("list", items) ("un", op, a) ("bin", op, a, b) ("tern", c, a, b)
+# ("hist", base, n) ("call", fname, args, kwargs) ("switch", subject, cases, default)
+
+class Parser:
+    def __init__(self, tokens, lineno):
+        self.toks, self.i, self.lineno = tokens, 0, lineno
+
+    def error(self, msg):
+        return PineError(f"line {self.lineno}: {msg}")
+
+    def peek(self, k=0):
+        j = self.i + k
+        return self.toks[j] if j < len(self.toks) else (None, None)
+
+    def take(self, value=None):
+        tok = self.peek()
+        if tok[0] is None or (value is not None and tok[1] != value):
+            raise self.error(f"expected {value!r}, got {tok[1]!r}")
+        self.i += 1
+        return tok
+
+    def accept(self, value):
+        if self.peek()[1] == value and self.peek()[0] != "str":
+            self.i += 1
+            return True
+        return False
+
+    def name(self):
+        kind, value = self.take()
+        if kind != "name":
+            raise self.error(f"expected a name, got {value!r}")
+        return value
+
+    def done(self):
+        return self.i >= len(self.toks)
+
+    def end(self):
+        if not self.done():
+            raise self.error(f"unexpected {self.peek()[1]!r}")
+
+    def expression(self):
+        cond = self.binary(0)
+        if self.accept("?"):
+            a = self.expression()
+            self.take(":")
+            return ("tern", cond, a, self.expression())
+        return cond
+
+    LEVELS = [{"or"}, {"and"}, COMPARE, {"+", "-"}, {"*", "/", "%"}]
+
+    def binary(self, level):
+        if level == len(self.LEVELS):
+            return self.unary()
+        if level == 2 and self.accept("not"):
+            return ("un", "not", self.binary(2))
+        node = self.binary(level + 1)
+        while self.peek()[1] in self.LEVELS[level] and self.peek()[0] != "str":
+            op = self.take()[1]
+            node = ("bin", op, node, self.binary(level + 1))
+        return node
+
+    def unary(self):
+        if self.peek()[1] in ("-", "+") and self.peek()[0] == "op":
+            op = self.take()[1]
+            return ("un", op, self.unary())
+        return self.postfix(self.atom())
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == "num":
+            return ("num", value)
+        if kind == "str":
+            return ("str", value)
+        if kind == "name":
+            if value in ("true", "false"):
+                return ("bool", value == "true")
+            if value == "na" and self.peek()[1] != "(":
+                return ("na",)
+            if value == "switch":
+                raise self.error("switch is only supported as the right-hand side of a declaration")
+            while self.peek()[1] == "." and self.peek(1)[0] == "name":
+                self.i += 1
+                value += "." + self.take()[1]
+            return ("name", value)
+        if value == "(":
+            node = self.expression()
+            self.take(")")
+            return node
+        if value == "[":
+            items = []
+            while not self.accept("]"):
+                items.append(self.expression())
+                self.accept(",")
+            return ("list", items)
+        raise self.error(f"unexpected {value!r}")
+
+    def postfix(self, node):
+        while True:
+            if self.peek()[1] == "(" and node[0] == "name":
+                self.take("(")
+                args, kwargs = [], {}
+                while not self.accept(")"):
+                    if self.peek()[0] == "name" and self.peek(1)[1] == "=":
+                        key = self.take()[1]
+                        self.take("=")
+                        kwargs[key] = self.expression()
+                    else:
+                        args.append(self.expression())
+                    self.accept(",")
+                node = ("call", node[1], args, kwargs)
+            elif self.peek()[1] == "[":
+                self.take("[")
+                node = ("hist", node, self.expression())
+                self.take("]")
+            elif self.peek()[1] == "." and self.peek(1)[0] == "name" and node[0] == "call":
+                raise self.error("method calls are outside the supported subset")
+            else:
+                return node
+
+
+def _child_block(lines, i, indent):
+    if i < len(lines) and lines[i][1] > indent:
+        return _block(lines, i, lines[i][1])
+    raise PineError(f"line {lines[i - 1][0]}: expected an indented block")
+
+
+def _block(lines, i, indent):
+    body = []
+    while i < len(lines) and lines[i][1] >= indent:
+        if lines[i][1] > indent:
+            raise PineError(f"line {lines[i][0]}: unexpected indent")
+        stmt, i = _statement(lines, i)
+        body.append(stmt)
+    return body, i
+
+
+def _switch(p, lines, i):
+    """`switch [subject]` followed by indented `case => value` lines"""
+    p.take("switch")
+    subject = None if p.done() else p.expression()
+    p.end()
+    cases, default = [], None
+    j = i + 1
+    while j < len(lines) and lines[j][1] > lines[i][1]:
+        q = Parser(lines[j][2], lines[j][0])
+        if q.accept("=>"):
+            default = q.expression()
+        else:
+            case = q.expression()
+            q.take("=>")
+            cases.append((case, q.expression()))
+        q.end()
+        j += 1
+    return ("switch", subject, cases, default), j
+
+
+def _statement(lines, i):
+    """(statement, next line index). Statements: ("if", no, cond, body, orelse)
+    ("for", no, var, start, end, body) ("decl", no, name, expr, is_var, type)
+    ("assign", no, name, expr) ("tuple", no, names, expr) ("expr", no, expr)"""
+    no, indent, toks = lines[i]
+    p = Parser(toks, no)
+    first = p.peek()[1]
+    if first == "if":
+        p.take()
+        cond = p.expression()
+        p.end()
+        body, j = _child_block(lines, i + 1, indent)
+        orelse = []
+        if j < len(lines) and lines[j][1] == indent and lines[j][2][0][1] == "else":
+            e_no, _, e_toks = lines[j]
+            if len(e_toks) > 1 and e_toks[1][1] == "if":
+                lines[j] = [e_no, indent, e_toks[1:]]
+                stmt, j = _statement(lines, j)
+                orelse = [stmt]
+            else:
+                Parser(e_toks[1:], e_no).end()
+                orelse, j = _child_block(lines, j + 1, indent)
+        return ("if", no, cond, body, orelse), j
+    if first == "for":
+        p.take()
+        var = p.name()
+        p.take("=")
+        start = p.expression()
+        p.take("to")
+        end = p.expression()
+        body, j = _child_block(lines, i + 1, indent)
+        return ("for", no, var, start, end, body), j
+
+    is_var = p.accept("var") or p.accept("varip")
+    typ = None
+    if p.peek()[1] in TYPES and p.peek(1)[0] == "name":
+        typ = p.take()[1]
+    if p.peek()[1] == "[" and "=" in [t[1] for t in toks if t[0] == "op"] and not is_var:
+        p.take("[")
+        names = []
+        while not p.accept("]"):
+            names.append(p.name())
+            p.accept(",")
+        p.take("=")
+        expr = p.expression()
+        p.end()
+        return ("tuple", no, names, expr), i + 1
+    if p.peek()[0] == "name" and p.peek(1)[1] in ("=", ":=", "+=", "-=", "*=", "/="):
+        name = p.take()[1]
+        op = p.take()[1]
+        if p.peek()[1] == "switch":
+            expr, j = _switch(p, lines, i)
+        else:
+            expr = p.expression()
+            p.end()
+            j = i + 1
+        if op == "=":
+            return ("decl", no, name, expr, is_var, typ), j
+        if op != ":=":
+            expr = ("bin", op[0], ("name", name), expr)
+        return ("assign", no, name, expr), j
+    if is_var or typ:
+        raise p.error("expected a declaration")
+    if "=>" in [t[1] for t in toks if t[0] == "op"]:
+        raise p.error("user-defined functions are outside the supported subset")
+    expr = p.expression()
+    p.end()
+    return ("expr", no, expr), i + 1
+
+
+def parse(source):
+    lines = logical_lines(source)
+    body, i = _block(lines, 0, lines[0][1] if lines else 0)
+    if i < len(lines):
+        raise PineError(f"line {lines[i][0]}: unexpected dedent")
+    return body
+
+
+# ---- analysis ----
+
+def _children(node):
+    tag = node[0]
+    if tag == "call":
+        return node[2] + list(node[3].values())
+    if tag == "list":
+        return node[1]
+    if tag == "switch":
+        parts = [node[1], node[3]] + [x for case in node[2] for x in case]
+        return [x for x in parts if x is not None]
+    return [x for x in node[1:] if isinstance(x, tuple)]
+
+
+def _names(node, out=None):
+    """Identifiers an expression reads (history bases included, call names excluded)"""
+    out = set() if out is None else out
+    if isinstance(node, tuple):
+        if node[0] == "name":
+            out.add(node[1])
+        for child in _children(node):
+            _names(child, out)
+    return out
+
+
+def _calls(node, out=None):
+    out = set() if out is None else out
+    if isinstance(node, tuple):
+        if node[0] == "call":
+            out.add(node[1])
+        for child in _children(node):
+            _calls(child, out)
+    return out
+
+
+def _mark(block, names, live):
+    """One liveness pass: orders are live, then anything they (transitively) read"""
+    any_live = False
+    for s in block:
+        tag = s[0]
+        if tag in ("if", "for"):
+            inner = [_mark(b, names, live) for b in ((s[3], s[4]) if tag == "if" else (s[5],))]
+            if any(inner):
+                live.add(id(s))
+                _names(s[2], names)
+                if tag == "for":
+                    _names(s[3], names)
+                    _names(s[4], names)
+        elif tag in ("decl", "assign") and s[2] in names:
+            live.add(id(s))
+            _names(s[3], names)
+        elif tag == "tuple" and names & set(s[2]):
+            live.add(id(s))
+            _names(s[3], names)
+        elif tag == "expr" and s[2][0] == "call" and s[2][1] in ORDERS:
+            live.add(id(s))
+            _names(s[2], names)
+        any_live |= id(s) in live
+    return any_live
+
+
+def live_statements(body):
+    names, live = set(), set()
+    while True:
+        before = (len(names), len(live))
+        _mark(body, names, live)
+        if (len(names), len(live)) == before:
+            return live
+
+
+def _literal(node, lineno):
+    tag = node[0]
+    if tag in ("num", "str", "bool"):
+        return node[1]
+    if tag == "na":
+        return None
+    if tag == "name":
+        return node[1].split(".")[-1]
+    if tag == "un" and node[1] == "-":
+        return -_literal(node[2], lineno)
+    if tag == "list":
+        return [_literal(x, lineno) for x in node[1]]
+    raise PineError(f"line {lineno}: expected a literal")
+
+
+# ---- code generation ----
+
+class Compiler:
+    def __init__(self, body):
+        self.body = body
+        self.header = {}
+        self.inputs = {}
+        self.kinds = {}             # name -> "const" | "series" | "state"
+        self.bools = set()
+        self.entry_sides = {}       # strategy.entry id -> 1 / -1
+        self.prelude, self.state, self.lines = [], [], []
+        self.hoisted = {}
+        self.counter = 0
+
+    def error(self, lineno, msg):
+        return PineError(f"line {lineno}: {msg}")
+
+    # -- names --
+
+    def ref(self, name, ctx, lineno):
+        kind = self.kinds.get(name)
+        if kind == "const":
+            return f"v_{name}"
+        if kind in ("series", "state"):
+            return f"v_{name}" if ctx == "vec" else f"v_{name}[t]"
+        if name in BUILTINS:
+            return BUILTINS[name] if ctx == "vec" else f"{BUILTINS[name]}[t]"
+        if name in CALENDAR:
+            return self.lift(("call", name, [("name", "time")], {}), ctx, lineno)
+        if name in CONSTANTS:
+            return CONSTANTS[name]
+        if name in BROKER:
+            if ctx == "vec":
+                raise self.error(lineno, f"{name} needs the broker")
+            return BROKER[name]
+        if name == "ta.tr":
+            return self.lift(("call", "ta.tr", [], {}), ctx, lineno)
+        if name == "ta.vwap":
+            return self.lift(("call", "ta.vwap", [], {}), ctx, lineno)
+        raise self.error(lineno, f"unknown name {name!r}")
+
+    def hoistable(self, node):
+        """True if node only reads inputs and series: it can run once over all bars"""
+        for n in _names(node):
+            if self.kinds.get(n) in ("const", "series") or n in BUILTINS or n in CALENDAR or n in CONSTANTS:
+                continue
+            if n in ("ta.tr", "ta.vwap"):
+                continue
+            return False
+        return True
+
+    def constant(self, node):
+        return (all(self.kinds.get(n) == "const" or n in CONSTANTS for n in _names(node))
+                and not any(c.startswith("ta.") or c == "time" or c in CALENDAR for c in _calls(node)))
+
+    def lift(self, node, ctx, lineno):
+        """Series sub-expression: computed over all bars up front, indexed at t inside the bar loop"""
+        if ctx == "vec":
+            return self.ex(node, "vec", lineno)
+        if not self.hoistable(node):
+            raise self.error(lineno, "ta.* / calendar functions of bar-by-bar state are outside the supported subset")
+        key = repr(node)
+        if key not in self.hoisted:
+            self.hoisted[key] = f"_s{len(self.hoisted)}"
+            self.prelude.append(f"{self.hoisted[key]} = {self.ex(node, 'vec', lineno)}")
+        return f"{self.hoisted[key]}[t]"
+
+    def is_bool(self, node):
+        tag = node[0]
+        if tag == "bool" or (tag == "bin" and (node[1] in COMPARE or node[1] in ("and", "or"))):
+            return True
+        if tag == "un":
+            return node[1] == "not"
+        if tag == "call":
+            return node[1] in ("na", "ta.crossover", "ta.crossunder", "time")
+        if tag == "name":
+            return node[1] in self.bools
+        if tag == "hist":
+            return self.is_bool(node[1])
+        if tag == "tern":
+            return self.is_bool(node[2]) and self.is_bool(node[3])
+        if tag == "switch":
+            return all(self.is_bool(v) for _, v in node[2]) and (node[3] is None or self.is_bool(node[3]))
+        return False
+
+    # -- expressions --
+
+    def ex(self, node, ctx, lineno):
+        tag = node[0]
+        if tag == "num":
+            return repr(node[1])
+        if tag == "str":
+            return repr(node[1])
+        if tag == "bool":
+            return repr(node[1])
+        if tag == "na":
+            return "np.nan"
+        if tag == "name":
+            return self.ref(node[1], ctx, lineno)
+        if tag == "list":
+            return "[" + ", ".join(self.ex(x, ctx, lineno) for x in node[1]) + "]"
+        if tag == "un":
+            a = self.ex(node[2], ctx, lineno)
+            return f"_not({a})" if node[1] == "not" else f"({node[1]}{a})"
+        if tag == "bin":
+            op = node[1]
+            a, b = self.ex(node[2], ctx, lineno), self.ex(node[3], ctx, lineno)
+            if op in ("and", "or"):
+                return f"_{op}({a}, {b})"
+            if op == "%":
+                return f"np.fmod({a}, {b})"
+            return f"({a} {op} {b})"
+        if tag == "tern":
+            c, a, b = (self.ex(x, ctx, lineno) for x in node[1:])
+            if self.constant(node[1]):
+                return f"({a} if {c} else {b})"
+            return f"np.where(_bool({c}), {a}, {b})"
+        if tag == "switch":
+            return self.switch(node, ctx, lineno)
+        if tag == "hist":
+            return self.history(node, ctx, lineno)
+        if tag == "call":
+            return self.call(node, ctx, lineno)
+        raise self.error(lineno, f"unsupported expression {tag}")
+
+    def switch(self, node, ctx, lineno):
+        _, subject, cases, default = node
+        out = self.ex(default, ctx, lineno) if default is not None else ("False" if self.is_bool(node) else "np.nan")
+        const = subject is not None and self.constant(subject)
+        subj = self.ex(subject, ctx, lineno) if subject is not None else None
+        for case, value in reversed(cases):
+            c = self.ex(case, ctx, lineno)
+            cond = f"{subj} == {c}" if subj is not None else c
+            v = self.ex(value, ctx, lineno)
+            out = f"({v} if {cond} else {out})" if const else f"np.where(_bool({cond}), {v}, {out})"
+        return out
+
+    def history(self, node, ctx, lineno):
+        base, n = node[1], node[2]
+        if not self.constant(n):
+            raise self.error(lineno, "history offsets must be constant")
+        off = self.ex(n, ctx, lineno)
+        if self.constant(base):
+            return self.ex(base, ctx, lineno)
+        if ctx == "vec":
+            return f"ta.shift({self.ex(base, 'vec', lineno)}, {off})"
+        if base[0] == "name" and (self.kinds.get(base[1]) in ("series", "state") or base[1] in BUILTINS):
+            arr = self.ref(base[1], "vec", lineno)
+            return f"_at({arr}, t - {off})"
+        return self.lift(node, ctx, lineno)
+
+    def bind(self, node, params, defaults, lineno):
+        _, fname, args, kwargs = node
+        if len(args) > len(params):
+            raise self.error(lineno, f"too many arguments to {fname}")
+        bound = dict(zip(params, args))
+        bound.update(kwargs)
+        missing = [p for p in params if p not in bound and p not in defaults]
+        if missing:
+            raise self.error(lineno, f"{fname} needs {', '.join(missing)}")
+        return bound
+
+    def call(self, node, ctx, lineno):
+        _, fname, args, kwargs = node
+        series = fname.startswith("ta.") or fname == "time" or fname in CALENDAR
+        if series and ctx == "bar":
+            return self.lift(node, ctx, lineno)
+        if fname in TA:
+            params, defaults, template = TA[fname]
+            bound = self.bind(node, params, defaults, lineno)
+            code = {p: self.ex(bound[p], ctx, lineno) if p in bound else defaults[p] for p in params}
+            return template.format(**code)
+        if fname in ("ta.highest", "ta.lowest"):
+            if len(args) + len(kwargs) == 1:
+                node = ("call", fname, [("name", "high" if fname == "ta.highest" else "low")] + args, kwargs)
+            bound = self.bind(node, ("source", "length"), {}, lineno)
+            return f"ta.{fname[3:]}({self.ex(bound['source'], ctx, lineno)}, {self.ex(bound['length'], ctx, lineno)})"
+        if fname == "ta.tr":
+            return "ta.true_range(H, L, C)"
+        if fname == "time":
+            bound = self.bind(node, ("timeframe", "session"), {"session": None}, lineno)
+            if "session" not in bound:
+                return "_time"
+            return f"_session(_time, {self.ex(bound['session'], ctx, lineno)})"
+        if fname in CALENDAR:
+            stamp = self.ex(args[0], ctx, lineno) if args else "_time"
+            return f"_calendar({fname!r}, {stamp})"
+        if fname in MATH:
+            return f"{MATH[fname]}({', '.join(self.ex(a, ctx, lineno) for a in args)})"
+        if fname == "na":
+            return f"_na({self.ex(args[0], ctx, lineno)})"
+        if fname == "nz":
+            rest = ", ".join(self.ex(a, ctx, lineno) for a in args)
+            return f"_nz({rest})"
+        raise self.error(lineno, f"{fname}() is outside the supported subset")
+
+    # -- statements --
+
+    def declare_state(self, name, typ, init, lineno):
+        boolean = typ == "bool" or (typ is None and init is not None and self.is_bool(init))
+        if name not in self.kinds:
+            self.kinds[name] = "state"
+            if boolean:
+                self.bools.add(name)
+            fill = "np.zeros((T, N), bool)" if boolean else "np.full((T, N), np.nan)"
+            self.state.append(f"v_{name} = {fill}")
+        return name in self.bools
+
+    def emit(self, depth, line):
+        self.lines.append("    " * (depth + 2) + line)
+
+    def assign(self, name, code, mask, depth, fresh=False):
+        target = f"v_{name}[t]"
+        if name in self.bools:
+            code = f"_bool({code})"
+        if mask is None:
+            self.emit(depth, f"{target} = {code}")
+        else:
+            keep = ("False" if name in self.bools else "np.nan") if fresh else target
+            self.emit(depth, f"{target} = np.where({mask}, {code}, {keep})")
+
+    def top_level(self, live):
+        for s in self.body:
+            if s[0] == "expr" and s[2][0] == "call" and s[2][1] == "strategy":
+                self.strategy_header(s)
+            elif s[0] == "decl" and s[3][0] == "call" and s[3][1].split(".")[0] == "input":
+                self.input(s)
+        reassigned = set()
+        self.collect_assigned([s for s in self.body if id(s) in live], live, reassigned)
+        self.collect_entries(self.body, live)
+        for s in self.body:
+            if id(s) not in live or (s[0] == "decl" and s[2] in self.inputs):
+                continue
+            tag, no = s[0], s[1]
+            if tag == "decl" and not s[4] and s[2] not in reassigned and self.hoistable(s[3]):
+                name, expr = s[2], s[3]
+                self.kinds[name] = "const" if self.constant(expr) else "series"
+                if self.is_bool(expr):
+                    self.bools.add(name)
+                self.prelude.append(f"v_{name} = {self.ex(expr, 'vec', no)}")
+            elif tag == "tuple":
+                if not self.hoistable(s[3]):
+                    raise self.error(no, "tuple results of bar-by-bar state are outside the supported subset")
+                for n in s[2]:
+                    self.kinds[n] = "series"
+                self.prelude.append(f"{', '.join('v_' + n for n in s[2])} = {self.ex(s[3], 'vec', no)}")
+            else:
+                self.statement(s, live, None, 0)
+
+    def collect_assigned(self, block, live, out):
+        for s in block:
+            if id(s) not in live:
+                continue
+            if s[0] == "assign":
+                out.add(s[2])
+            elif s[0] == "if":
+                self.collect_assigned(s[3] + s[4], live, out)
+
+    def collect_entries(self, block, live):
+        for s in block:
+            if s[0] == "if":
+                self.collect_entries(s[3] + s[4], live)
+            elif s[0] == "expr" and s[2][0] == "call" and s[2][1] == "strategy.entry" and id(s) in live:
+                bound = self.bind(s[2], ("id", "direction"), {}, s[1])
+                side = bound["direction"]
+                if bound["id"][0] == "str" and side[0] == "name" and side[1] in CONSTANTS:
+                    self.entry_sides[bound["id"][1]] = int(CONSTANTS[side[1]])
+
+    def strategy_header(self, s):
+        _, fname, args, kwargs = s[2]
+        self.header = {k: _literal(v, s[1]) for k, v in kwargs.items()}
+        if args:
+            self.header.setdefault("title", _literal(args[0], s[1]))
+
+    def input(self, s):
+        _, no, name, (_, fname, args, kwargs), _, _ = s
+        kind = fname.split(".", 1)[1] if "." in fname else None
+        default = kwargs.get("defval", args[0] if args else None)
+        if default is None:
+            raise self.error(no, f"input {name} has no default")
+        spec = {"type": kind or type(_literal(default, no)).__name__, "default": _literal(default, no)}
+        for key in ("title", "options", "minval", "maxval"):
+            if key in kwargs:
+                spec[key] = _literal(kwargs[key], no)
+        self.inputs[name] = spec
+        self.kinds[name] = "const"
+        if spec["type"] == "bool":
+            self.bools.add(name)
+        self.prelude.append(f"v_{name} = params[{name!r}]")
+
+    def statement(self, s, live, mask, depth):
+        if id(s) not in live:
+            return
+        tag, no = s[0], s[1]
+        if tag == "decl":
+            _, _, name, expr, is_var, typ = s
+            self.declare_state(name, typ, expr, no)
+            if is_var:
+                self.emit(depth, "if t == 0:")
+                self.assign(name, self.ex(expr, "bar", no), None, depth + 1)
+                self.emit(depth, "else:")
+                self.emit(depth + 1, f"v_{name}[t] = v_{name}[t - 1]")
+            else:
+                self.assign(name, self.ex(expr, "bar", no), mask, depth, fresh=True)
+        elif tag == "assign":
+            name = s[2]
+            if self.kinds.get(name) != "state":
+                raise self.error(no, f"{name} is assigned before it is declared")
+            self.assign(name, self.ex(s[3], "bar", no), mask, depth)
+        elif tag == "if":
+            self.counter += 1
+            c, m, e = f"_c{self.counter}", f"_m{self.counter}", f"_e{self.counter}"
+            self.emit(depth, f"{c} = _bool({self.ex(s[2], 'bar', no)})")
+            self.emit(depth, f"{m} = {c} & {mask or '_all'}")
+            for inner in s[3]:
+                self.statement(inner, live, m, depth)
+            if any(id(x) in live for x in s[4]):
+                self.emit(depth, f"{e} = ~{c} & {mask or '_all'}")
+                for inner in s[4]:
+                    self.statement(inner, live, e, depth)
+        elif tag == "expr":
+            self.order(s[2], mask or "_all", depth, no)
+        elif tag == "for":
+            raise self.error(no, "for loops are outside the supported subset")
+        elif tag == "tuple":
+            raise self.error(no, "tuple declarations inside blocks are outside the supported subset")
+
+    def order(self, node, mask, depth, no):
+        _, fname, args, kwargs = node
+        if fname == "strategy.entry":
+            b = self.bind(node, ("id", "direction", "qty", "limit", "stop"), {"qty": None, "limit": None, "stop": None}, no)
+            if "limit" in b or "stop" in b:
+                raise self.error(no, "limit/stop entry orders are outside the supported subset")
+            side = self.ex(b["direction"], "bar", no)
+            qty = self.ex(b["qty"], "bar", no) if "qty" in b else "None"
+            if "when" in kwargs:
+                mask = f"({mask} & _bool({self.ex(kwargs['when'], 'bar', no)}))"
+            self.emit(depth, f"orders.entry({mask}, {side}, {qty})")
+        elif fname == "strategy.exit":
+            b = self.bind(node, ("id", "from_entry"), {}, no)
+            if "profit" in b or "loss" in b or "trail_points" in b or "trail_price" in b:
+                raise self.error(no, "profit/loss/trailing exits are outside the supported subset")
+            side = self.entry_side(b.get("from_entry"), no)
+            stop = self.ex(b["stop"], "bar", no) if "stop" in b else "None"
+            limit = self.ex(b["limit"], "bar", no) if "limit" in b else "None"
+            self.emit(depth, f"orders.exit({mask}, {side}, stop={stop}, limit={limit})")
+        elif fname == "strategy.close":
+            b = self.bind(node, ("id",), {}, no)
+            self.emit(depth, f"orders.close({mask}, {self.entry_side(b['id'], no)})")
+        elif fname == "strategy.close_all":
+            self.emit(depth, f"orders.close({mask}, None)")
+
+    def entry_side(self, node, no):
+        if node is None:
+            return "None"
+        if node[0] != "str" or node[1] not in self.entry_sides:
+            raise self.error(no, "exits must name an entry id placed with a constant direction")
+        return str(self.entry_sides[node[1]])
+
+    def source(self):
+        out = ["def build(B, params):",
+               "    O, H, L, C, V = B['open'], B['high'], B['low'], B['close'], B['volume']",
+               "    _time, _new_day, _bar_index = B['time'], B['new_day'], B['bar_index']",
+               "    _hl2, _hlc3, _ohlc4 = (H + L) / 2, (H + L + C) / 3, (O + H + L + C) / 4",
+               "    T, N = C.shape",
+               "    _all = np.ones(N, bool)"]
+        out += ["    " + line for line in self.prelude + self.state]
+        out.append("")
+        out.append("    def bar(t, S, orders):")
+        out += self.lines or ["        pass"]
+        out.append("")
+        named = ", ".join(f"{n!r}: v_{n}" for n in self.kinds)
+        out.append(f"    return {{{named}}}, bar")
+        return "\n".join(out) + "\n"
+
+
+# ---- runtime ----
+
+def _bool(x):
+    """Pine truthiness: na is false"""
+    a = np.asarray(x)
+    if a.dtype.kind == "f":
+        return (a != 0) & ~np.isnan(a)
+    return a.astype(bool)
+
+
+def _and(a, b):
+    return np.logical_and(_bool(a), _bool(b))
+
+
+def _or(a, b):
+    return np.logical_or(_bool(a), _bool(b))
+
+
+def _not(a):
+    return np.logical_not(_bool(a))
+
+
+def _na(x):
+    a = np.asarray(x)
+    return np.isnan(a) if a.dtype.kind == "f" else np.zeros(a.shape, bool)
+
+
+def _nz(x, replacement=0):
+    return np.where(_na(x), replacement, x)
+
+
+def _at(a, i):
+    """a[i] for a T x N series, na before the first bar"""
+    if i >= 0:
+        return a[i]
+    return np.zeros(a.shape[1:], bool) if a.dtype == bool else np.full(a.shape[1:], np.nan)
+
+
+def _calendar(field, stamps):
+    d = np.asarray(stamps).astype("M8[ms]")
+    if field == "year":
+        return d.astype("M8[Y]").astype(float) + 1970
+    if field == "month":
+        return d.astype("M8[M]").astype(float) % 12 + 1
+    if field == "dayofmonth":
+        return (d - d.astype("M8[M]")).astype("m8[D]").astype(float) + 1
+    if field == "dayofweek":
+        return (d.astype("M8[D]").astype(np.int64) + 4) % 7 + 1.0     # 1 = Sunday
+    minutes = (d - d.astype("M8[D]")).astype("m8[m]").astype(float)
+    return minutes // 60 if field == "hour" else minutes % 60
+
+
+def _session(stamps, spec):
+    """time(tf, "HHMM-HHMM[:days]") as a bool series. Daily bars carry no time of
+    day, so every bar covers the session (on its listed weekdays)."""
+    hours, _, days = spec.partition(":")
+    start, end = (int(x[:2]) * 60 + int(x[2:]) for x in hours.split("-"))
+    minutes = _calendar("hour", stamps) * 60 + _calendar("minute", stamps)
+    inside = (minutes >= start) & (minutes < end) if minutes.any() else np.ones(minutes.shape, bool)
+    if days:
+        inside &= np.isin(_calendar("dayofweek", stamps), [int(d) for d in days])
+    return inside
+
+
+def _vwap(src, volume, new_day):
+    src = np.asarray(src, dtype=float)
+    return ta.vwap(src, src, src, volume, new_day[:, 0])
+
+
+RUNTIME = {"np": np, "ta": ta, "_bool": _bool, "_and": _and, "_or": _or, "_not": _not, "_na": _na,
+           "_nz": _nz, "_at": _at, "_calendar": _calendar, "_session": _session, "_vwap": _vwap}
+
+
+class Orders:
+    """What the script asked for on one bar, one slot per symbol"""
+
+    def __init__(self, n):
+        self.side = np.zeros(n, np.int8)
+        self.size = np.full(n, np.nan)
+        self.closing = np.zeros(n, np.int8)        # 1 / -1 close that side, 2 close any
+        self.exiting = {1: np.zeros(n, bool), -1: np.zeros(n, bool)}
+        self.stop = {1: np.full(n, np.nan), -1: np.full(n, np.nan)}
+        self.limit = {1: np.full(n, np.nan), -1: np.full(n, np.nan)}
+
+    def entry(self, mask, side, qty=None):
+        mask = np.broadcast_to(_bool(mask), self.side.shape)
+        self.side[mask] = side
+        self.size[mask] = np.nan if qty is None else np.broadcast_to(np.asarray(qty, float), self.size.shape)[mask]
+
+    def exit(self, mask, side=None, stop=None, limit=None):
+        mask = np.broadcast_to(_bool(mask), self.side.shape)
+        for d in (side,) if side else (1, -1):
+            self.exiting[d] |= mask
+            # several exits on one entry: the first level price reaches wins
+            if stop is not None:
+                tighter = np.fmax if d == 1 else np.fmin
+                self.stop[d] = np.where(mask, tighter(self.stop[d], stop), self.stop[d])
+            if limit is not None:
+                nearer = np.fmin if d == 1 else np.fmax
+                self.limit[d] = np.where(mask, nearer(self.limit[d], limit), self.limit[d])
+
+    def close(self, mask, side=None):
+        self.closing[np.broadcast_to(_bool(mask), self.side.shape)] = side or 2
+
+
+class Book:
+    """Per-symbol positions for the backtest; the script reads it as strategy.*"""
+
+    def __init__(self, n, capital):
+        self.cash = np.full(n, float(capital))
+        self.position_size = np.zeros(n)
+        self.position_avg_price = np.full(n, np.nan)
+        self.equity = self.cash.copy()
+        self.lots = [[] for _ in range(n)]          # open entries: (side, qty, price, bar)
+        self.trades = []
+
+    def _refresh(self, i):
+        lots = self.lots[i]
+        qty = sum(q for _, q, _, _ in lots)
+        self.position_size[i] = sum(s * q for s, q, _, _ in lots)
+        self.position_avg_price[i] = sum(q * p for _, q, p, _ in lots) / qty if qty else np.nan
+
+    def open(self, i, side, qty, price, t):
+        self.lots[i].append((side, qty, price, t))
+        self.cash[i] -= side * qty * price
+        self._refresh(i)
+
+    def close(self, i, price, t, reason):
+        for side, qty, entry, bar in self.lots[i]:
+            self.cash[i] += side * qty * price
+            self.trades.append({"symbol": i, "side": side, "qty": qty, "entry_bar": bar, "entry_price": entry,
+                                "exit_bar": t, "exit_price": price, "pnl": side * qty * (price - entry),
+                                "reason": reason})
+        self.lots[i] = []
+        self._refresh(i)
+
+
+class Program:
+    """A compiled script: its inputs, strategy() settings and generated NumPy code"""
+
+    def __init__(self, name, source_text):
+        body = parse(source_text)
+        compiler = Compiler(body)
+        compiler.top_level(live_statements(body))
+        self.name = name
+        self.header = compiler.header
+        self.title = compiler.header.get("title", name)
+        self.inputs = compiler.inputs
+        self.source = compiler.source()
+        namespace = dict(RUNTIME)
+        exec(compile(self.source, f"<pine:{name}>", "exec"), namespace)
+        self._build = namespace["build"]
+
+    @property
+    def pyramiding(self):
+        return max(1, int(self.header.get("pyramiding") or 1))
+
+    @property
+    def capital(self):
+        return self.header.get("initial_capital", DEFAULT_CAPITAL)
+
+    def params(self, **overrides):
+        """Input defaults with overrides coerced to the input's type"""
+        out = {}
+        for name, spec in self.inputs.items():
+            value = overrides.pop(name, spec["default"])
+            if spec["type"] == "int":
+                value = int(value)
+            elif spec["type"] == "float":
+                value = float(value)
+            elif spec["type"] == "bool" and isinstance(value, str):
+                value = value.lower() in ("1", "true", "yes", "on")
+            if spec.get("options") and value not in spec["options"]:
+                raise ValueError(f"{name} must be one of {spec['options']}")
+            out[name] = value
+        if overrides:
+            raise ValueError(f"unknown inputs for {self.name}: {', '.join(overrides)}")
+        return out
+
+    def order_size(self, equity, price):
+        """strategy() default_qty_type/value as a share count"""
+        kind = self.header.get("default_qty_type", "fixed")
+        value = self.header.get("default_qty_value", 1)
+        if kind == "percent_of_equity":
+            return int(equity * value / 100 // price)
+        if kind == "cash":
+            return int(value // price)
+        return int(value)
+
+    def evaluate(self, fields, dates, **params):
+        """(named series, bar step) for T x N field matrices keyed Open..Volume"""
+        o, h, l, c, v = (np.asarray(fields[k], dtype=float) for k in FIELDS)
+        stamps = np.asarray(dates).astype("M8[ms]").astype(np.int64)[:, None]
+        day = stamps // 86_400_000
+        new_day = np.ones(day.shape, bool)
+        new_day[1:] = day[1:] != day[:-1]
+        builtins = {"open": o, "high": h, "low": l, "close": c, "volume": v, "time": stamps,
+                    "new_day": new_day, "bar_index": np.arange(len(c), dtype=float)[:, None]}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._build(builtins, self.params(**params))
+
+    def backtest(self, fields, dates, capital=None, **params):
+        """Run the script bar by bar over every symbol at once. Market orders fill at the
+        next bar's open; exit stops/limits are checked against the next bar's range
+        (open-to-nearest-extreme first when both are touched, as TradingView assumes)."""
+        series, bar = self.evaluate(fields, dates, **params)
+        o, h, l, c = (np.asarray(fields[k], dtype=float) for k in FIELDS[:4])
+        T, N = c.shape
+        book = Book(N, capital or self.capital)
+        pending = Orders(N)
+        stops = {1: np.full(N, np.nan), -1: np.full(N, np.nan)}
+        limits = {1: np.full(N, np.nan), -1: np.full(N, np.nan)}
+        position, equity = np.zeros((T, N)), np.zeros((T, N))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for t in range(T):
+                self._fill_market(book, pending, o[t], t)
+                self._fill_exits(book, stops, limits, o[t], h[t], l[t], t)
+                held = np.sign(book.position_size)
+                for d in (1, -1):
+                    stops[d][held != d] = np.nan
+                    limits[d][held != d] = np.nan
+                book.equity = book.cash + np.nan_to_num(book.position_size * c[t])
+                pending = Orders(N)
+                bar(t, book, pending)
+                for d in (1, -1):
+                    stops[d] = np.where(pending.exiting[d], pending.stop[d], stops[d])
+                    limits[d] = np.where(pending.exiting[d], pending.limit[d], limits[d])
+                position[t], equity[t] = book.position_size, book.equity
+        trades = book.trades + [{"symbol": i, "side": s, "qty": q, "entry_bar": b, "entry_price": p,
+                                 "exit_bar": None, "exit_price": None, "pnl": s * q * (c[-1, i] - p),
+                                 "reason": "open"}
+                                for i, lots in enumerate(book.lots) for s, q, p, b in lots]
+        return {"series": series, "bar": bar, "trades": trades, "position": position, "equity": equity,
+                "pending": pending, "capital": capital or self.capital}
+
+    def _fill_market(self, book, orders, price, t):
+        for i in np.flatnonzero(orders.closing):
+            side = orders.closing[i]
+            if book.lots[i] and (side == 2 or book.lots[i][0][0] == side) and np.isfinite(price[i]):
+                book.close(i, price[i], t, "close")
+        for i in np.flatnonzero(orders.side):
+            side, p = int(orders.side[i]), price[i]
+            if not np.isfinite(p):
+                continue
+            if book.lots[i] and book.lots[i][0][0] == -side:
+                book.close(i, p, t, "reverse")
+            if len(book.lots[i]) >= self.pyramiding:
+                continue
+            size = orders.size[i]
+            qty = int(size) if np.isfinite(size) else self.order_size(book.cash[i] + book.position_size[i] * p, p)
+            if qty > 0:
+                book.open(i, side, qty, p, t)
+
+    def _fill_exits(self, book, stops, limits, o, h, l, t):
+        held = np.sign(book.position_size)
+        for d in (1, -1):
+            stop, limit = stops[d], limits[d]
+            hit_stop = (held == d) & ((l <= stop) if d == 1 else (h >= stop))
+            hit_limit = (held == d) & ((h >= limit) if d == 1 else (l <= limit))
+            for i in np.flatnonzero(hit_stop | hit_limit):
+                high_first = h[i] - o[i] < o[i] - l[i]
+                stop_first = hit_stop[i] and (not hit_limit[i] or high_first == (d == -1))
+                if stop_first:
+                    price = min(o[i], stop[i]) if d == 1 else max(o[i], stop[i])
+                    book.close(i, price, t, "stop")
+                else:
+                    price = max(o[i], limit[i]) if d == 1 else min(o[i], limit[i])
+                    book.close(i, price, t, "limit")
+
+    def signals(self, fields, dates, capital=None, **params):
+        """Orders on the last bar for a flat book: entry side per symbol, plus the stop
+        and limit the script's exits would set for a long filled at the last close"""
+        run = self.backtest(fields, dates, capital, **params)
+        c = np.asarray(fields["Close"], dtype=float)
+        T, N = c.shape
+        flat, entries = Book(N, run["capital"]), Orders(N)
+        run["bar"](T - 1, flat, entries)
+        held, exits = Book(N, run["capital"]), Orders(N)
+        held.position_size[:] = 1
+        held.position_avg_price = c[-1].copy()
+        run["bar"](T - 1, held, exits)
+        return {"side": entries.side, "stop": exits.stop[1], "limit": exits.limit[1]}
+
+
+def compile_file(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name = "pine_" + (stem[len("strategy_"):] if stem.startswith("strategy_") else stem)
+    with open(path) as f:
+        return Program(name, f.read())
+
+
+def load_scripts(directory=SCRIPTS_DIR):
+    """Every *.pine strategy in directory; scripts outside the subset are reported and skipped"""
+    programs = []
+    if not os.path.isdir(directory):
+        return programs
+    for fname in sorted(os.listdir(directory)):
+        if fname.endswith(".pine"):
+            try:
+                programs.append(compile_file(os.path.join(directory, fname)))
+            except PineError as e:
+                print(f"pine_compiler: skipping {fname}: {e}")
+    return programs
+
+
+def summarize(program, run, symbols):
+    trades = run["trades"]
+    closed = [t for t in trades if t["reason"] != "open"]
+    wins = sum(1 for t in closed if t["pnl"] > 0)
+    final = run["equity"][-1]
+    by_symbol = {}
+    for t in trades:
+        by_symbol[symbols[t["symbol"]]] = by_symbol.get(symbols[t["symbol"]], 0) + t["pnl"]
+    best = sorted(by_symbol.items(), key=lambda kv: -kv[1])[:5]
+    return [f"{program.name:22} {program.title}",
+            f"   {len(closed)} closed / {len(trades) - len(closed)} open trades | "
+            f"win rate {wins / len(closed) * 100 if closed else 0:.0f}% | "
+            f"mean return {(final / run['capital'] - 1).mean() * 100:+.2f}% per symbol",
+            "   best: " + ", ".join(f"{s.replace('.NS', '')} ₹{p:+,.0f}" for s, p in best)]
+
+
+# ---- parity ----
+# Hand ports of the four scripts, written directly against indicators.py with
+# plain per-symbol loops; the compiled programs must reproduce them exactly.
+
+def _ref_cross(fast, slow):
+    up = (fast > slow) & (ta.shift(fast) <= ta.shift(slow))
+    down = (fast < slow) & (ta.shift(fast) >= ta.shift(slow))
+    return up, down
+
+
+def _ref_supertrend(f, p):
+    atr = ta.atr(f["High"], f["Low"], f["Close"], p["atrPeriod"])
+    hl2 = (f["High"] + f["Low"]) / 2
+    up_level, dn_level = hl2 - p["stMultiplier"] * atr, hl2 + p["stMultiplier"] * atr
+    T, N = atr.shape
+    upper, lower, trend = np.full((T, N), np.nan), np.full((T, N), np.nan), np.zeros((T, N))
+    close = f["Close"]
+    for i in range(N):
+        for t in range(T):
+            prev_u = upper[t - 1, i] if t else np.nan
+            prev_l = lower[t - 1, i] if t else np.nan
+            if np.isnan(prev_u):
+                upper[t, i], lower[t, i] = up_level[t, i], dn_level[t, i]
+            else:
+                upper[t, i] = max(up_level[t, i], prev_u) if not np.isnan(up_level[t, i]) else np.nan
+                lower[t, i] = min(dn_level[t, i], prev_l) if not np.isnan(dn_level[t, i]) else np.nan
+            if close[t, i] > prev_u:
+                trend[t, i] = 1
+            elif close[t, i] < prev_l:
+                trend[t, i] = -1
+            else:
+                trend[t, i] = trend[t - 1, i] if t else 0     # nz(trend[1]) is 0 on the first bar
+    return atr, upper, lower, trend
+
+
+def _ref_high_win_rate(f, dates, p):
+    c = f["Close"]
+    fast, slow, rsi = ta.ema(c, p["emaFast"]), ta.ema(c, p["emaSlow"]), ta.rsi(c, p["rsiPeriod"])
+    up, down = _ref_cross(fast, slow)
+    long = up & (rsi > p["rsiLower"]) & (rsi < p["rsiUpper"])
+    short = down & (rsi < 100 - p["rsiUpper"]) & (rsi > 100 - p["rsiLower"])
+    sl, tp = p["slPercent"] / 100, p["tpPercent"] / 100
+
+    def levels(side, entry, t, i):
+        return (entry * (1 - sl), entry * (1 + tp)) if side == 1 else (entry * (1 + sl), entry * (1 - tp))
+    series = {"ema9": fast, "ema21": slow, "rsi": rsi, "longCondition": long, "shortCondition": short}
+    return series, long, short, levels, True
+
+
+def _ref_intraday(f, dates, p):
+    c = f["Close"]
+    fast, slow, rsi = ta.ema(c, p["emaFast"]), ta.ema(c, p["emaSlow"]), ta.rsi(c, p["rsiPeriod"])
+    atr, upper, lower, trend = _ref_supertrend(f, p)
+    vwap = ta.vwap(c, c, c, f["Volume"], np.ones(len(c), bool))
+    up, down = _ref_cross(fast, slow)
+    long = up & (rsi > p["rsiLower"]) & (rsi < p["rsiUpper"]) & (trend == 1)
+    short = down & (rsi > 100 - p["rsiUpper"]) & (rsi < 100 - p["rsiLower"]) & (trend == -1)
+    if p["useVWAP"]:
+        long &= c > vwap
+        short &= c < vwap
+
+    def levels(side, entry, t, i):
+        return entry - side * p["slATR"] * atr[t, i], entry + side * p["tpATR"] * atr[t, i]
+    series = {"atr": atr, "upper": upper, "lower": lower, "trend": trend, "vwap": vwap,
+              "longEntry": long, "shortEntry": short}
+    return series, long, short, levels, True
+
+
+def _ref_ultimate(f, dates, p):
+    c, h, l = f["Close"], f["High"], f["Low"]
+    fast, slow, rsi = ta.ema(c, p["emaFast"]), ta.ema(c, p["emaSlow"]), ta.rsi(c, p["rsiPeriod"])
+    _, _, hist = ta.macd(c, 12, 26, 9)
+    atr, upper, lower, trend = _ref_supertrend(f, p)
+    up, down = _ref_cross(fast, slow)
+    lo, hi = p["rsiLower"], p["rsiUpper"]
+    long = {"RSI_MACD": (rsi > lo) & (rsi < hi) & (hist > 0),
+            "EMA_CROSS": up,
+            "SUPERTREND": trend == 1,
+            "BREAKOUT": c > ta.shift(ta.highest(h, p["breakoutPeriod"])),
+            "DONCHIAN": c > ta.shift(ta.highest(h, 20)),
+            "COMBO": up & (rsi > lo) & (hist > 0)}[p["strategySel"]]
+    short = {"RSI_MACD": (rsi < 100 - hi) & (rsi > 100 - lo) & (hist < 0),
+             "EMA_CROSS": down,
+             "SUPERTREND": trend == -1,
+             "BREAKOUT": c < ta.shift(ta.lowest(l, p["breakoutPeriod"])),
+             "DONCHIAN": c < ta.shift(ta.lowest(l, 20)),
+             "COMBO": down & (rsi < 100 - hi) & (hist < 0)}[p["strategySel"]]
+
+    def levels(side, entry, t, i):
+        return entry - side * p["slATR"] * atr[t, i], entry + side * p["tpATR"] * atr[t, i]
+    series = {"macdHist": hist, "trend": trend, "upper": upper, "lower": lower, "longEntry": long, "shortEntry": short}
+    return series, long, short, levels, True
+
+
+def _ref_buyhold(f, dates, p):
+    months = np.asarray(dates).astype("M8[M]").astype(int) % 12 + 1
+    T, N = f["Close"].shape
+    buy, count = np.zeros((T, N), bool), np.zeros((T, N))
+    bought, last = 0, None
+    for t, month in enumerate(months):
+        if month != last:
+            last = month
+            if bought < p["maxMonths"]:
+                buy[t] = True
+                bought += 1
+        count[t] = bought
+    return {"buyCount": count}, buy, np.zeros((T, N), bool), None, False
+
+
+REFERENCES = {
+    "pine_high_win_rate": (_ref_high_win_rate, [{}, {"slPercent": 1.0, "tpPercent": 5.0}]),
+    "pine_intraday_final": (_ref_intraday, [{}, {"useVWAP": False}, {"useVWAP": False, "stMultiplier": 1.5}]),
+    "pine_ultimate": (_ref_ultimate, [{"strategySel": s} for s in
+                                      ("RSI_MACD", "EMA_CROSS", "SUPERTREND", "BREAKOUT", "DONCHIAN", "COMBO")]),
+    "pine_buyhold_final": (_ref_buyhold, [{}, {"maxMonths": 3}]),
+}
+
+
+def _ref_backtest(program, f, long, short, levels, flat_only, capital):
+    """Scalar broker, one symbol at a time, same fill rules as Program.backtest"""
+    o, h, l, c = (f[k] for k in FIELDS[:4])
+    T, N = c.shape
+    trades = []
+    for i in range(N):
+        lots, pending, stop, limit, cash = [], 0, np.nan, np.nan, float(capital)
+        for t in range(T):
+            if pending and np.isfinite(o[t, i]):
+                if lots and lots[0][0] == -pending:
+                    for s, q, p, b in lots:
+                        cash += s * q * o[t, i]
+                        trades.append((i, s, q, b, p, t, o[t, i]))
+                    lots = []
+                if len(lots) < program.pyramiding:
+                    pos = sum(s * q for s, q, _, _ in lots)
+                    qty = program.order_size(cash + pos * o[t, i], o[t, i])
+                    if qty > 0:
+                        lots.append((pending, qty, o[t, i], t))
+                        cash -= pending * qty * o[t, i]
+            if lots:
+                side = lots[0][0]
+                hit_stop = l[t, i] <= stop if side == 1 else h[t, i] >= stop
+                hit_limit = h[t, i] >= limit if side == 1 else l[t, i] <= limit
+                if hit_stop or hit_limit:
+                    high_first = h[t, i] - o[t, i] < o[t, i] - l[t, i]
+                    if hit_stop and (not hit_limit or high_first == (side == -1)):
+                        price = min(o[t, i], stop) if side == 1 else max(o[t, i], stop)
+                    else:
+                        price = max(o[t, i], limit) if side == 1 else min(o[t, i], limit)
+                    for s, q, p, b in lots:
+                        cash += s * q * price
+                        trades.append((i, s, q, b, p, t, price))
+                    lots = []
+            if not lots:
+                stop = limit = np.nan
+            pos = sum(s * q for s, q, _, _ in lots)
+            pending = 0
+            if long[t, i] and (pos == 0 or not flat_only):
+                pending = 1
+            if short[t, i] and (pos == 0 or not flat_only):
+                pending = -1
+            if pos and levels is not None:
+                avg = sum(q * p for _, q, p, _ in lots) / sum(q for _, q, _, _ in lots)
+                stop, limit = levels(int(np.sign(pos)), avg, t, i)
+        trades += [(i, s, q, b, p, None, None) for s, q, p, b in lots]
+    return sorted(trades, key=lambda x: (x[0], x[3], x[5] is None, x[5] or 0))
+
+
+def synthetic(T=400, N=12, seed=7):
+    """Random-walk OHLCV universe on business days, two symbols with short histories"""
+    rng = np.random.default_rng(seed)
+    close = 500 * np.exp(np.cumsum(rng.normal(0.0003, rng.uniform(0.01, 0.03, N), (T, N)), axis=0))
+    gap = rng.normal(0, 0.006, (T, N))
+    open_ = close * np.exp(gap)
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.015, (T, N)))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.015, (T, N)))
+    volume = rng.uniform(1e5, 1e6, (T, N))
+    fields = {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}
+    for k in fields:
+        fields[k][:60, 0] = np.nan
+        fields[k][:150, 1] = np.nan
+    dates = np.busday_offset("2025-01-01", np.arange(T), roll="forward").astype("M8[ns]")
+    return fields, dates
+
+
+def _same(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    if b.dtype == bool:
+        return np.array_equal(_bool(a), b)
+    return np.allclose(a.astype(float), b, equal_nan=True, rtol=1e-12, atol=1e-9)
+
+
+def parity(programs=None):
+    """Compile every script and compare signals, state and trades with the hand ports"""
+    fields, dates = synthetic()
+    ok = True
+    programs = programs or load_scripts()
+    for program in programs:
+        if program.name not in REFERENCES:
+            print(f"{program.name:22} no reference port")
+            continue
+        ref, cases = REFERENCES[program.name]
+        for overrides in cases:
+            params = program.params(**overrides)
+            t0 = time.perf_counter()
+            run = program.backtest(fields, dates, **overrides)
+            elapsed = time.perf_counter() - t0
+            series, long, short, levels, flat_only = ref(fields, dates, params)
+            bad = [n for n, v in series.items() if not _same(run["series"][n], v)]
+            got = sorted(((t["symbol"], t["side"], t["qty"], t["entry_bar"], t["entry_price"], t["exit_bar"],
+                           t["exit_price"]) for t in run["trades"]),
+                         key=lambda x: (x[0], x[3], x[5] is None, x[5] or 0))
+            want = _ref_backtest(program, fields, long, short, levels, flat_only, run["capital"])
+            same_trades = len(got) == len(want) and all(
+                g[:4] == w[:4] and g[5] == w[5] and np.isclose(g[4], w[4])
+                and (g[6] is None) == (w[6] is None) and (g[6] is None or np.isclose(g[6], w[6]))
+                for g, w in zip(got, want))
+            if not same_trades:
+                bad.append(f"trades ({len(got)} vs {len(want)})")
+            ok &= not bad
+            label = ", ".join(f"{k}={v}" for k, v in overrides.items()) or "defaults"
+            status = "ok" if not bad else "MISMATCH " + ", ".join(bad)
+            print(f"{program.name:22} {label:38} {len(got):>4} trades {elapsed * 1000:>6.0f} ms  {status}")
+    return ok
+
+
+def _universe():
+    import market_data
+    import india_analyzer_v3
+
+    symbols = list(dict.fromkeys(s for syms in india_analyzer_v3.STOCKS.values() for s in syms))
+    market_data.preload(symbols)
+    dates, syms, fields = market_data.matrices(symbols)
+    return fields, dates, syms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile scripts/*.pine to NumPy strategies")
+    parser.add_argument("scripts", nargs="*", help=f".pine files (default: all in {SCRIPTS_DIR})")
+    parser.add_argument("--emit", action="store_true", help="print the generated Python")
+    parser.add_argument("--backtest", action="store_true", help="backtest over the V3 universe")
+    parser.add_argument("--set", nargs="+", default=[], metavar="INPUT=VALUE", help="override inputs")
+    parser.add_argument("--parity", action="store_true", help="check the compiled scripts against hand ports")
+    args = parser.parse_args(argv)
+
+    programs = [compile_file(p) for p in args.scripts] if args.scripts else load_scripts()
+    if args.parity:
+        raise SystemExit(0 if parity(programs) else 1)
+    overrides = dict(kv.split("=", 1) for kv in args.set)
+    universe = _universe() if args.backtest else None
+    for program in programs:
+        if args.emit:
+            print(f"# {program.name}: {program.title}\n{program.source}")
+        elif universe:
+            fields, dates, syms = universe
+            known = {k: v for k, v in overrides.items() if k in program.inputs}
+            for line in summarize(program, program.backtest(fields, dates, **known), syms):
+                print(line)
+        else:
+            print(f"{program.name:22} {program.title}")
+            for name, spec in program.inputs.items():
+                print(f"   {name:16} {spec['type']:8} {spec['default']!r:12} {spec.get('title', '')}")
+
+
+if __name__ == "__main__":
+    main()
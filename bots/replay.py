@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+KAI - Historical Replay
+Drives the daily paper-trading loop (daily_report -> check_positions ->
+open_position) over past dates with a simulated clock, cached bars and an
+in-memory wallet, and emits the trade log and equity curve
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import india_daily
+import market_data
+
+# Config
+HISTORY = "2y"          # one replay year plus one year of lookback
+MAX_POSITIONS = 5
+MIN_SCORE = 5           # same cut-off as the daily report's BUY list
+LEVEL_BUFFER = 0.005    # --level-stops: stop this far under the support level
+OUT_DIR = "/home/anand/.openclaw/workspace/trading/replay"
+MARKET_CLOSE = (15, 30)
+SNAPSHOT_MAX_AGE = 1    # days before --snapshot republishes the history snapshot
+HOLIDAY_SLACK = 7       # days a snapshot may start after the lookback start (weekends, holidays)
+
+PERIOD_DAYS = {"1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827}
+
+
+class SimClock:
+    """Stands in for datetime.now; set() moves it to a trading day's close"""
+
+    def __init__(self):
+        self.current = datetime.now()
+
+    def set(self, day):
+        self.current = datetime(day.year, day.month, day.day, *MARKET_CLOSE)
+
+    def now(self):
+        return self.current
+
+
+class HistoricalProvider:
+    """Serves each symbol's bars as they looked on the clock's date.
+
+    Fundamentals are not point-in-time: info is either empty (default) or
+    today's snapshot, which leaks a little lookahead into the P/E rule.
+    """
+
+    def __init__(self, frames, clock, infos=None):
+        self.clock = clock
+        self.infos = infos or {}
+        self.frames = {}
+        for sym, df in frames.items():
+            idx = df.index.tz_localize(None) if getattr(df.index, "tz", None) is not None else df.index
+            self.frames[sym] = (df, idx.normalize().values.astype("datetime64[D]"))
+
+    def bars(self, symbol, period="1y", interval="1d"):
+        if interval != "1d" or symbol not in self.frames:
+            return None
+        df, days = self.frames[symbol]
+        today = np.datetime64(self.clock.now().date(), "D")
+        hi = np.searchsorted(days, today, side="right")
+        lo = np.searchsorted(days, today - PERIOD_DAYS.get(period, 366), side="left")
+        return df.iloc[lo:hi] if hi > lo else None
+
+    def info(self, symbol):
+        return self.infos.get(symbol, {})
+
+    def close(self, symbol):
+        df, days = self.frames[symbol]
+        hi = np.searchsorted(days, np.datetime64(self.clock.now().date(), "D"), side="right")
+        return float(df['Close'].values[hi - 1]) if hi else None
+
+    def trading_days(self, start, end):
+        days = np.unique(np.concatenate([d for _, d in self.frames.values()]))
+        days = days[(days >= np.datetime64(start, "D")) & (days <= np.datetime64(end, "D"))]
+        return [d.astype(object) for d in days]
+
+
+class SnapshotProvider(HistoricalProvider):
+    """HistoricalProvider over a memory-mapped snapshot (bots/snapshot.py): bars
+    are sliced out of the shared float32 arrays instead of held as DataFrames"""
+
+    def __init__(self, snap, clock, fundamentals=False):
+        self.snap = snap
+        self.clock = clock
+        self.infos = {s: snap.info(s) for s in snap.symbols} if fundamentals else {}
+
+    def bars(self, symbol, period="1y", interval="1d"):
+        if interval != "1d" or symbol not in self.snap.index:
+            return None
+        today = np.datetime64(self.clock.now().date(), "D")
+        return self.snap.frame(symbol, today - PERIOD_DAYS.get(period, 366), today)
+
+    def close(self, symbol):
+        return self.snap.close(symbol, self.clock.now().date())
+
+    def trading_days(self, start, end):
+        days = self.snap.dates
+        days = days[(days >= np.datetime64(start, "D")) & (days <= np.datetime64(end, "D"))]
+        return [d.astype(object) for d in days]
+
+
+def history_snapshot(symbols, start, end):
+    """The published HISTORY snapshot of the universe, republished when it is missing
+    symbols, is older than SNAPSHOT_MAX_AGE, or doesn't span start's lookback to end"""
+    import snapshot
+
+    snap = snapshot.latest("history")
+    if snap is None or not _snapshot_covers(snap, symbols, start, end):
+        market_data.preload(symbols, HISTORY)
+        snapshot.publish("history", [], india_daily.FUNDAMENTAL_KEYS, HISTORY, symbols=symbols)
+        snap = snapshot.latest("history")
+    return snap
+
+
+def _snapshot_covers(snap, symbols, start, end):
+    if not set(symbols) <= set(snap.symbols) or not len(snap.dates):
+        return False
+    created = datetime.fromisoformat(snap.meta['created'])
+    if datetime.now() - created > timedelta(days=SNAPSHOT_MAX_AGE):
+        return False
+    lookback = start - timedelta(days=PERIOD_DAYS["1y"] - HOLIDAY_SLACK)
+    if snap.dates[0] > np.datetime64(lookback, "D"):
+        return False
+    # a snapshot taken before end's close can't hold end's bar; one taken after it can
+    # legitimately stop short (end on a weekend or holiday)
+    return snap.dates[-1] >= np.datetime64(end, "D") or created >= datetime(end.year, end.month, end.day, *MARKET_CLOSE)
+
+
+def level_exits(r, stop, target):
+    """Structure stop/target from the scanner's nearest levels: just under support
+    when it is within 3 ATR of entry, at resistance when it is at least 1 ATR
+    away; otherwise the ATR levels stand"""
+    price, atr = r['price'], r['atr']
+    if r['support'] < price and price - r['support'] <= 3 * atr:
+        stop = round(float(r['support'] * (1 - LEVEL_BUFFER)), 2)
+    if r['resistance'] >= price + atr:
+        target = round(float(r['resistance']), 2)
+    return stop, target
+
+
+def enter_signals(wallet, results, max_positions=MAX_POSITIONS, min_score=MIN_SCORE, atr_stops=True,
+                  level_stops=False):
+    """Open the best-scored setups the way a trader following the daily report would"""
+    held = {p['symbol'] for p in wallet['positions']}
+    for r in results:
+        if len(wallet['positions']) >= max_positions or r['score'] < min_score:
+            break
+        if r['name'] in held:
+            continue
+        qty, sl, tgt = india_daily.size_position(r['price'], r['atr'], wallet)
+        if qty <= 0:
+            continue
+        if level_stops:
+            sl, tgt = level_exits(r, sl, tgt)
+        if atr_stops or level_stops:
+            india_daily.open_position(r['name'], r['price'], qty, wallet, stop_loss=sl, target=tgt)
+        else:
+            india_daily.open_position(r['name'], r['price'], qty, wallet)
+        held.add(r['name'])
+
+
+def equity(wallet, provider):
+    value = wallet['balance']
+    for pos in wallet['positions']:
+        price = provider.close(pos['symbol'] + ".NS")
+        value += pos['qty'] * (price if price is not None else pos['entry_price'])
+    return value
+
+
+def replay(start, end, max_positions=MAX_POSITIONS, min_score=MIN_SCORE, capital=india_daily.PAPER_CAPITAL,
+           atr_stops=True, fundamentals=False, level_stops=False, use_snapshot=False):
+    """Run one daily cycle per trading day in [start, end]. Returns (wallet, equity_curve, log_lines)."""
+    symbols = list(dict.fromkeys(s for syms in india_daily.STOCKS.values() for s in syms))
+    clock = SimClock()
+    if use_snapshot:
+        provider = SnapshotProvider(history_snapshot(symbols, start, end), clock, fundamentals)
+    else:
+        frames = market_data.preload(symbols, HISTORY)
+        infos = {s: market_data.get_info(s) for s in frames} if fundamentals else {}
+        provider = HistoricalProvider(frames, clock, infos)
+    wallet = {"capital": capital, "balance": capital, "positions": [], "trades": []}
+    lines = []
+    curve = []
+
+    saved = (india_daily.clock, india_daily.persist, india_daily.log_sink, india_daily.MC_PATHS,
+             market_data.provider)
+    india_daily.clock = clock.now
+    india_daily.persist = False
+    india_daily.log_sink = lines.append
+    india_daily.MC_PATHS = 0
+    market_data.provider = provider
+    try:
+        for day in provider.trading_days(start, end):
+            clock.set(day)
+            results = india_daily.daily_report(wallet)
+            enter_signals(wallet, results, max_positions, min_score, atr_stops, level_stops)
+            curve.append((day.isoformat(), round(equity(wallet, provider), 2)))
+    finally:
+        (india_daily.clock, india_daily.persist, india_daily.log_sink, india_daily.MC_PATHS,
+         market_data.provider) = saved
+    return wallet, curve, lines
+
+
+def summarize(wallet, curve):
+    values = np.array([v for _, v in curve]) if curve else np.array([wallet['capital']])
+    peak = np.maximum.accumulate(values)
+    closed = wallet['trades']
+    wins = [t for t in closed if t['pnl'] > 0]
+    return {
+        "days": len(curve),
+        "final_equity": float(values[-1]),
+        "return_pct": float((values[-1] / wallet['capital'] - 1) * 100),
+        "max_drawdown_pct": float(((peak - values) / peak).max() * 100),
+        "closed_trades": len(closed),
+        "open_positions": len(wallet['positions']),
+        "win_rate": len(wins) / len(closed) * 100 if closed else 0.0,
+        "realized_pnl": float(sum(t['pnl'] for t in closed)),
+    }
+
+
+def write_outputs(out_dir, wallet, curve, lines, summary):
+    os.makedirs(out_dir, exist_ok=True)
+    fields = ["id", "symbol", "qty", "entry_time", "entry_price", "stop_loss", "target",
+              "exit_time", "exit_price", "status", "pnl"]
+    with open(os.path.join(out_dir, "trades.csv"), "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(wallet['trades'] + wallet['positions'])
+    with open(os.path.join(out_dir, "equity.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["date", "equity"])
+        w.writerows(curve)
+    with open(os.path.join(out_dir, "log.txt"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+
+def main():
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Replay the daily paper-trading loop over history")
+    parser.add_argument("--start", type=date.fromisoformat, default=today - timedelta(days=365))
+    parser.add_argument("--end", type=date.fromisoformat, default=today)
+    parser.add_argument("--max-positions", type=int, default=MAX_POSITIONS)
+    parser.add_argument("--min-score", type=int, default=MIN_SCORE)
+    parser.add_argument("--fixed-stops", action="store_true", help="3%% stop / 10%% target instead of ATR")
+    parser.add_argument("--level-stops", action="store_true",
+                        help="stops under the nearest support, targets at the nearest resistance")
+    parser.add_argument("--fundamentals", action="store_true", help="use today's info (lookahead)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="read bars from the memory-mapped history snapshot (float32 prices)")
+    parser.add_argument("--out", default=OUT_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    wallet, curve, lines = replay(args.start, args.end, args.max_positions, args.min_score,
+                                  atr_stops=not args.fixed_stops, fundamentals=args.fundamentals,
+                                  level_stops=args.level_stops, use_snapshot=args.snapshot)
+    summary = summarize(wallet, curve)
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    write_outputs(args.out, wallet, curve, lines, summary)
+
+    print(f"Replayed {summary['days']} days in {summary['seconds']}s -> {args.out}")
+    print(f"Equity ₹{summary['final_equity']:,.0f} ({summary['return_pct']:+.1f}%) | "
+          f"Max DD {summary['max_drawdown_pct']:.1f}% | {summary['closed_trades']} trades | "
+          f"Win rate {summary['win_rate']:.0f}% | {summary['open_positions']} open")
+
+
+if __name__ == "__main__":
+    main()
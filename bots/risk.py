@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+KAI - Portfolio Risk Engine
+Covariance, VaR, risk contributions and ATR position sizing in batched NumPy
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Config
+RISK_PER_TRADE = 0.01   # fraction of capital lost if the stop is hit
+MAX_POSITION = 0.20     # fraction of capital in one name
+SL_ATR = 1.5            # stop distance in ATRs (matches the Pine scripts)
+TP_ATR = 3.0            # target distance in ATRs
+COV_WINDOW = 60         # trading days
+VAR_ALPHA = 0.95
+TRADING_DAYS = 252
+CORR_PENALTY = 0.5      # score haircut for a candidate perfectly correlated with the wallet
+MIN_VOL = 0.10          # annual vol floor for risk-adjusted scores, so quiet names can't dominate them
+STALE_VOL = 0.01        # below this the bars are flat (stale, suspended): not risk-ranked at all
+
+Z = {0.90: 1.2816, 0.95: 1.6449, 0.975: 1.9600, 0.99: 2.3263}
+
+
+def log_returns(prices):
+    """T x N prices -> (T-1) x N log returns; gaps become 0"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.diff(np.log(prices), axis=0)
+    return np.nan_to_num(r, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def covariance(returns):
+    r = returns - returns.mean(axis=0)
+    return r.T @ r / max(len(r) - 1, 1)
+
+
+def rolling_cov(returns, window=COV_WINDOW):
+    """(T-window+1) x N x N covariance matrices, one per window end"""
+    w = sliding_window_view(returns, window, axis=0)     # K x N x window
+    w = w - w.mean(axis=2, keepdims=True)
+    return np.einsum("kit,kjt->kij", w, w) / (window - 1)
+
+
+def cov_to_corr(cov):
+    sd = np.sqrt(np.diagonal(cov, axis1=-2, axis2=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / (sd[..., :, None] * sd[..., None, :])
+    return np.nan_to_num(corr)
+
+
+def portfolio_vol(weights, cov):
+    """weights N or K x N -> scalar or K vols"""
+    w = np.atleast_2d(weights)
+    vol = np.sqrt(np.einsum("ki,ij,kj->k", w, cov, w))
+    return vol[0] if np.ndim(weights) == 1 else vol
+
+
+def historical_var(returns, weights, alpha=VAR_ALPHA):
+    """One-day VaR (positive = loss fraction) from the empirical P&L distribution"""
+    pnl = returns @ np.atleast_2d(weights).T             # T x K
+    var = -np.quantile(pnl, 1 - alpha, axis=0)
+    return var[0] if np.ndim(weights) == 1 else var
+
+
+def parametric_var(weights, cov, mean=None, alpha=VAR_ALPHA):
+    """One-day Gaussian VaR"""
+    w = np.atleast_2d(weights)
+    mu = 0.0 if mean is None else w @ mean
+    var = Z[alpha] * portfolio_vol(w, cov) - mu
+    return var[0] if np.ndim(weights) == 1 else var
+
+
+def risk_contributions(weights, cov):
+    """Marginal (d sigma / d w) and component contributions; components sum to sigma"""
+    sigma = portfolio_vol(weights, cov)
+    if sigma == 0:
+        zero = np.zeros_like(weights, dtype=float)
+        return zero, zero
+    marginal = cov @ weights / sigma
+    return marginal, weights * marginal
+
+
+def true_range(high, low, close):
+    prev = np.vstack([close[:1], close[:-1]]) if close.ndim == 2 else np.concatenate([close[:1], close[:-1]])
+    return np.maximum(high - low, np.maximum(np.abs(high - prev), np.abs(low - prev)))
+
+
+def atr(high, low, close, period=14):
+    """Mean true range over the last period bars (same definition as calc_atr)"""
+    tr = true_range(high, low, close)
+    return tr[-period:].mean(axis=0)
+
+
+def atr_position_size(capital, price, atr_value, risk_pct=RISK_PER_TRADE, max_position=MAX_POSITION,
+                      sl_atr=SL_ATR, tp_atr=TP_ATR):
+    """Vectorised sizing: risk risk_pct of capital between entry and an ATR stop.
+    Returns (qty, stop, target) arrays; qty is capped at max_position of capital."""
+    price = np.asarray(price, dtype=float)
+    atr_value = np.asarray(atr_value, dtype=float)
+    stop = price - sl_atr * atr_value
+    target = price + tp_atr * atr_value
+    per_share = np.where(atr_value > 0, sl_atr * atr_value, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        qty = np.floor(capital * risk_pct / per_share)
+        cap = np.floor(capital * max_position / price)
+    qty = np.nan_to_num(np.minimum(qty, cap))
+    return qty, stop, target
+
+
+def rank_universe(scores, returns, wallet_weights, candidate_weights, alpha=VAR_ALPHA, window=COV_WINDOW):
+    """Score every candidate against the current wallet in one pass.
+
+    returns is T x N over the whole universe (wallet names included), wallet_weights
+    and candidate_weights are N vectors of capital fractions. Adding candidate i at
+    weight d_i changes portfolio variance by 2 d_i (Cov w)_i + d_i^2 Cov_ii, so all
+    N what-if portfolios come out of one matrix product.
+    """
+    cov = covariance(returns[-window:])
+    w = np.asarray(wallet_weights, dtype=float)
+    d = np.asarray(candidate_weights, dtype=float)
+    sigma_i = np.sqrt(np.diag(cov))
+    cov_w = cov @ w
+    base_var = w @ cov_w
+    new_vol = np.sqrt(np.maximum(base_var + 2 * d * cov_w + d * d * np.diag(cov), 0))
+    base_vol = np.sqrt(base_var)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr_to_wallet = np.where(base_vol > 0, cov_w / (sigma_i * base_vol), 0.0)
+    # the haircut always lowers a score, so a correlated name can't outrank an uncorrelated one when negative
+    scores = np.asarray(scores, dtype=float)
+    penalized = scores - np.abs(scores) * CORR_PENALTY * np.clip(np.nan_to_num(corr_to_wallet), 0, 1)
+    vol = sigma_i * np.sqrt(TRADING_DAYS)
+    adj = np.where(vol >= STALE_VOL, penalized / np.maximum(np.nan_to_num(vol), MIN_VOL), np.nan)
+    return {
+        "vol": vol,
+        "corr_to_wallet": np.nan_to_num(corr_to_wallet),
+        "added_vol": (new_vol - base_vol) * np.sqrt(TRADING_DAYS),
+        "added_var": Z[alpha] * (new_vol - base_vol),
+        "risk_adjusted": adj,      # NaN below STALE_VOL
+    }
+
+
+def portfolio_report(symbols, returns, weights, alpha=VAR_ALPHA, window=COV_WINDOW):
+    """Wallet risk summary; weights are capital fractions aligned with symbols.
+    Covariance uses the last window days, historical VaR the full sample."""
+    weights = np.asarray(weights, dtype=float)
+    cov = covariance(returns[-window:])
+    marginal, component = risk_contributions(weights, cov)
+    sigma = portfolio_vol(weights, cov)
+    return {
+        "vol_1d": sigma,
+        "vol_annual": sigma * np.sqrt(TRADING_DAYS),
+        "var_hist": historical_var(returns, weights, alpha),
+        "var_param": parametric_var(weights, cov, alpha=alpha),
+        "contributions": {s: (m, c) for s, wt, m, c in zip(symbols, weights, marginal, component) if wt},
+        "corr": cov_to_corr(cov),
+    }
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+KAI - Relative Strength & Sector Rotation
+Cross-sectional momentum percentiles, RS ratings, sector breadth and
+RRG-style rotation scores over the cached T x N price matrix, kept in an
+npz state that is advanced one row per trading day
+"""
+
+import argparse
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Config
+STATE_FILE = "/home/anand/.openclaw/workspace/trading/rotation.npz"
+HISTORY = "1y"
+HORIZONS = {"1w": 5, "1m": 21, "3m": 63, "6m": 126}     # trading days
+RS_WEIGHTS = {"1w": 0.1, "1m": 0.2, "3m": 0.3, "6m": 0.4}
+BREADTH_MA = 50         # breadth = % of members above their 50-day average
+RATIO_WINDOW = 21       # RS-ratio = relative line vs its own 1m mean
+MOM_WINDOW = 5          # RS-momentum = 1w rate of change of the RS-ratio
+KEEP_DAYS = 252         # history of daily outputs kept in the state
+BUFFER = max(max(HORIZONS.values()) + 1, BREADTH_MA)
+ROLLING = ("close", "sector_level", "bench_level", "rel")    # update() inputs, kept for the day before too
+OUTPUTS = ("dates", "rs", "breadth", "ratio", "mom")         # one row per day
+
+QUADRANTS = {(True, True): "Leading", (True, False): "Weakening",
+             (False, False): "Lagging", (False, True): "Improving"}
+
+
+def default_sectors():
+    from india_analyzer_v3 import STOCKS
+    return STOCKS
+
+
+def membership(symbols, sectors):
+    """N x S 0/1 matrix; a symbol may sit in several sectors"""
+    names = list(sectors)
+    col = {s: set(sectors[s]) for s in names}
+    return np.array([[sym in col[s] for s in names] for sym in symbols], dtype=float), names
+
+
+# ---- matrix kernels (shared by the full build and the daily update) ----
+
+def percentile_rank(x):
+    """Cross-sectional percentile (0-100) along axis 1; NaN stays NaN"""
+    valid = np.isfinite(x)
+    order = np.where(valid, x, np.inf).argsort(axis=1).argsort(axis=1).astype(float)
+    n = valid.sum(axis=1, keepdims=True)
+    return np.where(valid, order / np.maximum(n - 1, 1) * 100, np.nan)
+
+
+def rs_rating(pct):
+    """H x T x N horizon percentiles -> T x N rating 1-99 (weights renormalised over available horizons)"""
+    w = np.array([RS_WEIGHTS[h] for h in HORIZONS])[:, None, None]
+    valid = np.isfinite(pct)
+    weight = (w * valid).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        composite = np.where(weight > 0, (w * np.nan_to_num(pct)).sum(axis=0) / weight, np.nan)
+    return 1 + percentile_rank(composite) * 0.98
+
+
+def momentum(close, h):
+    """close[t] / close[t-h] - 1, NaN for the first h rows"""
+    out = np.full_like(close, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[h:] = close[h:] / close[:-h] - 1
+    return out
+
+
+def rolling_mean(x, window):
+    out = np.full_like(x, np.nan)
+    if len(x) >= window:
+        out[window - 1:] = sliding_window_view(x, window, axis=0).mean(axis=-1)
+    return out
+
+
+def breadth(close, members):
+    """T x S % of members trading above their BREADTH_MA-day mean"""
+    sma = rolling_mean(close, BREADTH_MA)
+    valid = np.isfinite(sma) & np.isfinite(close)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100 * ((close > sma) & valid) @ members / (valid @ members)
+
+
+def sector_returns(close, members):
+    """Equal-weight daily returns: T x S per sector and T for the whole universe"""
+    ret = momentum(close, 1)
+    valid = np.isfinite(ret)
+    r = np.where(valid, ret, 0.0)
+    count = valid @ members
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sector = np.where(count > 0, r @ members / count, 0.0)
+        bench = np.where(valid.any(axis=1), r.sum(axis=1) / valid.sum(axis=1), 0.0)
+    return sector, bench
+
+
+# ---- state ----
+
+def compute(dates, symbols, close, sectors):
+    """Full build from a T x N close matrix (one pass of matrix ops)"""
+    members, names = membership(symbols, sectors)
+    pct = np.stack([percentile_rank(momentum(close, h)) for h in HORIZONS.values()])
+    sret, bret = sector_returns(close, members)
+    sector_level = np.cumprod(1 + sret, axis=0)
+    bench_level = np.cumprod(1 + bret)
+    rel = sector_level / bench_level[:, None]
+    ratio = 100 * rel / rolling_mean(rel, RATIO_WINDOW)
+    mom = np.full_like(ratio, np.nan)
+    mom[MOM_WINDOW:] = 100 * ratio[MOM_WINDOW:] / ratio[:-MOM_WINDOW]
+    keep = slice(-KEEP_DAYS, None)
+    prev = {}
+    if len(close) > 1:      # the rolling inputs as of the day before, so a revised last bar can be redone
+        prev = {"prev_close": close[-BUFFER - 1:-1], "prev_sector_level": sector_level[-2],
+                "prev_bench_level": bench_level[-2:-1], "prev_rel": rel[-RATIO_WINDOW - 1:-1]}
+    return {
+        "symbols": np.array(symbols), "sectors": np.array(names), "members": members,
+        "close": close[-BUFFER:], "sector_level": sector_level[-1], "bench_level": bench_level[-1:],
+        "rel": rel[-RATIO_WINDOW:], **prev,
+        "dates": np.asarray(dates).astype("datetime64[D]")[keep], "pct": pct[:, -1],
+        "rs": rs_rating(pct)[keep], "breadth": breadth(close, members)[keep],
+        "ratio": ratio[keep], "mom": mom[keep],
+    }
+
+
+def update(state, day, row):
+    """Advance the state by one trading day: O(N x BUFFER) instead of a full rebuild"""
+    members = state["members"]
+    row = np.where(np.isfinite(row), row, state["close"][-1])      # carry forward, as price_matrix does
+    close = np.vstack([state["close"], row])[-BUFFER:]
+    pct = np.stack([percentile_rank(momentum(close[-h - 1:], h)[-1:])[0] for h in HORIZONS.values()])
+    sret, bret = sector_returns(close[-2:], members)
+    sector_level = state["sector_level"] * (1 + sret[-1])
+    bench_level = state["bench_level"] * (1 + bret[-1])
+    rel = np.vstack([state["rel"], sector_level / bench_level])[-RATIO_WINDOW:]
+    ratio = 100 * rel[-1] / rel.mean(axis=0) if len(rel) == RATIO_WINDOW else np.full(len(rel[-1]), np.nan)
+    prev = state["ratio"][-MOM_WINDOW] if len(state["ratio"]) >= MOM_WINDOW else np.nan
+    append = {
+        "dates": np.datetime64(day, "D"), "rs": rs_rating(pct[:, None, :])[0],
+        "breadth": breadth(close[-BREADTH_MA:], members)[-1], "ratio": ratio, "mom": 100 * ratio / prev,
+    }
+    state.update({"prev_" + k: state[k] for k in ROLLING})
+    state.update(close=close, pct=pct, sector_level=sector_level, bench_level=bench_level, rel=rel)
+    for key, value in append.items():
+        state[key] = np.concatenate([state[key], [value]])[-KEEP_DAYS:]
+    return state
+
+
+def rewind(state):
+    """Undo the last day (update() keeps the rolling inputs from before it);
+    False when the state can't go back, e.g. it was saved before this was possible"""
+    if "prev_close" not in state or len(state["dates"]) < 2:
+        return False
+    for k in ROLLING:
+        state[k] = state.pop("prev_" + k)
+    for key in OUTPUTS:
+        state[key] = state[key][:-1]
+    return True
+
+
+def advance(state, dates, close):
+    """Bring a state up to a close matrix: redo the last stored day if its bar
+    was revised (a scan during the session saved a partial bar), then append
+    newer days. False when it needs a full rebuild instead."""
+    if not len(state["dates"]) or state["dates"][-1] not in dates:
+        return False
+    last = np.flatnonzero(dates == state["dates"][-1])[0]
+    row = np.where(np.isfinite(close[last]), close[last], state["close"][-1])
+    if not np.allclose(row, state["close"][-1], rtol=1e-12, atol=0, equal_nan=True):
+        if not rewind(state):
+            return False
+        update(state, dates[last], close[last])
+    for day, row in zip(dates[last + 1:], close[last + 1:]):
+        update(state, day, row)
+    return True
+
+
+def save(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **state)
+    os.replace(tmp, path)
+
+
+def load(path=STATE_FILE):
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        return {k: f[k] for k in f.files}
+
+
+def refresh(path=STATE_FILE, sectors=None, period=HISTORY):
+    """Bring the saved state up to the latest cached bars: redo a revised last
+    day and append new ones, or rebuild when the universe changed or the state is missing/too old"""
+    import market_data
+
+    sectors = sectors or default_sectors()
+    symbols = list(dict.fromkeys(s for syms in sectors.values() for s in syms))
+    dates, syms, close = market_data.price_matrix(symbols, period=period)
+    dates = np.asarray(dates).astype("datetime64[D]")
+    state = load(path)
+    if state is not None and list(state["symbols"]) == syms and list(state["sectors"]) == list(sectors) \
+            and advance(state, dates, close):
+        pass
+    elif len(close):
+        state = compute(dates, syms, close, sectors)
+    else:
+        return state
+    save(state, path)
+    return state
+
+
+# ---- views ----
+
+def sector_view(state):
+    """Latest row per sector, strongest rotation score first"""
+    members = state["members"]
+    close = state["close"]
+    count = members.sum(axis=0)
+    rows = []
+    moms = {}
+    for name, h in HORIZONS.items():
+        m = momentum(close[-h - 1:], h)[-1] if len(close) > h else np.full(close.shape[1], np.nan)
+        valid = np.isfinite(m)
+        moms[name] = (np.where(valid, m, 0) @ members) / np.maximum(valid @ members, 1) * 100
+    rs = state["rs"][-1]
+    for j, sector in enumerate(state["sectors"]):
+        ratio, mom = state["ratio"][-1, j], state["mom"][-1, j]
+        inside = members[:, j] > 0
+        rows.append({
+            "sector": str(sector), "members": int(count[j]),
+            "ratio": float(ratio), "mom": float(mom), "score": float((ratio - 100) + (mom - 100)),
+            "quadrant": QUADRANTS[(ratio >= 100, mom >= 100)] if np.isfinite(ratio + mom) else "-",
+            "breadth": float(state["breadth"][-1, j]),
+            "rs": float(np.nanmean(rs[inside])) if np.isfinite(rs[inside]).any() else float("nan"),
+            **{f"mom_{h}": float(moms[h][j]) for h in HORIZONS},
+        })
+    rows.sort(key=lambda r: -r["score"] if np.isfinite(r["score"]) else np.inf)
+    return rows
+
+
+def leaders(state, top=10):
+    """Highest RS ratings with their horizon percentiles"""
+    rs = state["rs"][-1]
+    order = [i for i in np.argsort(-np.nan_to_num(rs, nan=-1)) if np.isfinite(rs[i])][:top]
+    return [{"symbol": str(state["symbols"][i]), "rs": float(rs[i]),
+             **{h: float(state["pct"][k, i]) for k, h in enumerate(HORIZONS)}} for i in order]
+
+
+def ratings(state):
+    """{symbol: latest RS rating}"""
+    return {str(s): float(r) for s, r in zip(state["symbols"], state["rs"][-1]) if np.isfinite(r)}
+
+
+def format_view(state, top=10):
+    lines = [f"Sector rotation as of {state['dates'][-1]}",
+             f"{'Sector':14} {'Quadrant':10} {'Score':>6} {'RS-Ratio':>8} {'RS-Mom':>7} {'Breadth':>7} "
+             f"{'RS':>4} " + " ".join(f"{h:>6}" for h in HORIZONS)]
+    for r in sector_view(state):
+        lines.append(f"{r['sector']:14} {r['quadrant']:10} {r['score']:>+6.1f} {r['ratio']:>8.1f} "
+                     f"{r['mom']:>7.1f} {r['breadth']:>6.0f}% {r['rs']:>4.0f} "
+                     + " ".join(f"{r['mom_' + h]:>+5.1f}%" for h in HORIZONS))
+    lines.append("\nRS leaders")
+    for r in leaders(state, top):
+        lines.append(f"   {r['symbol'].replace('.NS', ''):12} RS {r['rs']:>3.0f} | "
+                     + " | ".join(f"{h} p{r[h]:.0f}" for h in HORIZONS))
+    return lines
+
+
+def check(sectors=None, days=20, period=HISTORY):
+    """Self-check: rebuild up to `days` ago with that day's bars revised 6% (a
+    partial bar saved mid-session), advance day by day, compare with a full
+    build. None when there aren't enough bars."""
+    import market_data
+
+    sectors = sectors or default_sectors()
+    symbols = list(dict.fromkeys(s for syms in sectors.values() for s in syms))
+    dates, syms, close = market_data.price_matrix(symbols, period=period)
+    if len(close) <= days + 1:
+        return None
+    dates = np.asarray(dates).astype("datetime64[D]")
+    full = compute(dates, syms, close, sectors)
+    partial = close[:-days].copy()
+    members, _ = membership(syms, sectors)
+    partial[-1, members[:, 0] > 0] *= 1.06
+    state = compute(dates[:-days], syms, partial, sectors)
+    advance(state, dates, close)
+    n = days + 1
+    worst = {k: float(np.nanmax(np.abs(full[k][-n:] - state[k][-n:]))) for k in ("rs", "breadth", "ratio", "mom")}
+    same_nan = all((np.isnan(full[k][-n:]) == np.isnan(state[k][-n:])).all() for k in worst)
+    return worst, same_nan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relative strength and sector rotation")
+    parser.add_argument("--refresh", action="store_true", help="append new days from the bar cache / network")
+    parser.add_argument("--rebuild", action="store_true", help="full rebuild from the price matrix")
+    parser.add_argument("--check", action="store_true", help="verify incremental updates match a full build")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--state", default=STATE_FILE)
+    args = parser.parse_args()
+
+    if args.check:
+        result = check()
+        if result is None:
+            print("No price data")
+            raise SystemExit(1)
+        worst, same_nan = result
+        print("max |incremental - full|: " + ", ".join(f"{k} {v:.2e}" for k, v in worst.items()))
+        ok = same_nan and max(worst.values()) < 1e-6
+        print("✓ incremental matches full build" if ok else "❌ incremental drifted from full build")
+        raise SystemExit(0 if ok else 1)
+    if args.rebuild and os.path.exists(args.state):
+        os.remove(args.state)
+    state = load(args.state)
+    if state is None or args.refresh or args.rebuild:
+        state = refresh(args.state)
+    if state is None:
+        print("No price data")
+        return
+    for line in format_view(state, args.top):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
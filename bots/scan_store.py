@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+KAI - Scan History Store
+Every scan's per-symbol rows in date-partitioned Parquet (one directory per
+scanner source) with a date index and a symbol index, so longitudinal
+questions read only the files and columns they need
+"""
+
+import argparse
+import bisect
+import fcntl
+import json
+import numbers
+import operator
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+# Config
+STORE_DIR = "/home/anand/.openclaw/workspace/trading/scans"
+COMPRESSION = "zstd"
+
+_lock = threading.Lock()
+_warned = False
+
+OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq, "!=": operator.ne}
+
+
+def available():
+    """pyarrow is optional: without it scans still run, they just aren't stored"""
+    global _warned
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        if not _warned:
+            print("scan_store: pyarrow not installed - scan history is not being recorded")
+            _warned = True
+        return False
+
+
+# ---- index ----
+
+def _index_path(store_dir, source):
+    return os.path.join(store_dir, source, "index.json")
+
+
+@contextmanager
+def _index_lock(source, store_dir):
+    """Serialise index read-modify-write across threads and processes (scheduler + CLI)"""
+    os.makedirs(os.path.join(store_dir, source), exist_ok=True)
+    with _lock, open(os.path.join(store_dir, source, "index.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)        # released when the file closes
+        yield
+
+
+def load_index(source, store_dir=None):
+    """{"dates": {day: [file, ...]}, "symbols": {symbol: [day, ...]}} (paths relative to the source dir)"""
+    try:
+        with open(_index_path(store_dir or STORE_DIR, source)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"dates": {}, "symbols": {}}
+
+
+def _save_index(index, source, store_dir):
+    path = _index_path(store_dir, source)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+
+def _add_to_index(index, day, name, symbols):
+    files = index["dates"].setdefault(day, [])
+    if name not in files:
+        files.append(name)
+    for sym in symbols:
+        days = index["symbols"].setdefault(sym, [])
+        if not days or days[-1] < day:
+            days.append(day)
+        elif day not in days:
+            bisect.insort(days, day)
+
+
+# ---- write ----
+
+def _column(values):
+    """(pyarrow type, values) for one result key; lists become ' | '-joined text"""
+    import pyarrow as pa
+
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, (list, tuple)) for v in present):
+        return pa.string(), [" | ".join(map(str, v)) if v is not None else None for v in values]
+    if present and all(isinstance(v, str) for v in present):
+        return pa.string(), values
+    if present and all(isinstance(v, bool) for v in present):
+        return pa.bool_(), values
+    if present and all(isinstance(v, numbers.Integral) for v in present):
+        return pa.int64(), [int(v) if v is not None else None for v in values]
+    if all(isinstance(v, numbers.Real) for v in present):
+        return pa.float64(), [float(v) if v is not None else None for v in values]
+    return pa.string(), [str(v) if v is not None else None for v in values]
+
+
+def record_scan(results, source, ts=None, store_dir=None):
+    """Append one scan (list of result dicts) as a Parquet file under source/date=YYYY-MM-DD/.
+    Returns the file path, or None when there is nothing to write or pyarrow is missing."""
+    if not results or not available():
+        return None
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    store_dir = store_dir or STORE_DIR
+    ts = ts or datetime.now()
+    day = ts.date().isoformat()
+    rows = sorted(results, key=lambda r: (r['symbol'], r.get('category', '')))
+    keys = list(dict.fromkeys(k for r in rows for k in r))
+    fields, arrays = [], []
+    for key in keys:
+        typ, values = _column([r.get(key) for r in rows])
+        fields.append(pa.field(key, typ))
+        arrays.append(pa.array(values, type=typ))
+    fields += [pa.field("ts", pa.timestamp("s")), pa.field("date", pa.string())]
+    arrays += [pa.array([ts] * len(rows), pa.timestamp("s")), pa.array([day] * len(rows))]
+    table = pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    rel = os.path.join(f"date={day}", f"scan-{ts:%H%M%S}-{os.getpid()}.parquet")
+    path = os.path.join(store_dir, source, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path + ".tmp", compression=COMPRESSION)
+    os.replace(path + ".tmp", path)
+    with _index_lock(source, store_dir):
+        index = load_index(source, store_dir)
+        _add_to_index(index, day, rel, table.column("symbol").unique().to_pylist())
+        _save_index(index, source, store_dir)
+    return path
+
+
+def compact(source, days=None, store_dir=None):
+    """Merge each day's scan files into one file sorted by (symbol, ts). Returns days compacted."""
+    import pyarrow.parquet as pq
+
+    store_dir = store_dir or STORE_DIR
+    with _index_lock(source, store_dir):
+        index = load_index(source, store_dir)
+        done = []
+        for day in days or list(index["dates"]):
+            files = index["dates"].get(day, [])
+            if len(files) < 2:
+                continue
+            base = os.path.join(store_dir, source)
+            table = _read_files([os.path.join(base, f) for f in files], None, None)
+            table = table.sort_by([("symbol", "ascending"), ("ts", "ascending")])
+            rel = os.path.join(f"date={day}", "compact.parquet")
+            tmp = os.path.join(base, rel + ".tmp")
+            pq.write_table(table, tmp, compression=COMPRESSION)
+            os.replace(tmp, os.path.join(base, rel))
+            for f in files:
+                if f != rel:
+                    os.remove(os.path.join(base, f))
+            index["dates"][day] = [rel]
+            done.append(day)
+        _save_index(index, source, store_dir)
+    return done
+
+
+# ---- read ----
+
+def _as_day(value):
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+def _unified_schema(paths):
+    """One schema for files written by different scans. Column types are inferred
+    per scan (a day where every pe is 0 writes int64), so int/float conflicts
+    widen to float64 and other conflicts to string; columns missing from older
+    files read as null."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fields = {}
+    for path in reversed(paths):            # newest first: its column order and types win ties
+        for field in pq.read_schema(path):
+            prev = fields.get(field.name)
+            if prev is None or pa.types.is_null(prev):
+                fields[field.name] = field.type
+            elif prev != field.type and not pa.types.is_null(field.type):
+                numeric = all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (prev, field.type))
+                fields[field.name] = pa.float64() if numeric else pa.string()
+    return pa.schema(list(fields.items()))
+
+
+def _read_files(paths, columns, filter):
+    import pyarrow.dataset as ds
+
+    return ds.dataset(paths, format="parquet", schema=_unified_schema(paths)).to_table(columns=columns,
+                                                                                       filter=filter)
+
+
+def read(source="daily", columns=None, symbols=None, start=None, end=None, where=None, store_dir=None):
+    """pyarrow Table of the requested columns. Files are chosen from the date index
+    (and the symbol index when symbols are given); rows are then filtered by symbol
+    and by `where` expressions such as "rsi<35"."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    store_dir = store_dir or STORE_DIR
+    index = load_index(source, store_dir)
+    start, end = _as_day(start), _as_day(end)
+    days = [d for d in index["dates"] if (start is None or d >= start) and (end is None or d <= end)]
+    if symbols is not None:
+        symbols = [s if s.endswith(".NS") else s + ".NS" for s in symbols]
+        wanted = set().union(*(index["symbols"].get(s, []) for s in symbols)) if symbols else set()
+        days = [d for d in days if d in wanted]
+    base = os.path.join(store_dir, source)
+    paths = [os.path.join(base, f) for d in sorted(days) for f in index["dates"][d]]
+    if not paths:
+        return pa.table({c: [] for c in (columns or ["symbol", "ts"])})
+
+    flt = ds.field("symbol").isin(symbols) if symbols is not None else None
+    for expr in where or []:
+        col, op, value = parse_where(expr)
+        cond = OPS[op](ds.field(col), value)
+        flt = cond if flt is None else flt & cond
+    return _read_files(paths, list(dict.fromkeys(columns)) if columns else None, flt)
+
+
+def parse_where(expr):
+    m = re.fullmatch(r"\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(.+?)\s*", expr)
+    if not m:
+        raise ValueError(f"bad condition {expr!r}, expected e.g. rsi<35")
+    col, op, value = m.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        value = value.strip("'\"")
+    return col, op, value
+
+
+def history(symbol, column="score", source="daily", start=None, end=None, store_dir=None):
+    """[(ts, value)] for one symbol, one row per scan (a symbol listed under several categories counts once)"""
+    table = read(source, ["ts", column], [symbol], start, end, store_dir=store_dir)
+    seen = {}
+    for ts, value in zip(table.column("ts").to_pylist(), table.column(column).to_pylist()):
+        seen[ts] = value
+    return sorted(seen.items())
+
+
+def daily_count(where, category=None, source="daily", start=None, end=None, store_dir=None):
+    """{day: number of distinct symbols meeting every condition}, judged on each symbol's last scan of the day"""
+    conds = [parse_where(w) for w in where]
+    cols = ["date", "ts", "symbol"] + [c for c, _, _ in conds] + (["category"] if category else [])
+    table = read(source, cols, None, start, end, [f"category=={category}"] if category else None, store_dir)
+    last = {}
+    order = table.column("ts").to_pylist()
+    rows = zip(table.column("date").to_pylist(), table.column("symbol").to_pylist(), order,
+               *[table.column(c).to_pylist() for c, _, _ in conds])
+    for day, sym, ts, *values in rows:
+        prev = last.get((day, sym))
+        if prev is None or ts >= prev[0]:
+            last[(day, sym)] = (ts, values)
+    counts = {}
+    for (day, _), (_, values) in last.items():
+        ok = all(v is not None and OPS[op](v, target) for v, (_, op, target) in zip(values, conds))
+        counts[day] = counts.get(day, 0) + ok
+    return dict(sorted(counts.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the KAI scan history store")
+    parser.add_argument("--source", default="daily", choices=["daily", "v3"])
+    parser.add_argument("--dir", default=None, help=f"store directory (default {STORE_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("history", help="one column over time for a symbol")
+    p.add_argument("symbol")
+    p.add_argument("--column", default="score")
+    p.add_argument("--days", type=int, default=183)
+    p = sub.add_parser("count", help="symbols meeting conditions per day")
+    p.add_argument("where", nargs="+", help='e.g. "rsi<35"')
+    p.add_argument("--category")
+    p.add_argument("--days", type=int, default=365)
+    sub.add_parser("compact", help="merge each day's scan files")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Compacted {len(compact(args.source, store_dir=args.dir))} days")
+        return
+    start = date.today() - timedelta(days=args.days)
+    if args.command == "history":
+        for ts, value in history(args.symbol, args.column, args.source, start, store_dir=args.dir):
+            print(f"{ts:%Y-%m-%d %H:%M}  {value}")
+    else:
+        for day, n in daily_count(args.where, args.category, args.source, start, store_dir=args.dir).items():
+            print(f"{day}  {n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+KAI - Scheduler Daemon
+One resident process that runs the pre-open scan, intraday position checks,
+the post-close report and the Gist sync on the NSE calendar, with imports,
+data caches and HTTP sessions kept warm between runs
+"""
+
+import argparse
+import heapq
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import traceback
+from datetime import time as dtime, timedelta
+
+import alerts
+import eventlog
+import india_daily
+import market_data
+import nse_calendar as cal
+import rotation
+import scan_store
+import strategies
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sync_data
+
+# Config
+PRE_OPEN_SCAN = dtime(9, 0)
+CHECK_EVERY = 15                # minutes between intraday position checks
+POST_CLOSE_REPORT = dtime(15, 45)
+SYNC = dtime(16, 0)
+PRE_OPEN_MAX_AGE = 6 * 3600     # bars older than this are refetched before the open scan
+
+
+def daily_at(t):
+    """Next trading day occurrence of an IST wall-clock time"""
+    def when(after):
+        day = after.date()
+        if not cal.is_trading_day(day) or cal.at(day, t) <= after:
+            day = cal.next_trading_day(day)
+        return cal.at(day, t)
+    return when
+
+
+def every(minutes, start=cal.MARKET_OPEN, end=cal.MARKET_CLOSE):
+    """Next slot on a fixed grid inside the trading session"""
+    def when(after):
+        day = after.date()
+        if cal.is_trading_day(day):
+            slot = cal.at(day, start)
+            while slot <= cal.at(day, end):
+                if slot > after:
+                    return slot
+                slot += timedelta(minutes=minutes)
+        return cal.at(cal.next_trading_day(day), start)
+    return when
+
+
+class Job:
+    def __init__(self, name, fn, when):
+        self.name = name
+        self.fn = fn
+        self.when = when
+        self.busy = False       # queued or running: further firings are coalesced
+        self.runs = 0
+        self.skipped = 0
+        self.last_duration = None
+
+
+class Scheduler:
+    """Timer loop + one worker thread.
+
+    A firing is dropped (and counted) while the same job is still queued or
+    running, so an overrunning job never builds a backlog; different jobs run
+    one after another, so nothing races on the wallet file.
+    """
+
+    def __init__(self, jobs, clock=cal.now):
+        self.jobs = {j.name: j for j in jobs}
+        self.clock = clock
+        self.heap = []
+        self.work = queue.Queue()
+        self.stopping = threading.Event()
+        now = clock()
+        for j in jobs:
+            heapq.heappush(self.heap, (j.when(now), j.name))
+
+    def upcoming(self):
+        return sorted(self.heap)
+
+    def fire(self, job, due):
+        if job.busy:
+            job.skipped += 1
+            india_daily.log(f"⏭️ {job.name} still running - skipped {due:%H:%M} run")
+            india_daily.record("error", source="scheduler", job=job.name, reason="overrun, run skipped")
+            return
+        job.busy = True
+        self.work.put((job, due))
+
+    def _worker(self):
+        while not self.stopping.is_set():
+            try:
+                job, due = self.work.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            lag = (self.clock() - due).total_seconds()
+            try:
+                job.fn()
+            except Exception as e:
+                india_daily.log(f"❌ {job.name} failed: {e}")
+                india_daily.record("error", source="scheduler", job=job.name, reason=str(e),
+                                   trace=traceback.format_exc())
+            finally:
+                job.last_duration = time.perf_counter() - started
+                job.runs += 1
+                job.busy = False
+                india_daily.record("log", msg=f"job {job.name} done", job=job.name,
+                                   start_lag_ms=round(lag * 1000, 1), seconds=round(job.last_duration, 2))
+
+    def run(self):
+        worker = threading.Thread(target=self._worker, name="kai-worker", daemon=True)
+        worker.start()
+        while not self.stopping.is_set():
+            due, name = self.heap[0]
+            wait = (due - self.clock()).total_seconds()
+            if wait > 0:
+                self.stopping.wait(min(wait, 60))
+                continue
+            heapq.heappop(self.heap)
+            job = self.jobs[name]
+            self.fire(job, due)
+            heapq.heappush(self.heap, (job.when(max(due, self.clock())), name))
+        worker.join(5)
+
+    def stop(self, *_):
+        self.stopping.set()
+
+
+# ---- jobs ----
+
+def universe():
+    return list(dict.fromkeys(s for syms in india_daily.STOCKS.values() for s in syms))
+
+
+def pre_open_scan():
+    market_data.invalidate(older_than=PRE_OPEN_MAX_AGE)
+    market_data.preload(universe())
+    india_daily.scan_market()
+
+
+def intraday_check():
+    wallet = india_daily.load_wallet()
+    if not wallet['positions']:
+        return
+    market_data.invalidate([p['symbol'] + ".NS" for p in wallet['positions']])
+    india_daily.check_positions(wallet)
+
+
+def post_close_report():
+    market_data.invalidate()
+    india_daily.daily_report()
+    snap = strategies.FeatureSnapshot.build()
+    strategies.run_cycle(snap)  # every strategy wallet on one shared snapshot of the fresh bars
+    alerts.run_cycle(snap)      # alert rules over the same snapshot, deduped and rate-capped
+    rotation.refresh()      # advance the rotation state by today's bar so views are instant
+    if scan_store.available():
+        scan_store.compact("daily", [cal.now().date().isoformat()])
+
+
+def sync():
+    sync_data.main()
+
+
+JOBS = {
+    "scan": (pre_open_scan, daily_at(PRE_OPEN_SCAN)),
+    "check": (intraday_check, every(CHECK_EVERY)),
+    "report": (post_close_report, daily_at(POST_CLOSE_REPORT)),
+    "sync": (sync, daily_at(SYNC)),
+}
+
+
+def build():
+    return [Job(name, fn, when) for name, (fn, when) in JOBS.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KAI resident scheduler")
+    parser.add_argument("--once", choices=sorted(JOBS), help="run one job now and exit")
+    parser.add_argument("--dry-run", action="store_true", help="print the next run of each job")
+    args = parser.parse_args()
+
+    if args.once:
+        JOBS[args.once][0]()
+        return
+
+    sched = Scheduler(build())
+    if args.dry_run:
+        for due, name in sched.upcoming():
+            print(f"{name:8} {due:%a %Y-%m-%d %H:%M %Z}")
+        return
+
+    signal.signal(signal.SIGTERM, sched.stop)
+    signal.signal(signal.SIGINT, sched.stop)
+    india_daily.log("⏰ KAI scheduler started")
+    for due, name in sched.upcoming():
+        india_daily.log(f"   next {name}: {due:%a %Y-%m-%d %H:%M}")
+    sched.run()
+    eventlog.default().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+KAI - Market Snapshot
+The universe's bars, the info fields the scanners read and the scan results
+as contiguous float32/int arrays behind a symbol -> column index, published
+to one memory-mapped file so the dashboard and the backtester read what the
+scanner wrote without parsing or copying it
+"""
+
+import argparse
+import json
+import numbers
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Config
+SNAPSHOT_DIR = "/home/anand/.openclaw/workspace/trading/snapshots"
+BAR_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+ALIGN = 64              # byte alignment of each array in the data file
+KEEP = 2                # data files kept per source: a reader may still be mapping the previous one
+
+_latest = {}            # header path -> (mtime_ns, Snapshot)
+
+
+class Result:
+    """One symbol's scan result. Attributes (and r['key'], r.get()) read the
+    snapshot's columns, so a record costs two slots, not a dict per symbol."""
+
+    __slots__ = ("snap", "col")
+
+    def __init__(self, snap, col):
+        self.snap = snap
+        self.col = col
+
+    def __getattr__(self, key):
+        try:
+            return self.snap.value(key, self.col)
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __getitem__(self, key):
+        return self.snap.value(key, self.col)
+
+    def get(self, key, default=None):
+        try:
+            return self.snap.value(key, self.col)
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        return {key: self.snap.value(key, self.col) for key in self.snap.result_keys}
+
+    def __repr__(self):
+        return f"Result({self.snap.symbols[self.col]}, score={self.get('score')})"
+
+
+def _days(index):
+    """Exchange-local dates of a bar index as datetime64[D]"""
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    return index.values.astype("datetime64[D]")
+
+
+def _column(values):
+    """(kind, data, valid) for one result key over all symbols. Bools, ints
+    (int32) and other numbers (float32) become one array, typed from the values
+    that are present; valid marks which are, or is None when all are (floats
+    keep NaN for missing). Text and lists stay Python lists in the header."""
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, (list, tuple)) for v in present):
+        return "list", [list(v) if v is not None else None for v in values], None
+    if present and all(isinstance(v, str) for v in present):
+        return "text", values, None
+    valid = None if len(present) == len(values) else np.array([v is not None for v in values])
+    if present and all(isinstance(v, (bool, np.bool_)) for v in present):
+        return "array", np.array([bool(v) for v in values]), valid
+    if present and all(isinstance(v, numbers.Integral) and -2**31 <= v < 2**31 for v in present):
+        return "array", np.array([0 if v is None else int(v) for v in values], dtype=np.int32), valid
+    try:
+        return "array", np.array([np.nan if v is None else v for v in values], dtype=np.float32), None
+    except (TypeError, ValueError):
+        return "text", [None if v is None else str(v) for v in values], None
+
+
+class Snapshot:
+    """dates (T,), bars[field] float32 (T, N) with NaN where a symbol has no
+    bar, arrays[key] float32/int32/bool (N,) for results and info fields (with
+    arrays["valid.<key>"] where an int or bool key is missing for some symbols),
+    and header-only text/list columns. Column j is symbols[j] everywhere."""
+
+    __slots__ = ("symbols", "index", "dates", "bars", "arrays", "text", "lists", "result_keys", "meta", "_rows")
+
+    def __init__(self, symbols, dates, bars, arrays=None, text=None, lists=None, result_keys=(), meta=None):
+        self.symbols = list(symbols)
+        self.index = {s: j for j, s in enumerate(self.symbols)}
+        self.dates = dates
+        self.bars = bars
+        self.arrays = arrays or {}
+        self.text = text or {}
+        self.lists = lists or {}
+        self.result_keys = list(result_keys)
+        self.meta = meta or {}
+        self._rows = {}
+
+    @classmethod
+    def build(cls, frames, results=(), infos=None, info_keys=(), **meta):
+        """From {symbol: OHLCV DataFrame}, scanner result dicts (a symbol listed
+        under several categories keeps its first row) and {symbol: info}, of
+        which only info_keys are kept"""
+        rows = {}
+        for r in results:
+            rows.setdefault(r['symbol'], r)
+        symbols = list(dict.fromkeys(list(frames) + list(rows)))
+        days = {s: _days(df.index) for s, df in frames.items()}
+        dates = np.unique(np.concatenate(list(days.values()))) if days else np.array([], "datetime64[D]")
+        bars = {f: np.full((len(dates), len(symbols)), np.nan, dtype=np.float32) for f in BAR_FIELDS}
+        for j, sym in enumerate(symbols):
+            if sym in frames:
+                at = np.searchsorted(dates, days[sym])
+                for f in BAR_FIELDS:
+                    bars[f][at, j] = frames[sym][f].to_numpy(dtype=float)
+
+        keys = list(dict.fromkeys(k for r in rows.values() for k in r if k != "symbol"))
+        arrays, text, lists = {}, {}, {}
+        for key in keys:
+            kind, data, valid = _column([rows[s].get(key) if s in rows else None for s in symbols])
+            {"array": arrays, "text": text, "list": lists}[kind][key] = data
+            if valid is not None:
+                arrays["valid." + key] = valid
+        arrays["has_result"] = np.array([s in rows for s in symbols])
+        for key in info_keys:
+            values = [(infos or {}).get(s, {}).get(key) for s in symbols]
+            arrays["info." + key] = np.array([v if isinstance(v, (int, float)) else np.nan for v in values],
+                                             dtype=np.float32)
+        meta.setdefault("created", datetime.now().isoformat(timespec="seconds"))
+        return cls(symbols, dates, bars, arrays, text, lists, ["symbol"] + keys, meta)
+
+    # ---- access ----
+
+    def value(self, key, col):
+        """One result field for one column as a plain Python value (NaN -> None)"""
+        if key == "symbol":
+            return self.symbols[col]
+        if key in self.arrays:
+            valid = self.arrays.get("valid." + key)
+            if valid is not None and not valid[col]:
+                return None
+            v = self.arrays[key][col]
+            if v.dtype.kind != "f":
+                return v.item()                         # Python bool / int
+            return None if v != v else float(str(v))    # shortest repr that round-trips the float32
+        if key in self.text:
+            return self.text[key][col]
+        if key in self.lists:
+            return self.lists[key][col]
+        raise KeyError(key)
+
+    def result(self, symbol):
+        col = self.index.get(symbol)
+        if col is None or not self.arrays["has_result"][col]:
+            return None
+        return Result(self, col)
+
+    def results(self, key="score"):
+        """Result records of every scanned symbol, best `key` first"""
+        cols = np.flatnonzero(self.arrays["has_result"])
+        if key in self.arrays:
+            values = self.arrays[key][cols].astype(float)
+            if "valid." + key in self.arrays:
+                values[~self.arrays["valid." + key][cols]] = np.nan     # missing sorts last
+            cols = cols[np.argsort(-values, kind="stable")]
+        return [Result(self, int(j)) for j in cols]
+
+    def info(self, symbol):
+        col = self.index[symbol]
+        return {k[5:]: self.value(k, col) for k in self.arrays if k.startswith("info.")}
+
+    def rows(self, symbol):
+        """Row numbers where the symbol has a bar"""
+        if symbol not in self._rows:
+            self._rows[symbol] = np.flatnonzero(np.isfinite(self.bars["Close"][:, self.index[symbol]]))
+        return self._rows[symbol]
+
+    def frame(self, symbol, start=None, end=None):
+        """The symbol's bars between two dates (inclusive) as a float64 DataFrame, or None"""
+        import pandas as pd
+
+        rows = self.rows(symbol)
+        days = self.dates[rows]
+        lo = np.searchsorted(days, np.datetime64(start, "D"), side="left") if start is not None else 0
+        hi = np.searchsorted(days, np.datetime64(end, "D"), side="right") if end is not None else len(rows)
+        if hi <= lo:
+            return None
+        col, picked = self.index[symbol], rows[lo:hi]
+        return pd.DataFrame({f: self.bars[f][picked, col].astype(float) for f in BAR_FIELDS},
+                            index=pd.DatetimeIndex(days[lo:hi]))
+
+    def close(self, symbol, on=None):
+        """Last close on or before `on` (default: the latest), or None"""
+        if symbol not in self.index:
+            return None
+        rows = self.rows(symbol)
+        if on is not None:
+            rows = rows[:np.searchsorted(self.dates[rows], np.datetime64(on, "D"), side="right")]
+        return float(self.bars["Close"][rows[-1], self.index[symbol]]) if len(rows) else None
+
+    @property
+    def nbytes(self):
+        """Array bytes (the header's text and lists aren't counted)"""
+        return self.dates.nbytes + sum(a.nbytes for a in self.bars.values()) + \
+            sum(a.nbytes for a in self.arrays.values())
+
+    # ---- file ----
+
+    def save(self, header_path, data_path=None):
+        """Arrays back to back (ALIGN-byte aligned) in one data file, then a
+        JSON header with their offsets; the header is replaced last, atomically"""
+        data_path = data_path or os.path.splitext(header_path)[0] + ".bin"
+        named = [("dates", self.dates.astype("datetime64[D]").view(np.int64))]
+        named += [("bars." + f, a) for f, a in self.bars.items()] + list(self.arrays.items())
+        layout, offset = {}, 0
+        with open(data_path, "wb") as f:
+            for name, a in named:
+                a = np.ascontiguousarray(a)
+                pad = -offset % ALIGN
+                f.write(b"\0" * pad)
+                offset += pad
+                layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+                f.write(a.tobytes())
+                offset += a.nbytes
+        header = {"version": 1, "data": os.path.basename(data_path), "symbols": self.symbols,
+                  "arrays": layout, "text": self.text, "lists": self.lists,
+                  "result_keys": self.result_keys, "meta": self.meta}
+        with open(header_path + ".tmp", "w") as f:
+            json.dump(header, f, separators=(",", ":"), default=str)
+        os.replace(header_path + ".tmp", header_path)
+
+    @classmethod
+    def load(cls, header_path, mmap=True):
+        """Arrays are read-only views into the mapped data file (mmap=False reads it into memory)"""
+        with open(header_path) as f:
+            header = json.load(f)
+        path = os.path.join(os.path.dirname(header_path), header["data"])
+        raw = np.memmap(path, dtype=np.uint8, mode="r") if mmap else np.fromfile(path, dtype=np.uint8)
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            n = int(np.prod(spec["shape"])) * dtype.itemsize
+            arrays[name] = raw[spec["offset"]:spec["offset"] + n].view(dtype).reshape(spec["shape"])
+        dates = arrays.pop("dates").view("datetime64[D]")
+        bars = {name[5:]: arrays.pop(name) for name in list(arrays) if name.startswith("bars.")}
+        return cls(header["symbols"], dates, bars, arrays, header["text"], header["lists"],
+                   header["result_keys"], header["meta"])
+
+
+# ---- publishing ----
+
+def header_path(source, snapshot_dir=None):
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, f"{source}.json")
+
+
+def publish(source, results, info_keys=(), period="1y", snapshot_dir=None, symbols=None):
+    """Snapshot the scanned symbols' (or `symbols'`) cached bars, info fields and
+    results under SNAPSHOT_DIR/<source>.json. Each publish writes a new data
+    file, so readers holding the previous one keep a consistent view."""
+    import market_data
+
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    symbols = list(dict.fromkeys(symbols or [r['symbol'] for r in results]))
+    frames = {s: df for s in symbols if (df := market_data.get_bars(s, period)) is not None}
+    infos = {s: market_data.get_info(s) for s in symbols} if info_keys else {}
+    snap = Snapshot.build(frames, results, infos, info_keys, source=source)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    data = os.path.join(snapshot_dir, f"{source}-{time.time_ns()}.bin")
+    snap.save(header_path(source, snapshot_dir), data)
+    old = sorted(f for f in os.listdir(snapshot_dir) if f.startswith(source + "-") and f.endswith(".bin"))
+    for name in old[:-KEEP]:
+        os.remove(os.path.join(snapshot_dir, name))
+    return snap
+
+
+def latest(source="daily", snapshot_dir=None):
+    """The last published snapshot for a source (memory-mapped; re-opened only when republished), or None"""
+    path = header_path(source, snapshot_dir)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    hit = _latest.get(path)
+    if hit is None or hit[0] != mtime:
+        hit = _latest[path] = (mtime, Snapshot.load(path))
+    return hit[1]
+
+
+# ---- footprint ----
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by nested dicts/lists/DataFrames"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if hasattr(obj, "memory_usage") and hasattr(obj, "index"):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(v, seen) for v in obj)
+    return size
+
+
+def footprint(source="daily"):
+    """Scan with the given scanner, then compare what analyze() holds with the snapshot"""
+    import india_daily
+    import market_data
+
+    module = india_daily
+    if source == "v3":
+        import india_analyzer_v3 as module
+    keys = module.FUNDAMENTAL_KEYS
+    jobs = [(s, c) for c, syms in module.STOCKS.items() for s in syms]
+    results = [r for r in market_data.map(lambda job: module.analyze(*job), jobs) if r]
+    symbols = list(dict.fromkeys(r['symbol'] for r in results))
+    frames = {s: market_data.get_bars(s) for s in symbols}
+    infos = {s: market_data.get_info(s) for s in symbols}
+    held = {"frames": deep_size(frames), "info": deep_size(infos), "results": deep_size(results)}
+    if source == "v3":
+        held["weekly"] = deep_size({s: market_data.get_bars(s, "2y", "1wk") for s in symbols})
+
+    snap = Snapshot.build(frames, results, infos, keys, source=source)
+    records = [snap.result(s) for s in symbols]
+    compact = snap.nbytes + deep_size([snap.symbols, snap.index, snap.text, snap.lists]) + deep_size(records)
+    print(f"{len(symbols)} symbols, {len(snap.dates)} days, {len(results)} result rows")
+    for name, size in held.items():
+        print(f"  {name:10} {size / 1024:>9.1f} KiB")
+    total = sum(held.values())
+    print(f"  {'total':10} {total / 1024:>9.1f} KiB")
+    print(f"snapshot (arrays, header columns, records) {compact / 1024:.1f} KiB ({total / compact:.1f}x smaller)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish, inspect or size the compact market snapshot")
+    parser.add_argument("--source", default="daily", choices=["daily", "v3"])
+    parser.add_argument("--dir", default=None, help=f"snapshot directory (default {SNAPSHOT_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("show", help="top results of the last published snapshot")
+    p.add_argument("--top", type=int, default=10)
+    sub.add_parser("footprint", help="memory held by analyze() vs the snapshot")
+    args = parser.parse_args(argv)
+
+    if args.command == "footprint":
+        footprint(args.source)
+        return
+    snap = latest(args.source, args.dir)
+    if snap is None:
+        print(f"No {args.source} snapshot published yet")
+        return
+    print(f"{args.source} snapshot {snap.meta.get('created')} | {len(snap.symbols)} symbols x "
+          f"{len(snap.dates)} days | {snap.nbytes / 1024:.0f} KiB mapped")
+    for r in snap.results()[:args.top]:
+        print(f"  {r.symbol:16} score {r.score:>3}  ₹{r.price:>10,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+KAI - Strategy Registry
+Many paper-trading strategies driven by one shared bar/feature snapshot per
+cycle, each with its own wallet, order flow and equity curve
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+import india_daily
+import indicators as ta
+import levels
+import market_data
+import pine_compiler
+
+# Config
+STRATEGY_DIR = "/home/anand/.openclaw/workspace/trading/strategies"
+HISTORY = "1y"
+MAX_POSITIONS = 5
+
+STRATEGIES = {}
+_compared = {}          # names -> (wallet mtimes, rows)
+
+
+def register(strategy):
+    """Add a strategy instance to the registry (usable as a class decorator)"""
+    if isinstance(strategy, type):
+        strategy = strategy()
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+
+def default_universes():
+    import india_analyzer_v3
+    return {"daily": india_daily.STOCKS, "v3": india_analyzer_v3.STOCKS}
+
+
+def _analysis_modules():
+    import india_analyzer_v3
+    return {"daily": india_daily, "v3": india_analyzer_v3}
+
+
+class FeatureSnapshot:
+    """The universe's bars aligned once into T x N matrices.
+
+    feature() memoises any indicators.* call over those matrices and analysis()
+    memoises a whole scanner pass, so the second strategy asking for
+    ema(Close, 21) or the V3 scores gets them for free.
+    """
+
+    def __init__(self, dates, symbols, fields, universes):
+        self.dates = dates
+        self.symbols = symbols
+        self.fields = fields
+        self.universes = universes
+        self.col = {s: i for i, s in enumerate(symbols)}
+        self._features = {}
+        self._analyses = {}
+
+    @classmethod
+    def build(cls, universes=None, period=HISTORY):
+        universes = universes or default_universes()
+        symbols = list(dict.fromkeys(s for u in universes.values() for syms in u.values() for s in syms))
+        market_data.preload(symbols, period)
+        dates, syms, fields = market_data.matrices(symbols, period=period)
+        return cls(dates, syms, fields, universes)
+
+    @property
+    def day(self):
+        return str(np.datetime64(self.dates[-1], "D")) if len(self.dates) else None
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def price(self, symbol):
+        i = self.col.get(symbol)
+        if i is None:
+            return None
+        p = self.fields["Close"][-1, i]
+        return float(p) if np.isfinite(p) else None
+
+    def feature(self, name, *args):
+        """indicators.<name>(*args) with field names replaced by their matrices, computed once"""
+        key = (name, *args)
+        if key not in self._features:
+            fn = getattr(ta, name)
+            self._features[key] = fn(*[self.fields[a] if isinstance(a, str) and a in self.fields else a
+                                       for a in args])
+        return self._features[key]
+
+    def level_index(self, skip_last=False):
+        """levels.LevelIndex of the universe, built once (skip_last: from the bars before the latest)"""
+        key = ("level_index", skip_last)
+        if key not in self._features:
+            end = -1 if skip_last else None
+            self._features[key] = levels.LevelIndex.build(self.symbols, self.fields["High"][:end],
+                                                          self.fields["Low"][:end])
+        return self._features[key]
+
+    def analysis(self, name):
+        """One scanner pass ("daily" or "v3") over its own universe, one job per symbol, best score first"""
+        if name not in self._analyses:
+            module = _analysis_modules()[name]
+            jobs = {}
+            for category, syms in self.universes[name].items():
+                for sym in syms:
+                    jobs.setdefault(sym, category)
+            results = [r for r in market_data.map(lambda job: module.analyze(*job), list(jobs.items())) if r]
+            results.sort(key=lambda r: r['score'], reverse=True)
+            self._analyses[name] = results
+        return self._analyses[name]
+
+
+class Strategy:
+    """Subclasses set name/description and implement signals(snap, wallet):
+    entry orders, best first. Exits are the shared stop/target rule."""
+
+    name = None
+    description = ""
+    max_positions = MAX_POSITIONS
+
+    def signals(self, snap, wallet):
+        raise NotImplementedError
+
+
+def atr_order(result, wallet):
+    """Order from a scanner result with the risk engine's ATR stop/target/size"""
+    qty, stop, target = india_daily.size_position(result['price'], result['atr'], wallet)
+    return {"symbol": result['name'], "price": float(result['price']), "qty": qty,
+            "stop_loss": stop, "target": target, "score": result['score']}
+
+
+@register
+class DailyScore(Strategy):
+    name = "daily_score"
+    description = "Daily scanner score >= 5, ATR stops"
+    min_score = 5
+
+    def signals(self, snap, wallet):
+        return [atr_order(r, wallet) for r in snap.analysis("daily") if r['score'] >= self.min_score]
+
+
+@register
+class V3Score(Strategy):
+    name = "v3_score"
+    description = "V3 technical + fundamental score >= 3, ATR stops"
+    min_score = 3
+
+    def signals(self, snap, wallet):
+        return [atr_order(r, wallet) for r in snap.analysis("v3") if r['score'] >= self.min_score]
+
+
+class PineStrategy(Strategy):
+    """A scripts/*.pine strategy compiled by pine_compiler; inputs are parameters.
+    Long entries only (the wallets don't short), sized by the script's strategy() settings."""
+
+    def __init__(self, program, **params):
+        self.program = program
+        self.name = program.name
+        self.description = program.title
+        self.params = program.params(**params)
+
+    def signals(self, snap, wallet):
+        sig = self.program.signals(snap.fields, snap.dates, **self.params)
+        close = snap["Close"][-1]
+        orders = []
+        for i in np.flatnonzero((sig['side'] == 1) & np.isfinite(close)):
+            price, stop, limit = float(close[i]), sig['stop'][i], sig['limit'][i]
+            orders.append({"symbol": snap.symbols[i].replace(".NS", ""), "price": price,
+                           "qty": self.program.order_size(wallet['capital'], price),
+                           "stop_loss": round(float(stop), 2) if np.isfinite(stop) else None,
+                           "target": round(float(limit), 2) if np.isfinite(limit) else None, "score": 0})
+        return orders
+
+
+# scripts/*.pine compile straight into the registry, so the Pine and the paper
+# wallets can't drift apart
+for _program in pine_compiler.load_scripts():
+    register(PineStrategy(_program))
+
+
+# ---- wallets ----
+
+def wallet_path(name):
+    return os.path.join(STRATEGY_DIR, f"{name}.json")
+
+
+def load_wallet(name):
+    path = wallet_path(name)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    capital = india_daily.PAPER_CAPITAL
+    return {"strategy": name, "capital": capital, "balance": capital, "positions": [], "trades": [], "equity": []}
+
+
+def save_wallet(name, wallet):
+    os.makedirs(STRATEGY_DIR, exist_ok=True)
+    path = wallet_path(name)
+    with open(path + ".tmp", "w") as f:
+        json.dump(wallet, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def equity(wallet, snap):
+    value = wallet['balance']
+    for pos in wallet['positions']:
+        price = snap.price(pos['symbol'] + ".NS")
+        value += pos['qty'] * (price if price is not None else pos['entry_price'])
+    return value
+
+
+def apply_exits(name, wallet, snap):
+    """Stop/target exits at the level, the same rule as india_daily.check_positions"""
+    for pos in list(wallet['positions']):
+        current = snap.price(pos['symbol'] + ".NS")
+        if current is None:
+            continue
+        if pos['stop_loss'] is not None and current <= pos['stop_loss']:
+            status, level = "SL", pos['stop_loss']
+        elif pos['target'] is not None and current >= pos['target']:
+            status, level = "TARGET", pos['target']
+        else:
+            continue
+        pnl = (level - pos['entry_price']) * pos['qty']
+        wallet['balance'] += pos['cost'] + pnl
+        pos.update(exit_price=current, exit_time=india_daily.clock().isoformat(), pnl=pnl, status=status)
+        wallet['trades'].append(pos)
+        wallet['positions'].remove(pos)
+        india_daily.log(f"[{name}] {'🛑 SL EXIT' if status == 'SL' else '🎯 TARGET HIT'}: {pos['symbol']} | "
+                        f"P&L: ₹{pnl:.0f}")
+        india_daily.record("exit", symbol=pos['symbol'], strategy=name, status=status, exit_price=current, pnl=pnl)
+
+
+def apply_entries(name, wallet, orders, max_positions):
+    held = {p['symbol'] for p in wallet['positions']}
+    for o in orders:
+        if len(wallet['positions']) >= max_positions:
+            break
+        cost = o['price'] * o['qty']
+        if o['symbol'] in held or o['qty'] <= 0 or cost > wallet['balance']:
+            continue
+        wallet['positions'].append({
+            "id": len(wallet['trades']) + len(wallet['positions']) + 1, "symbol": o['symbol'],
+            "entry_price": o['price'], "qty": o['qty'], "cost": cost,
+            "entry_time": india_daily.clock().isoformat(), "stop_loss": o['stop_loss'], "target": o['target'],
+            "status": "OPEN",
+        })
+        wallet['balance'] -= cost
+        held.add(o['symbol'])
+        india_daily.log(f"[{name}] ✅ BUY {o['symbol']} | Qty: {o['qty']} | Entry: ₹{o['price']:.2f} | "
+                        f"Target: {_level(o['target'])} | SL: {_level(o['stop_loss'])}")
+        india_daily.record("order", symbol=o['symbol'], strategy=name, side="BUY", qty=o['qty'], price=o['price'],
+                           stop_loss=o['stop_loss'], target=o['target'], score=o['score'])
+
+
+def _level(value):
+    """A stop/target for the log; Pine strategies may leave either unset"""
+    return "—" if value is None else f"₹{value}"
+
+
+def run_cycle(snap=None, names=None, persist=True):
+    """Exits, entries and an equity mark for every selected strategy on one snapshot"""
+    snap = snap or FeatureSnapshot.build()
+    wallets = {}
+    for name in names or list(STRATEGIES):
+        strategy = STRATEGIES[name]
+        wallet = load_wallet(name)
+        apply_exits(name, wallet, snap)
+        apply_entries(name, wallet, strategy.signals(snap, wallet), strategy.max_positions)
+        curve = wallet.setdefault('equity', [])
+        if curve and curve[-1][0] == snap.day:
+            curve.pop()             # re-run on the same day replaces that day's mark
+        curve.append([snap.day, round(equity(wallet, snap), 2)])
+        if persist:
+            save_wallet(name, wallet)
+        wallets[name] = wallet
+    return wallets
+
+
+# ---- comparison ----
+
+def summary(name, wallet):
+    curve = [v for _, v in wallet.get('equity', [])] or [wallet['capital']]
+    peak, max_dd = curve[0], 0.0
+    for v in curve:
+        peak = max(peak, v)
+        max_dd = max(max_dd, 1 - v / peak)
+    closed = wallet['trades']
+    wins = sum(1 for t in closed if t['pnl'] > 0)
+    strategy = STRATEGIES.get(name)
+    return {
+        "strategy": name, "description": strategy.description if strategy else "",
+        "equity": curve[-1], "return_pct": (curve[-1] / wallet['capital'] - 1) * 100,
+        "max_drawdown_pct": max_dd * 100, "cash": wallet['balance'],
+        "open_positions": len(wallet['positions']), "closed_trades": len(closed),
+        "win_rate": wins / len(closed) * 100 if closed else 0.0,
+        "realized_pnl": sum(t['pnl'] for t in closed),
+        "days": len(wallet.get('equity', [])), "curve": wallet.get('equity', []),
+    }
+
+
+def compare(names=None):
+    """Side-by-side summaries of every strategy wallet on disk (or the named ones), best return first"""
+    if names is None:
+        on_disk = [f[:-5] for f in os.listdir(STRATEGY_DIR) if f.endswith(".json")] if os.path.isdir(STRATEGY_DIR) else []
+        names = list(dict.fromkeys(list(STRATEGIES) + on_disk))
+    mtimes = [_mtime(wallet_path(n)) for n in names]
+    hit = _compared.get(tuple(names))
+    if hit is None or hit[0] != mtimes:     # the dashboard asks on every page load
+        rows = [summary(n, load_wallet(n)) for n in names]
+        rows.sort(key=lambda r: r['return_pct'], reverse=True)
+        hit = _compared[tuple(names)] = (mtimes, rows)
+    return hit[1]
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def format_compare(rows):
+    lines = [f"{'Strategy':22} {'Equity':>11} {'Return':>8} {'MaxDD':>6} {'Open':>5} {'Closed':>7} {'Win%':>5}"]
+    for r in rows:
+        lines.append(f"{r['strategy']:22} ₹{r['equity']:>10,.0f} {r['return_pct']:>+7.2f}% "
+                     f"{r['max_drawdown_pct']:>5.1f}% {r['open_positions']:>5} {r['closed_trades']:>7} "
+                     f"{r['win_rate']:>4.0f}%")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run or compare the registered paper-trading strategies")
+    parser.add_argument("--run", action="store_true", help="run one cycle on a fresh snapshot")
+    parser.add_argument("--only", nargs="+", choices=sorted(STRATEGIES), help="subset of strategies")
+    parser.add_argument("--list", action="store_true", help="list registered strategies")
+    args = parser.parse_args()
+
+    if args.list:
+        for s in STRATEGIES.values():
+            print(f"{s.name:22} {s.description}")
+        return
+    if args.run:
+        run_cycle(names=args.only)
+    for line in format_compare(compare(args.only)):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+KAI - Static Dashboard Builder
+Pre-computes portfolio aggregates, per-position P&L and a paginated trade
+history into small gzip JSON shards plus a manifest for GitHub Pages
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import urllib.request
+from datetime import datetime, timezone
+
+# Config
+WALLET_FILE = "/home/anand/.openclaw/workspace/trading/india_wallet.json"
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard", "data")
+PAGE_SIZE = 50          # closed trades per history shard
+SCHEMA = 1
+
+
+def load_wallet(source):
+    """Wallet JSON from a file path or an http(s) URL (e.g. the Gist raw URL)"""
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source, timeout=30) as resp:
+            return json.load(resp)
+    with open(source) as f:
+        return json.load(f)
+
+
+def position_rows(wallet):
+    rows = []
+    for p in wallet.get('positions', []):
+        price = p.get('current_price') or p['entry_price']
+        value = price * p['qty']
+        pnl = (price - p['entry_price']) * p['qty']
+        rows.append({
+            "symbol": p['symbol'], "qty": p['qty'], "entry_price": p['entry_price'],
+            "current_price": price, "cost": p['cost'], "value": round(value, 2),
+            "pnl": round(pnl, 2), "pnl_pct": round((price / p['entry_price'] - 1) * 100, 2),
+            "stop_loss": p['stop_loss'], "target": p['target'],
+            "to_stop_pct": round((p['stop_loss'] / price - 1) * 100, 2),
+            "to_target_pct": round((p['target'] / price - 1) * 100, 2),
+            "entry_time": p.get('entry_time'),
+        })
+    return rows
+
+
+def trade_rows(wallet):
+    rows = []
+    for t in wallet.get('trades', []):
+        exit_price = t.get('exit_price') or 0
+        rows.append({
+            "symbol": t['symbol'], "qty": t['qty'], "entry_price": t['entry_price'],
+            "exit_price": exit_price, "status": t.get('status'), "pnl": round(t.get('pnl', 0), 2),
+            "pnl_pct": round((exit_price / t['entry_price'] - 1) * 100, 2) if exit_price else 0,
+            "entry_time": t.get('entry_time'), "exit_time": t.get('exit_time'),
+        })
+    return rows
+
+
+def summary(wallet, positions, trades):
+    invested = sum(p['cost'] for p in positions)
+    value = sum(p['value'] for p in positions)
+    open_pnl = sum(p['pnl'] for p in positions)
+    realized = sum(t['pnl'] for t in trades)
+    wins = sum(1 for t in trades if t['pnl'] > 0)
+    total = wallet['balance'] + value
+    return {
+        "capital": wallet['capital'], "balance": wallet['balance'],
+        "invested": round(invested, 2), "market_value": round(value, 2),
+        "open_pnl": round(open_pnl, 2), "open_pnl_pct": round(open_pnl / invested * 100, 2) if invested else 0,
+        "realized_pnl": round(realized, 2), "total_value": round(total, 2),
+        "total_pnl": round(total - wallet['capital'], 2),
+        "total_pnl_pct": round((total / wallet['capital'] - 1) * 100, 2),
+        "positions": len(positions), "closed_trades": len(trades),
+        "win_rate": round(wins / len(trades) * 100, 1) if trades else 0,
+        "best_trade": max((t['pnl'] for t in trades), default=0),
+        "worst_trade": min((t['pnl'] for t in trades), default=0),
+    }
+
+
+def write_shard(out_dir, kind, payload):
+    """Content-addressed gzip shard: unchanged data keeps its name (and browser cache)"""
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    name = f"{kind}.{hashlib.sha1(raw).hexdigest()[:12]}.json.gz"
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        with open(path + ".tmp", "wb") as f:
+            # mtime=0 keeps the bytes reproducible across builds
+            f.write(gzip.compress(raw, compresslevel=9, mtime=0))
+        os.replace(path + ".tmp", path)
+    return name
+
+
+def build(wallet, out_dir=OUT_DIR, page_size=PAGE_SIZE, stale=None):
+    """Write shards + manifest.json and delete shards no longer referenced. Returns the manifest.
+    stale: why this wallet may be out of date (the page shows it), or None."""
+    os.makedirs(out_dir, exist_ok=True)
+    positions = position_rows(wallet)
+    trades = trade_rows(wallet)
+
+    # History is chunked oldest-first so every full page is immutable;
+    # only the newest, partial page changes when a trade closes
+    pages = [write_shard(out_dir, f"trades-{i // page_size:04d}", trades[i:i + page_size])
+             for i in range(0, len(trades), page_size)]
+    files = {"positions": write_shard(out_dir, "positions", positions), "trades": pages}
+
+    body = {"schema": SCHEMA, "summary": summary(wallet, positions, trades),
+            "page_size": page_size, "files": files, "stale": stale}
+    manifest = {"version": hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()[:12],
+                "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"), **body}
+    with open(os.path.join(out_dir, "manifest.json.tmp"), "w") as f:
+        json.dump(manifest, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(os.path.join(out_dir, "manifest.json.tmp"), os.path.join(out_dir, "manifest.json"))
+
+    keep = {files["positions"], *pages}
+    for name in os.listdir(out_dir):
+        if name.endswith(".json.gz") and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the static dashboard data shards")
+    parser.add_argument("--wallet", default=WALLET_FILE, help="wallet JSON path or URL")
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--stale", metavar="REASON", help="mark the build as possibly out of date")
+    args = parser.parse_args()
+
+    manifest = build(load_wallet(args.wallet), args.out, args.page_size, args.stale)
+    sizes = sum(os.path.getsize(os.path.join(args.out, n)) for n in os.listdir(args.out))
+    s = manifest['summary']
+    if args.stale:
+        print(f"⚠️ marked stale: {args.stale}")
+    print(f"Built {manifest['version']} -> {args.out} "
+          f"({len(manifest['files']['trades'])} trade pages, {sizes:,} bytes)")
+    print(f"Total ₹{s['total_value']:,.0f} | P&L ₹{s['total_pnl']:+,.0f} | "
+          f"{s['positions']} open | {s['closed_trades']} closed")
+
+
+if __name__ == "__main__":
+    main()
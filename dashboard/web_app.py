@@ -3,21 +3,54 @@
 KAI - Paper Trading Web Dashboard
 """
 
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, jsonify, request
 import json
-import yfinance as yf
+import os
+import sys
+import threading
+import time
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bots"))
+import market_data
+from governor import yahoo
+
 app = Flask(__name__)
 
-WALLET_FILE = "/home/anand/.openclaw/workspace/trading/india_wallet.json"
+WALLET_FILE = os.environ.get("KAI_WALLET_FILE", "/home/anand/.openclaw/workspace/trading/india_wallet.json")
+QUOTE_TTL = 15          # seconds one fetched quote is shared by every viewer
+WORKERS = 2             # gunicorn processes
+THREADS = 8             # request threads per process
+
+_quotes = {}            # symbol -> (expires, price)
+_fetching = {}          # symbol -> lock, so concurrent viewers wait for one fetch
+_quotes_lock = threading.Lock()
+
+def fetch_price(symbol):
+    return market_data.fetch_price(symbol + ".NS")
+
+def cached_price(symbol):
+    hit = _quotes.get(symbol)
+    return hit[1] if hit and hit[0] > time.monotonic() else None
 
 def get_price(symbol):
-    try:
-        t = yf.Ticker(symbol + ".NS")
-        return t.info.get('regularMarketPrice', 0)
-    except:
-        return 0
+    """Latest quote, fetched at most once per QUOTE_TTL however many requests ask"""
+    with _quotes_lock:
+        lock = _fetching.setdefault(symbol, threading.Lock())
+    with lock:
+        price = cached_price(symbol)
+        if price is not None:
+            return price
+        price = yahoo.fetch(symbol, fetch_price, symbol, default=0)
+        if price:
+            _quotes[symbol] = (time.monotonic() + QUOTE_TTL, price)
+        return price
+
+def snapshot_close(symbol):
+    """Last close in the scanner's published snapshot (bots/snapshot.py), or 0"""
+    import snapshot
+    snap = snapshot.latest("daily")
+    return (snap.close(symbol + ".NS") or 0) if snap else 0
 
 def load_data():
     with open(WALLET_FILE) as f:
@@ -27,9 +60,15 @@ def get_market_data():
     wallet = load_data()
     data = []
     
-    # Update open positions with current prices
-    for pos in wallet.get('positions', []):
-        current_price = get_price(pos['symbol'])
+    # Update open positions with current prices (stale ones fetched concurrently)
+    positions = wallet.get('positions', [])
+    symbols = [p['symbol'] for p in positions]
+    prices = [cached_price(s) for s in symbols]
+    if None in prices:
+        prices = yahoo.map(get_price, symbols)
+    for pos, current_price in zip(positions, prices):
+        if not current_price:
+            current_price = snapshot_close(pos['symbol'])
         if current_price > 0:
             pos['current_price'] = current_price
             pos['current_value'] = current_price * pos['qty']
@@ -218,6 +257,21 @@ HTML = """
             {% endif %}
         </div>
         
+        {% if strategies %}
+        <div class="trades">
+            <h2>Strategies ({{ strategies|length }})</h2>
+            {% for s in strategies %}
+            <div class="trade-card">
+                <div><span>{{ s.strategy }}</span></div>
+                <div>₹{{ "{:,.0f}".format(s.equity) }}</div>
+                <div class="{% if s.return_pct >= 0 %}positive{% else %}negative{% endif %}">{{ "%+.2f"|format(s.return_pct) }}%</div>
+                <div>DD {{ "%.1f"|format(s.max_drawdown_pct) }}%</div>
+                <div>{{ s.open_positions }} open / {{ s.closed_trades }} closed</div>
+            </div>
+            {% endfor %}
+        </div>
+        {% endif %}
+        
         <footer style="text-align: center; color: #666; padding: 20px; font-size: 12px;">
             Last updated: {{ last_update }}
         </footer>
@@ -226,6 +280,20 @@ HTML = """
 </html>
 """
 
+_template = None
+
+def page_template():
+    """HTML compiled once per process (render_template_string recompiles it on every request)"""
+    global _template
+    if _template is None:
+        _template = app.jinja_env.from_string(HTML)
+    return _template
+
+def strategy_summaries():
+    """Per-strategy wallet summaries (bots/strategies.py), without the equity curves"""
+    import strategies
+    return [{k: v for k, v in row.items() if k != 'curve'} for row in strategies.compare()]
+
 @app.route('/')
 def index():
     data = get_market_data()
@@ -233,19 +301,78 @@ def index():
     invested = sum([p.get('current_value', p['cost']) for p in data.get('positions', [])])
     total_pnl = sum([p.get('pnl', 0) for p in data.get('positions', [])])
     
-    return render_template_string(HTML, 
+    return page_template().render(
         data=data, 
         invested=invested, 
         total_pnl=total_pnl,
+        strategies=strategy_summaries(),
         last_update=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
 @app.route('/api')
 def api():
     return jsonify(get_market_data())
 
+@app.route('/api/strategies')
+def api_strategies():
+    """Side-by-side strategy comparison, equity curves included"""
+    import strategies
+    return jsonify(strategies.compare())
+
+@app.route('/api/scan')
+def api_scan():
+    """Top results of the last scan, read from the memory-mapped snapshot (?source=daily|v3&top=N)"""
+    import snapshot
+    snap = snapshot.latest(request.args.get('source', 'daily'))
+    if snap is None:
+        return jsonify({"error": "no snapshot published yet"}), 404
+    top = request.args.get('top', 20, type=int)
+    return jsonify({"created": snap.meta.get('created'),
+                    "results": [r.to_dict() for r in snap.results()[:top]]})
+
+def serve(host='0.0.0.0', port=5000, server="auto", workers=None, threads=None):
+    """Production serving: gunicorn (workers x threads) where it is installed,
+    else waitress (threads, one process), else Flask's threaded server.
+    Returns the server used once it stops."""
+    import strategies  # noqa: F401  (compiles the Pine scripts once, before gunicorn forks)
+
+    workers, threads = workers or WORKERS, threads or THREADS
+    if server in ("auto", "gunicorn") and os.name == "posix":
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            if server == "gunicorn":
+                raise
+        else:
+            class Gunicorn(BaseApplication):
+                def load_config(self):
+                    options = {"bind": f"{host}:{port}", "workers": workers, "threads": threads,
+                               "worker_class": "gthread", "accesslog": None}
+                    for key, value in options.items():
+                        self.cfg.set(key, value)
+
+                def load(self):
+                    return app
+
+            Gunicorn().run()
+            return "gunicorn"
+    if server in ("auto", "waitress"):
+        try:
+            import waitress
+        except ImportError:
+            if server == "waitress":
+                raise
+        else:
+            waitress.serve(app, host=host, port=port, threads=threads)
+            return "waitress"
+    app.run(host=host, port=port, threaded=True)
+    return "flask"
+
 if __name__ == '__main__':
     print("="*50)
     print("KAI Paper Trading Dashboard")
     print("Open http://localhost:5000")
     print("="*50)
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if "--debug" in sys.argv:
+        app.run(host='0.0.0.0', port=5000, debug=True)
+    else:
+        serve()
@@ -5,24 +5,35 @@ Keep trading data synced - updates GitHub Gist
 
 import json
 import os
+import sys
 import time
-import yfinance as yf
 import requests
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bots"))
+from governor import NoData, yahoo
+
 WALLET_FILE = "/home/anand/.openclaw/workspace/trading/india_wallet.json"
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN', '')
 GIST_ID = ""  # Will be created
 
+# One keep-alive session, reused across syncs when run from the scheduler daemon
+session = requests.Session()
+
+def fetch_price(symbol):
+    import yfinance as yf
+
+    price = yf.Ticker(symbol + ".NS").info.get('regularMarketPrice')
+    if not price:
+        raise NoData(f"no regularMarketPrice for {symbol}")
+    return float(price)
+
 def get_price(symbol):
-    try:
-        t = yf.Ticker(symbol + ".NS")
-        return float(t.info.get('regularMarketPrice', 0))
-    except:
-        return 0
+    return yahoo.fetch(symbol, fetch_price, symbol, default=0)
 
 def update_prices(data):
     """Update current prices for all positions"""
+    yahoo.reset_report()    # the scheduler shares `yahoo` with the scans; report only these fetches
     for pos in data.get('positions', []):
         current_price = get_price(pos['symbol'])
         if current_price > 0:
@@ -30,6 +41,10 @@ def update_prices(data):
             pos['current_value'] = current_price * pos['qty']
             pos['pnl'] = (current_price - pos['entry_price']) * pos['qty']
             pos['pnl_pct'] = ((current_price / pos['entry_price']) - 1) * 100
+    if yahoo.report()['failures']:
+        print("Price update failures (positions keep their last price):")
+        for line in yahoo.summary():
+            print(line)
     return data
 
 def sync_to_gist(data):
@@ -38,7 +53,7 @@ def sync_to_gist(data):
     # Check if gist exists
     if not GIST_ID:
         # Search for existing gist
-        response = requests.get(
+        response = session.get(
             "https://api.github.com/gists",
             headers={"Authorization": f"token {GITHUB_TOKEN}"}
         )
@@ -52,14 +67,14 @@ def sync_to_gist(data):
     
     if GIST_ID:
         # Update existing gist
-        response = requests.get(
+        response = session.get(
             f"https://api.github.com/gists/{GIST_ID}",
             headers={"Authorization": f"token {GITHUB_TOKEN}"}
         )
         if response.status_code == 200:
             gist = response.json()
             gist['files']['trading_data.json']['content'] = data_json
-            requests.patch(
+            session.patch(
                 f"https://api.github.com/gists/{GIST_ID}",
                 headers={"Authorization": f"token {GITHUB_TOKEN}"},
                 json=gist
@@ -76,7 +91,7 @@ def sync_to_gist(data):
         }
     }
     
-    response = requests.post(
+    response = session.post(
         "https://api.github.com/gists",
         headers={"Authorization": f"token {GITHUB_TOKEN}"},
         json=gist_data